@@ -3,7 +3,7 @@
 """
 
 from pathlib import Path
-from typing import Union, Literal
+from typing import Dict, Union, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -26,6 +26,14 @@ class BaseConfig(BaseSettings):
     ALLURE_REPORT: Union[str, Path] = TEST_PATH / "report" / "allure_report"
     ## 是否使用StaticFiles, 默认使用StaticFiles,还可配置nginx提高性能(使用nginx时这个配置配置为False)
     ON_STATICFILES: bool = True
+    ## 是否为静态文件与allure报告生成gzip/brotli预压缩文件
+    STATIC_PRECOMPRESS: bool = True
+    ## 小于该字节数的静态文件不压缩
+    STATIC_COMPRESS_MIN_SIZE: int = 1024
+    ## 静态文件缓存头, swagger等文件名不带哈希的资源升级后内容会变化, 过期后按ETag重新验证
+    STATIC_CACHE_CONTROL: str = "public, max-age=300"
+    ## 文件名带内容哈希(例如app.3f2a9c1b.js)的静态文件缓存头, 内容变化时文件名随之变化
+    STATIC_IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
     ## autotest 配置路径
     TEST_CONFIG_PATH: Union[str, Path] = TEST_PATH / "config" / "config.yaml"
     ## orm models路径
@@ -46,6 +54,33 @@ class BaseConfig(BaseSettings):
     LOG_FORMATTER: str = (
         "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
     )
+    ## 访问日志记录的请求体最大字节数, 文件上传只提取文件名
+    LOG_BODY_MAX_BYTES: int = 2048
+    ## 是否写入结构化访问日志(log/access/*.jsonl)
+    ACCESS_LOG_ENABLED: bool = True
+    ## 访问日志按状态码分类的采样率, 未配置的分类全部记录
+    ACCESS_LOG_SAMPLE_RATES: Dict[str, float] = {
+        "2xx": 0.01,
+        "3xx": 0.01,
+        "4xx": 1.0,
+        "5xx": 1.0,
+    }
+    ## 访问日志单次批量写入的最大条数
+    ACCESS_LOG_BATCH_SIZE: int = 256
+    ## 访问日志最长写入间隔,单位s
+    ACCESS_LOG_FLUSH_INTERVAL: float = 1.0
+    ## 访问日志队列上限, 超出时丢弃
+    ACCESS_LOG_QUEUE_SIZE: int = 10000
+
+    # 指标
+    ## 是否启用/metrics接口与指标推送, 接口不经过登录鉴权, 默认关闭
+    METRICS_ENABLED: bool = False
+    ## /metrics接口的访问令牌, 设置后抓取方需携带Authorization: Bearer <token>
+    METRICS_TOKEN: Optional[str] = None
+    ## 每个worker向redis推送指标快照的间隔,单位s
+    METRICS_PUSH_INTERVAL: int = 15
+    ## 是否输出X-Query-Count响应头(本次请求执行的SQL语句数), 用于排查N+1查询
+    QUERY_COUNT_HEADER: bool = False
 
     # 数据库
     DB_ENGINE: Literal["mysql", "asyncpg", "sqlite", "mssql"] = "mysql"  # 数据库引擎
@@ -54,6 +89,11 @@ class BaseConfig(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     DB_DATEBASE: str
+    ## 只读副本地址, 不配置时所有查询都走主库; 用户名、密码、库名与主库相同
+    DB_REPLICA_HOST: Optional[str] = None
+    DB_REPLICA_PORT: Optional[int] = None  # 默认与DB_PORT相同
+    ## 写请求成功后, 同一客户端的读请求在该时间内仍走主库(读己之写),单位s
+    DB_READ_YOUR_WRITES_WINDOW: int = 5
     USE_TZ: bool = False  # 是否启用UTC时区
     TZ: str = "Asia/Shanghai"  # 数据库时区
 
@@ -76,6 +116,66 @@ class BaseConfig(BaseSettings):
     ALGORITHM: str = "HS256"
     ## jwt过期时间,单位s
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+    ## 每个worker进程内缓存的已校验token条目数
+    TOKEN_CACHE_SIZE: int = 4096
+
+    # 密码哈希
+    ## 新密码使用的passlib算法, 旧的md5_crypt哈希仍可校验并在登录时自动升级
+    PASSWORD_HASH_SCHEME: str = "md5_crypt"
+    ## 哈希算法轮数, 为None时使用passlib默认值
+    PASSWORD_HASH_ROUNDS: Optional[int] = None
+    ## 哈希执行器类型, process可绕过GIL, thread开销更小
+    PASSWORD_HASH_EXECUTOR: Literal["process", "thread"] = "process"
+    ## 哈希执行器工作进程/线程数
+    PASSWORD_HASH_WORKERS: int = 2
+    ## 哈希队列最大等待数, 超出时直接返回503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    ## 批量哈希(导入用户)每个任务处理的密码数, 登录校验最多等待一个批次
+    PASSWORD_HASH_BATCH_SIZE: int = 4
+
+    # 分页总数缓存
+    ## 是否缓存列表总数, 表发生写入后自动失效
+    COUNT_CACHE_ENABLED: bool = True
+    ## 列表总数缓存过期时间,单位s; 事务提交前被读取的总数最多延迟该时间更新
+    COUNT_CACHE_EXPIRE: int = 60
+    ## 未筛选的列表是否使用information_schema估算总数(仅mysql)
+    COUNT_ESTIMATE_UNFILTERED: bool = False
+    ## 估算行数不低于该值时才使用估算总数
+    COUNT_ESTIMATE_THRESHOLD: int = 100000
+
+    # 批量写入
+    ## 批量新增/更新/删除时每条语句处理的行数
+    BULK_CHUNK_SIZE: int = 500
+
+    # 测试用例导入
+    ## excel解析与校验的执行方式, process: 独立进程(解析为cpu密集, 不阻塞worker), thread: 线程
+    TESTCASE_IMPORT_EXECUTOR: Literal["process", "thread"] = "process"
+    ## 每个worker进程同时进行的导入数, 超出时排队等待
+    TESTCASE_IMPORT_CONCURRENCY: int = 2
+    ## 导入结果中最多返回的错误行数, 错误总数不受影响
+    TESTCASE_IMPORT_MAX_ERRORS: int = 100
+
+    # 用户导入
+    ## 导入校验失败时最多返回的错误行数
+    USER_IMPORT_MAX_ERRORS: int = 50
+
+    # 权限缓存
+    ## 每个worker进程内缓存的用户权限判定条目数
+    RBAC_CACHE_SIZE: int = 4096
+    ## redis中用户权限判定的过期时间,单位s
+    RBAC_CACHE_EXPIRE: int = 60 * 60
+    ## 每个worker进程内缓存的当前登录用户条目数
+    PRINCIPAL_CACHE_SIZE: int = 4096
+    ## 进程内当前登录用户缓存过期时间,单位s;其他worker的失效最多延迟该时间
+    PRINCIPAL_LOCAL_CACHE_EXPIRE: int = 5
+    ## redis中当前登录用户缓存过期时间,单位s
+    PRINCIPAL_CACHE_EXPIRE: int = 60 * 5
+
+    # 路由菜单缓存
+    ## 每个worker进程内缓存的角色集合数
+    MENU_CACHE_SIZE: int = 256
+    ## 路由菜单缓存过期时间,单位s; 菜单或角色变更后旧缓存不再命中, 只需等待过期清理
+    MENU_CACHE_EXPIRE: int = 60 * 60
 
     # swagger
     SWAGGER_TITLE: str = "api swagger"
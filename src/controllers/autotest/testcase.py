@@ -6,6 +6,8 @@ from fastapi import (
     HTTPException,
     UploadFile,
     Query,
+    Request,
+    Response,
     status,
 )
 from typing_extensions import Annotated
@@ -16,16 +18,32 @@ from tortoise.exceptions import DoesNotExist
 from src.schemas.autotest import testcase
 from src.config import config
 from src.core.redis import RedisService
+from src.core.etag import ResourceVersion, conditional_response
+from src.core.replica import use_primary
 from src.services import TestCaseService
-from src.db.models import TestCase
+from src.repositories import paginate
+from src.repositories.filters import FilterSpec
+from src.repositories.search import search
+from src.db.models import TestCase, TESTCASE_SEARCH_FIELDS
 from src.schemas import ResultResponse
+from src.schemas.common import parse_fields, sparse_page_model
 from src.utils.log_util import log
-from src.utils.excel_util import save_file, read_all_testcase
+from src.utils.excel_util import save_file
 from src.utils.exceptions.testcase import TestcaseNotExistException
 from src.utils.exceptions.testenv import CurrentTestEnvNotSetException
 
 router = APIRouter()
 
+# 列表筛选
+TESTCASE_FILTER = FilterSpec(
+    TestCase,
+    text={
+        "case_title": "case_title",
+        "case_suite": "testsuites__suite_title",
+        "case_module": "case_module",
+    },
+)
+
 
 @router.post(
     "/add",
@@ -41,11 +59,11 @@ async def add_testcase(body: testcase.TestCaseIn):
 @router.post(
     "/import",
     summary="导入excel测试用例",
-    response_model=ResultResponse[None],
+    response_model=ResultResponse[testcase.TestCaseImportOut],
 )
 async def add_testcases(file: UploadFile):
-    """导入测试用例"""
-    if file.filename.endswith(("xlsx", "csv", "xls")):
+    """导入测试用例, 校验失败的行跳过并在result.errors中返回"""
+    if file.filename.endswith(("xlsx", "csv")):
         # 保存文件名
         save_name = str(datetime.now().strftime("%Y-%m-%d-%H-%M-%S")) + file.filename
         # 保存路径
@@ -55,17 +73,17 @@ async def add_testcases(file: UploadFile):
             file=file,
             save_path=save_path,
         )
-        # 读取表格数据
-        testcase_list = await read_all_testcase(save_path)
-        log.debug(f"testcase_list:{testcase_list}")
-        # 保存testcase到数据库
-        await TestCaseService.add_testcase_from_list(testcase_list)
+        # 逐块解析校验并保存到数据库, 用例编号已存在时更新
+        result = await TestCaseService.import_testcases(save_path)
     else:
         # 上传文件格式错误
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="template suffix is error!"
         )
-    return ResultResponse[None](message=f"Successful import {file.filename}!")
+    return ResultResponse[testcase.TestCaseImportOut](
+        message=f"Successful import {file.filename}, {result.rows} testcases!",
+        result=result,
+    )
 
 
 @router.get(
@@ -103,35 +121,71 @@ async def get_all_testcase(
     end_time: Optional[str] = Query(default=None, description="结束时间", alias="endTime"),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
+    fields: Optional[str] = Query(
+        default=None,
+        description="只返回这些字段, 逗号分隔, 例如caseNo,caseTitle; id与createdAt总是返回",
+    ),
 ):
     """获取测试用例列表"""
-    filters = {}
-    if case_title:
-        filters["case_title__icontains"] = case_title
-    if case_suite:
-        filters["testsuites__suite_title__icontains"] = case_suite
-    if case_module:
-        filters["case_module__icontains"] = case_module
-    if begin_time:
-        begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-        filters["created_at__gte"] = begin_time
-    if end_time:
-        end_time = datetime.strptime(end_time, "%Y-%m-%d")
-        filters["created_at__lte"] = end_time
-    if begin_time and end_time:
-        filters["created_at__range"] = (
-            begin_time,
-            end_time,
-        )
+    filters = TESTCASE_FILTER.compile(
+        begin_time=begin_time,
+        end_time=end_time,
+        case_title=case_title,
+        case_suite=case_suite,
+        case_module=case_module,
+    )
     query = TestCase.filter(**filters)
-    testcases = await query.offset(limit * (page - 1)).limit(limit).all()
-    total = await query.count()
+    if fields:
+        # 投影查询直接返回dict, 不加载request_param等大字段也不构建模型实例
+        names = parse_fields(testcase.TestCaseOut, fields)
+        rows, total, next_cursor = await paginate(
+            query, limit, page, cursor, fields=names
+        )
+        response_model = sparse_page_model(testcase.TestCaseOut, names)
+        result = response_model(
+            result=dict(
+                data=rows,
+                page=page,
+                limit=limit,
+                total=total,
+                next_cursor=next_cursor,
+            )
+        )
+        return Response(
+            result.model_dump_json(by_alias=True), media_type="application/json"
+        )
+    testcases, total, next_cursor = await paginate(query, limit, page, cursor)
     return ResultResponse[testcase.TestCaseListOut](
         result=testcase.TestCaseListOut(
             data=testcases,
             page=page,
             limit=limit,
             total=total,
+            next_cursor=next_cursor,
+        )
+    )
+
+
+@router.get(
+    "/search",
+    summary="全文检索测试用例",
+    response_model=ResultResponse[testcase.TestCaseListOut],
+)
+async def search_testcase(
+    keyword: str = Query(min_length=1, description="关键字, 匹配标题、模块、接口地址与说明"),
+    limit: Optional[int] = Query(default=20, ge=10),
+    page: Optional[int] = Query(default=1, gt=0),
+):
+    """全文检索测试用例, 按相关度排序"""
+    testcases, total = await search(
+        TestCase.all(), TESTCASE_SEARCH_FIELDS, keyword, limit, page
+    )
+    return ResultResponse[testcase.TestCaseListOut](
+        result=testcase.TestCaseListOut(
+            data=testcases, page=page, limit=limit, total=total
         )
     )
 
@@ -177,6 +231,10 @@ async def delete_testcase(case_ids: Annotated[str, StringConstraints(strip_white
     delete_count = await TestCase.filter(id__in=source_ids_list).delete()
     if not delete_count:
         raise TestcaseNotExistException
+    # 所属套件的用例列表也随之变化
+    await ResourceVersion.bump(
+        "testcase", *(f"testcase:{case_id}" for case_id in source_ids_list)
+    )
     return ResultResponse[None](message="successful deleted testcase!")
 
 
@@ -185,10 +243,16 @@ async def delete_testcase(case_ids: Annotated[str, StringConstraints(strip_white
     summary="获取指定testcase",
     response_model=ResultResponse[testcase.TestCaseOut],
 )
-async def get_testcase(case_id: int):
+async def get_testcase(request: Request, response: Response, case_id: int):
     """获取指定testcase"""
+    etag = await ResourceVersion.etag(f"testcase:{case_id}")
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    # 响应带有最新版本的ETag, 数据必须读主库
     try:
-        case = await TestCase.get(id=case_id)
+        with use_primary():
+            case = await TestCase.get(id=case_id)
     except DoesNotExist:
         raise TestcaseNotExistException
     return ResultResponse[testcase.TestCaseOut](result=case)
@@ -206,4 +270,5 @@ async def update_testcase(case_id: int, body: testcase.UpdateCaseIn):
     )
     if not update_count:
         raise TestcaseNotExistException
+    await ResourceVersion.bump("testcase", f"testcase:{case_id}")
     return ResultResponse[None](message="successful updated testcase!")
@@ -1,5 +1,4 @@
 from typing import Optional, Union
-from datetime import datetime
 from fastapi import APIRouter, Query, Request, Body, Depends
 from typing_extensions import Annotated
 from pydantic import StringConstraints
@@ -11,10 +10,14 @@ from ...services.autotest.testenv import TestEnvService
 from ...schemas import ResultResponse
 from ...utils.exceptions.testenv import TestEnvNotExistException
 from ...utils.log_util import log
+from ...repositories.filters import FilterSpec
 
 
 router = APIRouter()
 
+# 列表筛选
+TESTENV_FILTER = FilterSpec(TestEnv, text={"env_name": "env_name", "env_url": "env_url"})
+
 
 @router.post(
     "/add",
@@ -49,33 +52,23 @@ async def get_all_env(
     end_time: Optional[str] = Query(default=None, description="结束时间", alias="endTime"),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """获取环境变量列表"""
-    filters = {}
-    if env_name:
-        filters["env_name__icontains"] = env_name
-    if env_url:
-        filters["env_url__icontains"] = env_url
-    if begin_time:
-        begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-        filters["created_at__gte"] = begin_time
-    if end_time:
-        end_time = datetime.strptime(end_time, "%Y-%m-%d")
-        filters["created_at__lte"] = end_time
-    if begin_time and end_time:
-        filters["created_at__range"] = (
-            begin_time,
-            end_time,
-        )
+    filters = TESTENV_FILTER.compile(
+        begin_time=begin_time, end_time=end_time, env_name=env_name, env_url=env_url
+    )
     query = TestEnv.filter(**filters)
-    test_env_list = await query.offset(limit * (page - 1)).limit(limit).all()
-    total = await query.count()
+    test_env_list, total, next_cursor = await paginate(query, limit, page, cursor)
     return ResultResponse[testenv.TestEnvListOut](
         result=testenv.TestEnvListOut(
             data=test_env_list,
             page=page,
             limit=limit,
             total=total,
+            next_cursor=next_cursor,
         )
     )
 
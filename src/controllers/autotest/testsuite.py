@@ -1,6 +1,5 @@
 from typing import Optional
-from datetime import datetime
-from fastapi import APIRouter, Query, HTTPException, status, Request
+from fastapi import APIRouter, Query, HTTPException, status, Request, Response
 from typing_extensions import Annotated
 from pydantic import StringConstraints
 from fastapi.encoders import jsonable_encoder
@@ -10,19 +9,29 @@ from tortoise.transactions import in_transaction
 from celery.result import AsyncResult
 
 from ...schemas.autotest import testsuite
-from ...db.models import TestSuite, TestCase, TestSuiteTaskId
+from ...db.models import TestSuite, TestCase, TestSuiteTaskId, TESTSUITE_SEARCH_FIELDS
 from ...schemas import ResultResponse
-from ...utils.log_util import log
 from ...utils.exceptions.testsuite import TestsuiteNotExistException
 from ...utils.exceptions.testenv import CurrentTestEnvNotSetException
 from ...core.celery.task.testcase_task import task_test
 from ...services.autotest.testenv import TestEnvService
 from ...services.autotest.testsuite import TestSuiteSSEService
 from ...core.redis import RedisService
+from ...repositories import paginate
+from ...repositories.search import search
+from ...repositories.autotest.testsuite import TestSuiteRepository
+from ...repositories.filters import FilterSpec
+from ...core.etag import ResourceVersion, conditional_response
+from ...core.replica import use_primary
 
 
 router = APIRouter()
 
+# 列表筛选
+TESTSUITE_FILTER = FilterSpec(
+    TestSuite, text={"suite_title": "suite_title", "suite_no": "suite_no"}
+)
+
 
 @router.post(
     "/add",
@@ -31,7 +40,7 @@ router = APIRouter()
 )
 async def add_testsuite(body: testsuite.TestSuiteIn):
     """新增测试套件"""
-    async with in_transaction():
+    async with in_transaction("default"):
         # 新增
         result = await TestSuite.create(
             **body.model_dump(exclude_unset=True, exclude=["testcase_ids"])
@@ -63,40 +72,49 @@ async def get_all_testsuite(
     end_time: Optional[str] = Query(default=None, description="结束时间", alias="endTime"),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """获取所有测试套件"""
-    filters = {}
-    if suite_title:
-        filters["suite_title__icontains"] = suite_title
-    if suite_no:
-        filters["suite_no__icontains"] = suite_no
-    if begin_time:
-        begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-        filters["created_at__gte"] = begin_time
-    if end_time:
-        end_time = datetime.strptime(end_time, "%Y-%m-%d")
-        filters["created_at__lte"] = end_time
-    if begin_time and end_time:
-        filters["created_at__range"] = (
-            begin_time,
-            end_time,
-        )
-    query = TestSuite.filter(**filters)
-    suite_list = (
-        await query.prefetch_related(
-            "testcases", "task_id"
-        )  # 使用prefetch_related预取关联的testcase列表
-        .offset(limit * (page - 1))
-        .limit(limit)
-        .all()
+    filters = TESTSUITE_FILTER.compile(
+        begin_time=begin_time,
+        end_time=end_time,
+        suite_title=suite_title,
+        suite_no=suite_no,
     )
-    total = await query.count()
+    # 使用prefetch_related预取关联的testcase列表
+    query = TestSuite.filter(**filters).prefetch_related("testcases", "task_id")
+    suite_list, total, next_cursor = await paginate(query, limit, page, cursor)
     return ResultResponse[testsuite.TestSuiteListOut](
         result=testsuite.TestSuiteListOut(
             data=suite_list,
             page=page,
             limit=limit,
             total=total,
+            next_cursor=next_cursor,
+        )
+    )
+
+
+@router.get(
+    "/search",
+    summary="全文检索测试套件",
+    response_model=ResultResponse[testsuite.TestSuiteListOut],
+)
+async def search_testsuite(
+    keyword: str = Query(min_length=1, description="关键字, 匹配套件标题与备注"),
+    limit: Optional[int] = Query(default=20, ge=10),
+    page: Optional[int] = Query(default=1, gt=0),
+):
+    """全文检索测试套件, 按相关度排序"""
+    query = TestSuite.all().prefetch_related("testcases", "task_id")
+    suite_list, total = await search(
+        query, TESTSUITE_SEARCH_FIELDS, keyword, limit, page
+    )
+    return ResultResponse[testsuite.TestSuiteListOut](
+        result=testsuite.TestSuiteListOut(
+            data=suite_list, page=page, limit=limit, total=total
         )
     )
 
@@ -135,6 +153,7 @@ async def run_testsuite(body: testsuite.RunSuiteIn):
         await suite_task_id.save()
     else:
         await TestSuiteTaskId.create(testsuite_id=body.suite_id, task_id=task.id)
+    await ResourceVersion.bump(f"testsuite:{body.suite_id}")
     return ResultResponse[dict](
         result={"message": "Tests are running in the background.", "task_id": task.id}
     )
@@ -164,6 +183,9 @@ async def delete_testsuite(
     delete_count = await TestSuite.filter(id__in=source_ids_list).delete()
     if not delete_count:
         raise TestsuiteNotExistException
+    await ResourceVersion.bump(
+        *(f"testsuite:{suite_id}" for suite_id in source_ids_list)
+    )
     return ResultResponse[None](message="successful deleted testsuite!")
 
 
@@ -172,12 +194,19 @@ async def delete_testsuite(
     summary="获取指定testsuite",
     response_model=ResultResponse[testsuite.TestSuiteOut],
 )
-async def get_testsuite(suite_id: int):
+async def get_testsuite(request: Request, response: Response, suite_id: int):
     """获取指定测试套件"""
+    # 套件包含关联用例, 任一用例变更都需要重新获取
+    etag = await ResourceVersion.etag(f"testsuite:{suite_id}", "testcase")
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    # 响应带有最新版本的ETag, 数据必须读主库
     try:
-        result = await TestSuite.get(id=suite_id).prefetch_related(
-            "testcases", "task_id"
-        )
+        with use_primary():
+            result = await TestSuite.get(id=suite_id).prefetch_related(
+                "testcases", "task_id"
+            )
     except DoesNotExist:
         raise TestsuiteNotExistException
     return ResultResponse[testsuite.TestSuiteOut](result=result)
@@ -190,10 +219,9 @@ async def get_testsuite(suite_id: int):
 )
 async def update_testsuite(suite_id: int, body: testsuite.TestSuiteIn):
     """更新测试套件数据"""
-    suite = await TestSuite.get_or_none(id=suite_id).prefetch_related("testcases")
-    if not suite:
+    if not await TestSuite.exists(id=suite_id):
         raise TestsuiteNotExistException
-    async with in_transaction():
+    async with in_transaction("default"):
         # 更新
         await TestSuite.filter(id=suite_id).update(
             **body.model_dump(
@@ -202,22 +230,11 @@ async def update_testsuite(suite_id: int, body: testsuite.TestSuiteIn):
                 # by_alias=True,
             )
         )
-        # 更新关联用例
+        # 更新关联用例, 在数据库中按id集合同步
         if body.testcase_ids:
-            # 获取接口请求用例列表
-            case_list = await TestCase.filter(id__in=body.testcase_ids).all()
-            # 获取请求套件的用例列表
-            current_suite_case_list = await suite.testcases.all()
-            log.debug(current_suite_case_list)
-
-            # 确定需要添加和需要移除的ID
-            case_ids_to_add = list(set(case_list) - set(current_suite_case_list))
-            case_ids_to_remove = list(set(current_suite_case_list) - set(case_list))
-            log.debug(f"toadd:{case_ids_to_add},toremove:{case_ids_to_remove}")
-            # 添加/删除
-            await suite.testcases.add(*case_ids_to_add)
-            if case_ids_to_remove:
-                await suite.testcases.remove(*case_ids_to_remove)
-        # 刷新
-        await suite.refresh_from_db()
-        return ResultResponse[testsuite.TestSuiteOut](result=suite)
+            await TestSuiteRepository.sync_relation(
+                suite_id, "testcases", body.testcase_ids
+            )
+    suite = await TestSuite.get(id=suite_id).prefetch_related("testcases")
+    await ResourceVersion.bump(f"testsuite:{suite_id}")
+    return ResultResponse[testsuite.TestSuiteOut](result=suite)
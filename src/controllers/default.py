@@ -1,20 +1,27 @@
 """default标签路由访问控制"""
 
 import json
+import secrets
 from typing import List
-from fastapi import APIRouter, Depends, Request, HTTPException, status
+from fastapi import APIRouter, Depends, Request, Response, HTTPException, status
+from fastapi.responses import PlainTextResponse
 
 from src.schemas.management import menu
 from src.core.security import (
     create_access_token,
     check_jwt_auth,
+    revoke_token,
     get_current_user as current_user,
 )
-from passlib.hash import md5_crypt
 from tortoise.exceptions import DoesNotExist
-from tortoise.query_utils import Prefetch
 from src.core.redis import RedisService
-from src.db.models import Users, Routes
+from src.core.password import PasswordHasher
+from src.core.premission import PermissionAccess
+from src.core.metrics import MetricsPublisher, render_prometheus
+from src.core.etag import ResourceVersion, conditional_response
+from src.core.menu_cache import MenuCache
+from src.config import config
+from src.db.models import Users
 from src.schemas import ResultResponse, default
 from src.utils.exceptions.user import (
     UserUnavailableException,
@@ -22,8 +29,8 @@ from src.utils.exceptions.user import (
     UserNotExistException,
     TokenInvalidException,
 )
-from src.utils.log_util import log
 from src.services import UserService
+from src.repositories.management.menu import MenuRepository
 
 router = APIRouter()
 
@@ -38,6 +45,8 @@ async def login(
     body: default.LoginIn,
 ):
     """用户登陆."""
+    # 先读取RBAC版本再查询角色, 期间发生的权限变更会使token中的声明失效而非被掩盖
+    permission_version = await PermissionAccess.get_version()
     # 查询数据库有无此用户
     try:
         query_user = await UserService.query_user_by_username(username=body.username)
@@ -47,10 +56,23 @@ async def login(
     if not query_user.status:
         raise UserUnavailableException
     # 验证密码
-    if not md5_crypt.verify(secret=body.password, hash=query_user.password):
+    verified, new_hash = await PasswordHasher.verify(body.password, query_user.password)
+    if not verified:
         raise PasswordValidateErrorException
+    # 哈希算法变更后, 登录时升级为新算法
+    if new_hash:
+        await Users.filter(id=query_user.id).update(password=new_hash)
     # 创建jwt
-    access_token = create_access_token(data={"sub": query_user.user_name})
+    # 角色与权限版本写入token, 版本未变更时鉴权无需查询数据库
+    access_token = create_access_token(
+        data={
+            "sub": query_user.user_name,
+            "uid": query_user.id,
+            "roles": [role.role_key for role in query_user.roles],
+            "is_super": any(role.is_super for role in query_user.roles),
+            "pv": permission_version,
+        }
+    )
     return ResultResponse[default.LoginOut](
         result=default.LoginOut(
             data=query_user,
@@ -66,12 +88,10 @@ async def login(
     response_model=ResultResponse[None],
     # dependencies=[Depends(check_jwt_auth)],
 )
-async def logout(request: Request, current_user=Depends(current_user)):
+async def logout(request: Request, payload: dict = Depends(check_jwt_auth)):
     access_type, access_token = request.headers["authorization"].split(" ")
-    # token加入黑名单列表
-    await RedisService().aioredis_pool.lpush(
-        current_user.user_name + "-token-blacklist", access_token
-    )
+    # 注销token
+    await revoke_token(payload, access_token)
     return ResultResponse[None](message="Successfully logged out!")
 
 
@@ -81,56 +101,41 @@ async def logout(request: Request, current_user=Depends(current_user)):
     response_model=ResultResponse[List[menu.MenuTo]],
     dependencies=[Depends(check_jwt_auth)],
 )
-async def get_routers(current_user=Depends(current_user)):
-    # 判断是否是admin角色用户, admin获取所有一级路由, 筛选status
+async def get_routers(
+    request: Request, response: Response, current_user=Depends(current_user)
+):
+    # 菜单与角色权限都未变更时返回304
+    etag = await ResourceVersion.etag(
+        "menu",
+        extra_keys=[PermissionAccess.VERSION_KEY],
+        extra=sorted(role.id for role in current_user.roles),
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    # 同一角色集合的用户共享缓存, 命中时不查询数据库也不构建pydantic响应
+    body = await MenuCache.get_or_build(etag, lambda: build_routers(current_user))
+    return Response(
+        body,
+        media_type="application/json",
+        headers={key: response.headers[key] for key in ("etag", "cache-control")},
+    )
+
+
+async def build_routers(current_user) -> str:
+    """查询当前用户可访问的路由菜单并序列化为响应体"""
+    # 判断是否是admin角色用户, admin获取所有可用路由
     is_super = any(role.is_super for role in current_user.roles)
     if is_super:
-        route_list = await Routes.filter(
-            parent_id__isnull=True, status=1
-        ).prefetch_related(
-            Prefetch(
-                "children",
-                queryset=Routes.filter(status=1).prefetch_related(),
-            ),
-            "children__route_meta",
-            "route_meta",
-        )
-    # 根据menus权限获取
+        route_list = await MenuRepository.fetch_flat(status=1)
+    # 根据角色的menus权限获取, 父菜单无权限时其子菜单不显示
     else:
-        # 查询当前用户角色的路由权限
-        user = (
-            await Users.filter(id=current_user.id)
-            .prefetch_related("roles__menus")
-            .first()
+        route_list = await MenuRepository.fetch_flat(
+            status=1, menus__id__in=[role.id for role in current_user.roles]
         )
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="This user cannot access the routing menu!",
-            )
-        # 获取角色关联的所有菜单
-        all_menus = {menu for role in user.roles for menu in role.menus}
-        log.debug(all_menus)
-        # 获取当前角色有权限的子路由的 ID 列表
-        # 子路由
-        sub_menus = [menu.id for menu in all_menus if menu.parent_id]
-        # 父路由
-        parent_menus = [menu.id for menu in all_menus if not menu.parent_id]
-        log.debug(f"子路由：{sub_menus},父路由：{parent_menus}")
-        # 使用Prefetch对预取进行复杂的查询，查询当前角色的子菜单
-        route_list = await Routes.filter(
-            id__in=parent_menus, status=1
-        ).prefetch_related(
-            # 使用Prefetch时，正常的prefetch_related操作也要查询
-            Prefetch(
-                "children",
-                queryset=Routes.filter(id__in=sub_menus, status=1).prefetch_related(),
-            ),
-            "children__route_meta",
-            "route_meta",
-        )
-
-    return ResultResponse[List[menu.MenuTo]](result=route_list)
+    return ResultResponse[List[menu.MenuTo]](
+        result=menu.MenuTo.build_tree(route_list)
+    ).model_dump_json(by_alias=True)
 
 
 @router.get(
@@ -149,3 +154,28 @@ async def statistics_data():
     except Exception:
         raise HTTPException(status_code=500,detail="redis错误")
     return ResultResponse[default.StatisticsOut](result=statistics_data_dict)
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus指标",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def metrics(request: Request):
+    """合并所有worker的指标, 输出Prometheus文本格式."""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if config.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("Authorization", "").encode(),
+        f"Bearer {config.METRICS_TOKEN}".encode(),
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    snapshots = await MetricsPublisher.collect_all()
+    return PlainTextResponse(
+        render_prometheus(snapshots),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,8 +1,15 @@
 """用户管理访问控制"""
 
-from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
 from typing_extensions import Annotated
 from pydantic import StringConstraints
 from tortoise.transactions import in_transaction
@@ -13,6 +20,12 @@ from ...schemas import ResultResponse
 from ...db.models import Role, Permission, Routes
 from ...utils.log_util import log
 from ...core.authentication import Authority
+from ...core.premission import PermissionAccess
+from ...core.etag import ResourceVersion, conditional_response
+from ...core.replica import use_primary
+from ...repositories import paginate
+from ...repositories.filters import FilterSpec
+from ...repositories.management.role import RoleRepository
 from ...utils.exceptions.user import RoleNotExistException
 from ...utils.exceptions.admin import (
     PermissionExistException,
@@ -22,6 +35,17 @@ from ...utils.exceptions.admin import (
 
 router = APIRouter()
 
+# 列表筛选
+ROLE_FILTER = FilterSpec(Role, text={"role_name": "role_name", "role_key": "role_key"})
+PERMISSION_FILTER = FilterSpec(
+    Permission,
+    text={
+        "permission_name": "name",
+        "permission_module": "model",
+        "permission_action": "action",
+    },
+)
+
 
 @router.get(
     "/role/list",
@@ -43,39 +67,28 @@ async def query_roles(
     ),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """获取角色列表"""
     # 筛选列表
-    filters = {}
-    if role_name:
-        filters["role_name__icontains"] = role_name
-    if role_key:
-        filters["role_key__icontains"] = role_key
-    if begin_time:
-        begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-        filters["created_at__gte"] = begin_time
-    if end_time:
-        end_time = datetime.strptime(end_time, "%Y-%m-%d")
-        filters["created_at__lte"] = end_time
-    if begin_time and end_time:
-        filters["created_at__range"] = (
-            begin_time,
-            end_time,
-        )
+    filters = ROLE_FILTER.compile(
+        begin_time=begin_time, end_time=end_time, role_name=role_name, role_key=role_key
+    )
     # 执行查询
-    query = Role.filter(**filters)
-    result = (
-        await query.prefetch_related(
-            "permissions", "menus__children__route_meta", "menus__route_meta"
-        )
-        .offset(limit * (page - 1))
-        .limit(limit)
-        .all()
+    query = Role.filter(**filters).prefetch_related(
+        "permissions", "menus__children__route_meta", "menus__route_meta"
     )
-    # total
-    total = await query.count()
+    result, total, next_cursor = await paginate(query, limit, page, cursor)
     return ResultResponse[admin.RoleListOut](
-        result=admin.RoleListOut(data=result, page=page, limit=limit, total=total)
+        result=admin.RoleListOut(
+            data=result,
+            page=page,
+            limit=limit,
+            total=total,
+            next_cursor=next_cursor,
+        )
     )
 
 
@@ -102,32 +115,27 @@ async def query_permissions(
     ),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """查询所有权限"""
-    filters = {}
-    if permission_name:
-        filters["name__icontains"] = permission_name
-    if permission_module:
-        filters["model__icontains"] = permission_module
-    if permission_action:
-        filters["action__icontains"] = permission_action
-    if begin_time:
-        begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-        filters["created_at__gte"] = begin_time
-    if end_time:
-        end_time = datetime.strptime(end_time, "%Y-%m-%d")
-        filters["created_at__lte"] = end_time
-    if begin_time and end_time:
-        filters["created_at__range"] = (
-            begin_time,
-            end_time,
-        )
+    filters = PERMISSION_FILTER.compile(
+        begin_time=begin_time,
+        end_time=end_time,
+        permission_name=permission_name,
+        permission_module=permission_module,
+        permission_action=permission_action,
+    )
     query = Permission.filter(**filters)
-    permissions = await query.offset(limit * (page - 1)).limit(limit).all()
-    total = await query.count()
+    permissions, total, next_cursor = await paginate(query, limit, page, cursor)
     return ResultResponse[admin.PermissionListOut](
         result=admin.PermissionListOut(
-            data=permissions, page=page, limit=limit, total=total
+            data=permissions,
+            page=page,
+            limit=limit,
+            total=total,
+            next_cursor=next_cursor,
         )
     )
 
@@ -147,7 +155,7 @@ async def add_role(body: admin.RoleIn):
     Returns:
         _type_: _description_
     """
-    async with in_transaction():
+    async with in_transaction("default"):
         # 新增role
         role_obj = await Role.create(
             **body.model_dump(
@@ -175,7 +183,8 @@ async def add_role(body: admin.RoleIn):
             .prefetch_related("permissions", "menus")
             .first()
         )
-        return ResultResponse[admin.RoleOut](result=query)
+    await PermissionAccess.bump_version()
+    return ResultResponse[admin.RoleOut](result=query)
 
 
 @router.post(
@@ -190,6 +199,7 @@ async def add_permission(body: admin.PermissionIn):
     if fetch_permission:
         raise PermissionExistException
     permission = await Permission.create(**body.model_dump(exclude_unset=True))
+    await PermissionAccess.bump_version()
     return ResultResponse[admin.PermissionOut](result=permission)
 
 
@@ -220,6 +230,7 @@ async def delete_role(
     deleted_count = await Role.filter(id__in=resource_ids_list).delete()
     if not deleted_count:
         raise RoleNotExistException
+    await PermissionAccess.bump_version()
     return ResultResponse[None](message="successful deleted role!")
 
 
@@ -238,6 +249,7 @@ async def del_permission(
     permission = await Permission.filter(id__in=resource_ids_list).delete()
     if not permission:
         raise PermissionNotExistException
+    await PermissionAccess.bump_version()
     return ResultResponse[None](message="successful deleted permission!")
 
 
@@ -247,6 +259,8 @@ async def del_permission(
     response_model=ResultResponse[admin.RoleOut],
 )
 async def get_role(
+    request: Request,
+    response: Response,
     role_id: int,
 ):
     """获取角色
@@ -254,21 +268,30 @@ async def get_role(
     Args:
         role_id (int): 角色id
     """
+    # 角色、权限、角色菜单的变更都会递增rbac版本
+    etag = await ResourceVersion.etag(
+        "menu", extra_keys=[PermissionAccess.VERSION_KEY], extra=[role_id]
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
     # role = await Role.filter(id=role_id).prefetch_related("permissions","menus__children__route_meta","menus__route_meta").first()
-    role = (
-        await Role.filter(id=role_id)
-        .prefetch_related(
-            "permissions",
-            "menus__children__route_meta",
-            "menus__route_meta",
-            # 只查询子菜单
-            Prefetch(
-                "menus",
-                queryset=Routes.filter(parent_id__isnull=False).prefetch_related(),
-            ),
+    # 响应带有最新版本的ETag, 数据必须读主库
+    with use_primary():
+        role = (
+            await Role.filter(id=role_id)
+            .prefetch_related(
+                "permissions",
+                "menus__children__route_meta",
+                "menus__route_meta",
+                # 只查询子菜单
+                Prefetch(
+                    "menus",
+                    queryset=Routes.filter(parent_id__isnull=False).prefetch_related(),
+                ),
+            )
+            .first()
         )
-        .first()
-    )
     if not role:
         raise RoleNotExistException
     return ResultResponse[admin.RoleOut](result=role)
@@ -281,10 +304,9 @@ async def get_role(
 )
 async def update_role(role_id: int, body: admin.RoleIn):
     """修改角色"""
-    role = await Role.get_or_none(id=role_id).prefetch_related("permissions", "menus")
-    if not role:
+    if not await Role.exists(id=role_id):
         raise RoleNotExistException
-    async with in_transaction():
+    async with in_transaction("default"):
         # 更新role
         await Role.filter(id=role_id).update(
             **body.model_dump(
@@ -293,25 +315,15 @@ async def update_role(role_id: int, body: admin.RoleIn):
                 # by_alias=True,
             )
         )
-        # 更新关联菜单
+        # 更新关联菜单与权限, 在数据库中按id集合同步
         if body.menu_ids:
-            # 获取接口请求菜单列表
-            menu_list = await Routes.filter(id__in=body.menu_ids).all()
-            # 获取请求角色菜单列表
-            current_role_menu_list = await role.menus.all()
-            log.debug(current_role_menu_list)
-
-            # 确定需要添加和需要移除的菜单 ID
-            menu_ids_to_add = list(set(menu_list) - set(current_role_menu_list))
-            menu_ids_to_remove = list(set(current_role_menu_list) - set(menu_list))
-            log.debug(f"toadd:{menu_ids_to_add},toremove:{menu_ids_to_remove}")
-            # 添加/删除
-            await role.menus.add(*menu_ids_to_add)
-            if menu_ids_to_remove:
-                await role.menus.remove(*menu_ids_to_remove)
-        # 刷新
-        # await role.refresh_from_db()
-        return ResultResponse[None](message="successful updated role!")
+            await RoleRepository.sync_relation(role_id, "menus", body.menu_ids)
+        if body.permission_ids:
+            await RoleRepository.sync_relation(
+                role_id, "permissions", body.permission_ids
+            )
+    await PermissionAccess.bump_version()
+    return ResultResponse[None](message="successful updated role!")
 
 
 @router.get(
@@ -341,4 +353,5 @@ async def update_permission(permission_id: int, body: admin.PermissionUpdateIn):
     )
     if not permission:
         raise PermissionNotExistException
+    await PermissionAccess.bump_version()
     return ResultResponse[None](message="successful updated permission!")
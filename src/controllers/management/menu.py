@@ -1,17 +1,25 @@
 from typing import List, Optional
-from datetime import datetime
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 from tortoise.transactions import in_transaction
-from tortoise.query_utils import Prefetch
 
 from ...schemas.management import menu
 from ...db.models import Routes, RouteMeta
 from ...schemas import ResultResponse
 from ...utils.exceptions.menu import MenuNotExistException
 from ...utils.log_util import log
+from ...core.etag import ResourceVersion, conditional_response
+from ...core.replica import use_primary
+from ...repositories import paginate
+from ...repositories.filters import FilterSpec
+from ...repositories.management.menu import MenuRepository
 
 router = APIRouter()
 
+# 列表筛选
+MENU_FILTER = FilterSpec(
+    Routes, text={"menuname": "route_meta__title"}, exact={"status": "status"}
+)
+
 
 @router.get(
     "/list",
@@ -29,44 +37,30 @@ async def menu_list(
     end_time: Optional[str] = Query(default=None, description="结束时间", alias="endTime"),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """获取菜单列表"""
-    filters = {}
-    if menuname:
-        filters["route_meta__title__icontains"] = menuname
-    if status:
-        filters["status"] = status
-    if begin_time:
-        begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-        filters["created_at__gte"] = begin_time
-    if end_time:
-        end_time = datetime.strptime(end_time, "%Y-%m-%d")
-        filters["created_at__lte"] = end_time
-    if begin_time and end_time:
-        filters["created_at__range"] = (
-            begin_time,
-            end_time,
-        )
-    if filters:
-        query = Routes.filter(parent_id__isnull=True)
-    else:
-        query = Routes.filter(**filters,parent_id__isnull=True)
-    menu_list = (
-        await query.prefetch_related(
-            Prefetch(
-                "children",
-                queryset=Routes.filter(**filters).prefetch_related(),
-            ),
-            "children__route_meta",
-            "route_meta",
-        )
-        .offset(limit * (page - 1))
-        .limit(limit)
-        .all()
+    filters = MENU_FILTER.compile(
+        begin_time=begin_time, end_time=end_time, menuname=menuname, status=status
+    )
+    query = Routes.filter(**filters, parent_id__isnull=True).select_related(
+        "route_meta"
+    )
+    menu_list, total, next_cursor = await paginate(query, limit, page, cursor)
+    # 只查询当前页根菜单的子孙菜单, 查询数与层级无关
+    descendants = await MenuRepository.fetch_descendants(
+        [route.id for route in menu_list], **filters
     )
-    total = await query.count()
     return ResultResponse[menu.MenuListOut](
-        result=menu.MenuListOut(data=menu_list, page=page, limit=limit, total=total)
+        result=menu.MenuListOut(
+            data=menu.MenuTo.build_tree(descendants, roots=menu_list),
+            page=page,
+            limit=limit,
+            total=total,
+            next_cursor=next_cursor,
+        )
     )
 
 
@@ -75,12 +69,18 @@ async def menu_list(
     summary="查询菜单树结构",
     response_model=ResultResponse[List[menu.TreeSelectOut]],
 )
-async def get_treeselect():
+async def get_treeselect(request: Request, response: Response):
     """查询菜单树结构"""
-    route_list = await Routes.filter(parent_id__isnull=True).prefetch_related(
-        "children__route_meta", "route_meta"
+    etag = await ResourceVersion.etag("menu")
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    # 响应带有最新版本的ETag, 数据必须读主库
+    with use_primary():
+        route_list = await MenuRepository.fetch_flat()
+    return ResultResponse[List[menu.TreeSelectOut]](
+        result=menu.TreeSelectOut.build_tree(route_list)
     )
-    return ResultResponse[List[menu.TreeSelectOut]](result=route_list)
 
 
 @router.post(
@@ -90,7 +90,7 @@ async def get_treeselect():
 )
 async def add_menu(body: menu.AddMenuIn):
     """添加前端路由菜单"""
-    async with in_transaction():
+    async with in_transaction("default"):
         # 添加路由meta
         route_meta = await RouteMeta.create(**body.meta.model_dump(exclude_unset=True))
         # 路由
@@ -98,8 +98,8 @@ async def add_menu(body: menu.AddMenuIn):
             **body.model_dump(exclude_unset=True, exclude=["meta"]),
             route_meta=route_meta,
         )
-
-        return ResultResponse[menu.MenuTo](result=route)
+    await ResourceVersion.bump("menu")
+    return ResultResponse[menu.MenuTo](result=route)
 
 
 @router.get(
@@ -109,14 +109,12 @@ async def add_menu(body: menu.AddMenuIn):
 )
 async def get_menu(menu_id: int):
     """查询菜单"""
-    query = (
-        await Routes.filter(id=menu_id)
-        .prefetch_related("children__route_meta", "route_meta")
-        .first()
-    )
-    if not query:
+    nodes = await MenuRepository.fetch_subtree(menu_id)
+    if not nodes:
         raise MenuNotExistException
-    return ResultResponse[menu.MenuTo](result=query)
+    return ResultResponse[menu.MenuTo](
+        result=menu.MenuTo.build_tree(nodes, roots=nodes[:1])[0]
+    )
 
 
 @router.put(
@@ -142,12 +140,13 @@ async def update_menu(menu_id: int, body: menu.MenuUpdateIn):
         query.route_meta.no_cache = body.meta.no_cache
     if body.meta.link:
         query.route_meta.link = body.meta.link
-    async with in_transaction():
+    async with in_transaction("default"):
         # 更新多个字段
         query.update_from_dict(body.model_dump(exclude_unset=True))
         # 修改关联模型数据需要save
         await query.route_meta.save()
         await query.save()
+    await ResourceVersion.bump("menu")
     return ResultResponse[None](message="successful updated menu!")
 
 
@@ -161,4 +160,5 @@ async def del_menu(menu_id: int):
     delete_count = await Routes.filter(id=menu_id).delete()
     if not delete_count:
         raise MenuNotExistException
+    await ResourceVersion.bump("menu")
     return ResultResponse[None](message="successful deleted menu!")
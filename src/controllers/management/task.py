@@ -40,18 +40,28 @@ async def get_task_list(
     ),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """获取task列表"""
-    result, total = await TaskService.query_task_list(
+    result, total, next_cursor = await TaskService.query_task_list(
         task_name=task_name,
         task_status=task_status,
         begin_time=begin_time,
         end_time=end_time,
         limit=limit,
         page=page,
+        cursor=cursor,
     )
     return ResultResponse[TaskListOut](
-        result=TaskListOut(data=result, page=page, limit=limit, total=total)
+        result=TaskListOut(
+            data=result,
+            page=page,
+            limit=limit,
+            total=total,
+            next_cursor=next_cursor,
+        )
     )
 
 
@@ -1,7 +1,10 @@
 """用户访问控制"""
 
+import tempfile
+from pathlib import Path
 from typing import Optional, Annotated
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, UploadFile, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import StringConstraints
 from ...schemas.management.user import (
     UserListOut,
@@ -15,10 +18,11 @@ from ...core.security import (
     get_current_user as current_user,
 )
 from ...core.authentication import Authority
-from ...db.models import Users
 from ...schemas import ResultResponse
 from ...utils.log_util import log
+from ...utils.excel_util import save_file, read_table
 from ...services import UserService
+from ...utils.exceptions.user import UserImportFileException
 
 
 router = APIRouter()
@@ -50,18 +54,28 @@ async def get_users(
     ),
     limit: Optional[int] = Query(default=20, ge=10),
     page: Optional[int] = Query(default=1, gt=0),
+    cursor: Optional[str] = Query(
+        default=None, description="分页游标, 传入上一页的nextCursor时忽略page"
+    ),
 ):
     """获取用户列表"""
-    result, total = await UserService.query_user_list(
+    result, total, next_cursor = await UserService.query_user_list(
         username=username,
         user_status=user_status,
         begin_time=begin_time,
         end_time=end_time,
         limit=limit,
         page=page,
+        cursor=cursor,
     )
     return ResultResponse[UserListOut](
-        result=UserListOut(data=result, page=page, limit=limit, total=total)
+        result=UserListOut(
+            data=result,
+            page=page,
+            limit=limit,
+            total=total,
+            next_cursor=next_cursor,
+        )
     )
 
 
@@ -70,7 +84,7 @@ async def get_users(
     summary="获取当前用户信息",
     response_model=ResultResponse[UserOut],
 )
-async def get_current_user(cur_user: Users = Depends(current_user)):
+async def get_current_user(cur_user: UserOut = Depends(current_user)):
     """获取当前用户"""
     return ResultResponse[UserOut](result=cur_user)
 
@@ -87,6 +101,47 @@ async def create_user(body: UserIn):
     return ResultResponse[UserOut](result=created_user)
 
 
+@router.post(
+    "/import",
+    summary="批量导入用户",
+    response_model=ResultResponse[None],
+    dependencies=[Depends(Authority("user", "add"))],
+)
+async def import_users(file: UploadFile):
+    """从csv/excel批量导入用户, 表头: userName,password,roleKeys,status,remark"""
+    if not file.filename.endswith(("xlsx", "csv")):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="file suffix is error!"
+        )
+    # 文件包含明文密码, 只保存在临时目录中, 读取后删除
+    with tempfile.TemporaryDirectory() as tmpdir:
+        save_path = Path(tmpdir) / Path(file.filename).name
+        await save_file(file=file, save_path=save_path)
+        try:
+            rows = await read_table(save_path)
+        except ValueError as e:
+            log.warning(f"导入用户文件{file.filename}解析失败: {e}")
+            raise UserImportFileException()
+    result = await UserService.import_users(rows)
+    return ResultResponse[None](
+        message=f"Successful import {file.filename}, {result.rows} users!"
+    )
+
+
+@router.get(
+    "/export",
+    summary="导出用户",
+    dependencies=[Depends(Authority("user", "query"))],
+)
+async def export_users():
+    """流式导出用户csv"""
+    return StreamingResponse(
+        UserService.export_users(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+    )
+
+
 @router.put(
     "/resetPwd",
     summary="重置用户密码",
@@ -1,9 +1,7 @@
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.exceptions import HTTPException
-from .security import get_current_user
+from .security import check_jwt_auth, get_current_user
 from .premission import PermissionAccess
-from ..db.models import Users
-from ..services.management.user import UserService
 
 
 
@@ -18,19 +16,33 @@ class Authority:
         self.model = model
         self.action = action
 
-    async def __call__(self, current_user: Users = Depends(get_current_user)):
+    async def __call__(self, request: Request, payload: dict = Depends(check_jwt_auth)):
         """
         fastapi依赖类call方法
+
+        token中的权限版本与当前RBAC版本一致时, 直接按token中的角色声明鉴权;
+        否则(权限已变更或旧token)回退到按用户查询权限.
         :param request:
+        :param payload: 已校验的token payload
         :return:
         """
+        version = await PermissionAccess.get_version()
+        if payload.get("pv") == version and "roles" in payload:
+            # 超级用户拥有所有权限
+            if payload.get("is_super"):
+                return
+            permissions = await PermissionAccess.get_role_permissions(
+                payload["roles"], version
+            )
+        else:
+            user_id = payload.get("uid")
+            if user_id is None:
+                user_id = (await get_current_user(request, payload)).id
+            decision = await PermissionAccess.get_decision(user_id)
+            # 超级用户拥有所有权限
+            if decision.is_super:
+                return
+            permissions = decision.permissions
 
-        # 超级用户拥有所有权限
-        is_super = await UserService.is_super_user(current_user.id)
-        if is_super:
-            return
-
-        if not await PermissionAccess.has_access(
-            current_user.id, self.model, self.action
-        ):
+        if (self.model, self.action) not in permissions:
             raise HTTPException(status_code=403, detail="The user has no permission!")
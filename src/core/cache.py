@@ -0,0 +1,70 @@
+"""进程内缓存"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LocalCache:
+    """进程内LRU缓存, 支持条目级过期时间
+
+    每个gunicorn worker各自持有一份, 跨worker的一致性由调用方通过
+    redis中的版本号/失效键保证.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            maxsize (int): 最大条目数, 超出时淘汰最久未使用的条目
+            ttl (Optional[float]): 默认过期时间(s), None为不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存, 过期或不存在返回default"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        value, expire_at = item
+        if expire_at is not None and expire_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存
+
+        Args:
+            key (Hashable): 缓存键
+            value (Any): 缓存值
+            ttl (Optional[float]): 本条目过期时间(s), 不传使用默认ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (value, expire_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """删除缓存"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """命中统计"""
+        return dict(size=len(self._data), hits=self.hits, misses=self.misses)
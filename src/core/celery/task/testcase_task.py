@@ -5,6 +5,7 @@ from .base import BaseTaskWithTest
 from ..celery_app import celery
 from src.autotest.utils.formatter import publish_format
 from src.core.redis import RedisService
+from src.core.staticfiles import precompress_directory
 from src.utils.log_util import log
 from src.services.autotest.testsuite import TestSuiteSSEService
 from src.config import config
@@ -50,6 +51,9 @@ def task_test(self, testsuite_data: list, suite_id: int) -> tuple:
         )
         raise e
     else:
+        # 报告生成后即预压缩, 浏览报告时直接返回压缩文件
+        if config.STATIC_PRECOMPRESS:
+            precompress_directory(allure_report_dir)
         RedisService().redis_pool.publish(
             self.request.id + "-sse_data", publish_format("生成allure报告成功", 0)
         )
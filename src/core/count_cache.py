@@ -0,0 +1,125 @@
+"""分页总数缓存
+
+列表总数按count语句(已内联筛选值, 即规范化的筛选签名)缓存在redis中,
+缓存键包含语句涉及的所有表的写版本; 任何INSERT/UPDATE/DELETE都会递增对应表的版本,
+旧缓存随即失效.
+"""
+
+import re
+import hashlib
+import functools
+from typing import List, Optional
+from tortoise import connections
+from tortoise.queryset import QuerySet
+from src.config import config
+from .redis import RedisService
+from .replica import use_primary
+from .timing import db_client_classes
+
+# count语句涉及的表
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+[`\"](\w+)[`\"]", re.IGNORECASE)
+# 写语句的目标表
+_WRITE_PATTERN = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+[`\"](\w+)[`\"]",
+    re.IGNORECASE,
+)
+
+
+class CountCache:
+    """分页总数缓存"""
+
+    VERSION_KEY = "count:version:{table}"
+    KEY = "count:{digest}"
+
+    @classmethod
+    async def bump(cls, *tables: str) -> None:
+        """递增表的写版本"""
+        if not tables:
+            return
+        async with RedisService().aioredis_pool.pipeline(transaction=False) as pipe:
+            for table in tables:
+                pipe.incr(cls.VERSION_KEY.format(table=table))
+            await pipe.execute()
+
+    @classmethod
+    async def count(cls, query: QuerySet) -> int:
+        """获取查询总数, 优先使用缓存
+
+        未筛选的大表在开启COUNT_ESTIMATE_UNFILTERED时使用information_schema中的估算行数.
+        """
+        if not config.COUNT_CACHE_ENABLED:
+            return await query.count()
+        # 总数缓存在新的表版本下, 必须读主库; sql()会选定并固定连接, 因此在use_primary内构建
+        with use_primary():
+            return await cls._count(query)
+
+    @classmethod
+    async def _count(cls, query: QuerySet) -> int:
+        """count的实现, 调用方已切换到主库"""
+        count_query = query.using_db(query.model._choose_db()).count()
+        sql = count_query.sql()
+        tables = sorted(set(_TABLE_PATTERN.findall(sql)))
+        redis = RedisService().aioredis_pool
+        versions = await redis.mget(
+            [cls.VERSION_KEY.format(table=table) for table in tables]
+        )
+        digest = hashlib.sha1(
+            f"{sql}|{','.join(v or '0' for v in versions)}".encode()
+        ).hexdigest()
+        key = cls.KEY.format(digest=digest)
+        cached = await redis.get(key)
+        if cached is not None:
+            return int(cached)
+
+        total = None
+        if (
+            config.COUNT_ESTIMATE_UNFILTERED
+            and len(tables) == 1
+            and not re.search(r"\bWHERE\b", sql, re.IGNORECASE)
+        ):
+            total = await cls._estimated_count(query.model, tables[0])
+        if total is None:
+            total = await count_query
+        await redis.set(key, total, ex=config.COUNT_CACHE_EXPIRE)
+        return total
+
+    @staticmethod
+    async def _estimated_count(model, table: str) -> Optional[int]:
+        """mysql估算行数, 小于阈值时返回None以使用精确count"""
+        if config.DB_ENGINE != "mysql":
+            return None
+        client = connections.get(model._meta.default_connection)
+        rows: List[dict] = await client.execute_query_dict(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [table],
+        )
+        if not rows or rows[0]["TABLE_ROWS"] is None:
+            return None
+        estimated = int(rows[0]["TABLE_ROWS"])
+        return estimated if estimated >= config.COUNT_ESTIMATE_THRESHOLD else None
+
+
+def _track_writes(func):
+    """写语句执行成功后递增目标表的写版本"""
+    if getattr(func, "__track_writes__", False):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(self, query, *args, **kwargs):
+        result = await func(self, query, *args, **kwargs)
+        match = _WRITE_PATTERN.match(query) if isinstance(query, str) else None
+        if match:
+            await CountCache.bump(match.group(1))
+        return result
+
+    wrapper.__track_writes__ = True
+    return wrapper
+
+
+def install_count_cache_hooks() -> None:
+    """为tortoise client的写方法安装版本递增钩子, 重复调用无副作用"""
+    for cls in db_client_classes():
+        for name in ("execute_insert", "execute_many", "execute_query"):
+            if name in cls.__dict__:
+                setattr(cls, name, _track_writes(cls.__dict__[name]))
@@ -1,11 +1,17 @@
 from fastapi import FastAPI
 from tortoise.contrib.fastapi import register_tortoise
 from src.config import config
+from .replica import (
+    PRIMARY_CONNECTION,
+    REPLICA_CONNECTION,
+    ReadReplicaRouter,
+    replica_enabled,
+)
 
 # orm config
 TORTOISE_ORM = {
     "connections": {
-        "default": {
+        PRIMARY_CONNECTION: {
             "engine": f"tortoise.backends.{config.DB_ENGINE}",  # 指定数据库，必须参数
             "credentials": {
                 "host": config.DB_HOST,  # 数据库地址
@@ -19,7 +25,7 @@ TORTOISE_ORM = {
     "apps": {
         "models": {
             "models": ["aerich.models", config.MODELS_PATH],
-            "default_connection": "default",
+            "default_connection": PRIMARY_CONNECTION,
         }
     },
     "use_tz": config.USE_TZ,
@@ -27,6 +33,20 @@ TORTOISE_ORM = {
     "timezone": config.TZ,
 }
 
+# 只读副本, 读查询由ReadReplicaRouter路由
+if replica_enabled():
+    TORTOISE_ORM["connections"][REPLICA_CONNECTION] = {
+        "engine": f"tortoise.backends.{config.DB_ENGINE}",
+        "credentials": {
+            "host": config.DB_REPLICA_HOST,
+            "port": config.DB_REPLICA_PORT or config.DB_PORT,
+            "user": config.DB_USER,
+            "password": config.DB_PASSWORD,
+            "database": config.DB_DATEBASE,
+        },
+    }
+    TORTOISE_ORM["routers"] = [ReadReplicaRouter]
+
 
 def register_db(app: FastAPI):
     """注册tortoise
@@ -0,0 +1,94 @@
+"""条件请求(ETag/304)
+
+资源的ETag由redis中的资源版本号计算, 写操作提交后调用ResourceVersion.bump;
+版本未变化时直接返回304, 不查询数据库也不构建pydantic响应.
+"""
+
+import json
+import hashlib
+from uuid import uuid4
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from .redis import RedisService
+
+
+class ResourceVersion:
+    """资源版本号
+
+    redis被清空后版本号会从0重新开始, 因此ETag中还包含一个随机纪元,
+    避免新旧数据得到相同的ETag.
+    """
+
+    KEY = "version:{resource}"
+    EPOCH_KEY = "version:epoch"
+
+    @classmethod
+    def key(cls, resource: str) -> str:
+        return cls.KEY.format(resource=resource)
+
+    @classmethod
+    async def bump(cls, *resources: str) -> None:
+        """递增资源版本, 需要在变更事务提交之后调用"""
+        if not resources:
+            return
+        async with RedisService().aioredis_pool.pipeline(transaction=False) as pipe:
+            for resource in resources:
+                pipe.incr(cls.key(resource))
+            await pipe.execute()
+
+    @classmethod
+    async def etag(
+        cls,
+        *resources: str,
+        extra_keys: Iterable[str] = (),
+        extra: Iterable = (),
+    ) -> str:
+        """根据资源版本计算弱ETag
+
+        Args:
+            *resources (str): 资源名, 例如"menu"、"testcase:1"
+            extra_keys (Iterable[str]): 额外参与计算的redis版本键, 例如rbac版本
+            extra (Iterable): 额外参与计算的值, 例如当前用户的角色
+
+        Returns:
+            str: W/"..."
+        """
+        redis = RedisService().aioredis_pool
+        keys = [cls.EPOCH_KEY, *(cls.key(r) for r in resources), *extra_keys]
+        values = await redis.mget(keys)
+        if values[0] is None:
+            await redis.set(cls.EPOCH_KEY, uuid4().hex, nx=True)
+            values[0] = await redis.get(cls.EPOCH_KEY)
+        raw = json.dumps([keys, values, list(extra)], default=str)
+        return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match是否命中, 按弱比较规则忽略W/前缀"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == target for tag in if_none_match.split(",")
+    )
+
+
+def conditional_response(
+    request: Request, response: Response, etag: str
+) -> Optional[Response]:
+    """命中时返回304响应, 否则为正常响应设置ETag并返回None
+
+    Args:
+        request (Request): 当前请求
+        response (Response): 接口注入的Response, 用于设置响应头
+        etag (str): 资源ETag
+    """
+    # 要求客户端每次使用前重新验证
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
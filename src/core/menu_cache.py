@@ -0,0 +1,49 @@
+"""前端路由菜单缓存
+
+/getRouters的结果只取决于菜单数据、RBAC(角色-菜单关联)与当前用户的角色集合,
+这三者正好构成该接口的ETag(见src.core.etag.ResourceVersion), 因此直接以ETag为键
+缓存序列化后的响应体: 菜单或角色变更后版本号变化, 旧缓存自然不再命中, 由过期时间清理.
+"""
+
+from typing import Awaitable, Callable
+from src.config import config
+from .cache import LocalCache
+from .redis import RedisService
+from .replica import use_primary
+
+
+class MenuCache:
+    """按角色集合缓存序列化后的路由菜单, 进程内与redis两级"""
+
+    KEY = "menu:routers:{digest}"
+
+    _local_cache = LocalCache(
+        maxsize=config.MENU_CACHE_SIZE, ttl=config.MENU_CACHE_EXPIRE
+    )
+
+    @classmethod
+    async def get_or_build(
+        cls, etag: str, builder: Callable[[], Awaitable[str]]
+    ) -> str:
+        """获取缓存的响应体, 未命中时调用builder生成并写入缓存
+
+        Args:
+            etag (str): 接口ETag, 包含菜单版本、RBAC版本与角色集合
+            builder (Callable[[], Awaitable[str]]): 生成JSON响应体
+
+        Returns:
+            str: JSON响应体
+        """
+        body = cls._local_cache.get(etag)
+        if body is not None:
+            return body
+        key = cls.KEY.format(digest=etag.removeprefix("W/").strip('"'))
+        redis = RedisService().aioredis_pool
+        body = await redis.get(key)
+        if body is None:
+            # 缓存键中的版本号已是最新, 副本可能仍有复制延迟
+            with use_primary():
+                body = await builder()
+            await redis.set(key, body, ex=config.MENU_CACHE_EXPIRE)
+        cls._local_cache.set(etag, body)
+        return body
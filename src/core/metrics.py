@@ -0,0 +1,299 @@
+"""运行指标
+
+每个worker进程在内存中统计自己的指标, 定时把快照写入redis(带过期时间);
+/metrics接口读取所有存活worker的快照, 合并后输出Prometheus文本格式.
+"""
+
+import os
+import json
+import socket
+import asyncio
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from tortoise import connections
+from src.config import config
+from src.utils.log_util import log
+from src.utils.sql_engine import engine
+from src.utils.access_log import access_log
+from .timing import PHASES, RequestTimings
+from .redis import RedisService
+
+# 耗时直方图分桶上界,单位s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 指标名前缀
+NAMESPACE = "apex"
+
+
+class Histogram:
+    """固定分桶直方图, counts[i]为落在(buckets[i-1], buckets[i]]内的次数, 最后一个为+Inf"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    """按(请求方法, 路由模板, 阶段)统计的耗时直方图与请求计数"""
+
+    def __init__(self) -> None:
+        self.histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.in_flight = 0
+
+    def _histogram(self, method: str, route: str, phase: str) -> Histogram:
+        key = (method, route, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        timings: RequestTimings,
+        total: float,
+    ) -> None:
+        """记录一次请求的状态码、总耗时与各阶段耗时"""
+        self.requests[(method, route, status_code)] += 1
+        self._histogram(method, route, "total").observe(total)
+        for phase in PHASES:
+            if timings.counts[phase]:
+                self._histogram(method, route, phase).observe(
+                    timings.durations[phase]
+                )
+
+
+route_metrics = RouteMetrics()
+
+
+def _pool_stats() -> List[list]:
+    """数据库与redis连接池状态, [指标名, 标签, 值]"""
+    gauges = []
+
+    def add(name: str, pool: str, state: str, value) -> None:
+        if value is not None:
+            gauges.append([name, dict(pool=pool, state=state), value])
+
+    # tortoise连接池(asyncmy/aiomysql), 未初始化或其他引擎时跳过
+    try:
+        clients = connections.all()
+    except Exception:
+        clients = []
+    for client in clients:
+        pool = getattr(client, "_pool", None)
+        if pool is None or not hasattr(pool, "freesize"):
+            continue
+        name = f"tortoise:{client.connection_name}"
+        add("db_pool_connections", name, "size", pool.size)
+        add("db_pool_connections", name, "free", pool.freesize)
+        add("db_pool_connections", name, "used", pool.size - pool.freesize)
+        add("db_pool_connections", name, "max", pool.maxsize)
+
+    # sqlalchemy同步引擎连接池
+    sa_pool = engine.pool
+    if hasattr(sa_pool, "checkedout"):
+        add("db_pool_connections", "sqlalchemy", "size", sa_pool.size())
+        add("db_pool_connections", "sqlalchemy", "free", sa_pool.checkedin())
+        add("db_pool_connections", "sqlalchemy", "used", sa_pool.checkedout())
+        add("db_pool_connections", "sqlalchemy", "overflow", sa_pool.overflow())
+
+    # redis连接池
+    redis = RedisService()
+    for name, client in (("async", redis.aioredis_pool), ("sync", redis.redis_pool)):
+        pool = client.connection_pool
+        available = len(getattr(pool, "_available_connections", ()))
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        add("redis_pool_connections", name, "free", available)
+        add("redis_pool_connections", name, "used", in_use)
+        add("redis_pool_connections", name, "max", getattr(pool, "max_connections", None))
+    return gauges
+
+
+def _runtime_stats() -> Tuple[List[list], List[list]]:
+    """密码哈希执行器、进程内缓存、访问日志指标, 返回(counters, gauges)"""
+    # 这些模块依赖较多, 在函数内导入避免循环导入
+    from .password import PasswordHasher
+    from .premission import PermissionAccess
+    from .principal import PrincipalCache
+    from .menu_cache import MenuCache
+    from .security import verified_token_cache
+
+    counters, gauges = [], []
+    hasher = PasswordHasher.stats()
+    gauges.append(["password_hash_pending", {}, hasher["pending"]])
+    counters.append(["password_hash_completed_total", {}, hasher["completed"]])
+    counters.append(["password_hash_rejected_total", {}, hasher["rejected"]])
+    counters.append(
+        ["password_hash_seconds_total", {}, PasswordHasher.total_seconds]
+    )
+    for name, cache in (
+        ("rbac", PermissionAccess._local_cache),
+        ("principal", PrincipalCache._local_cache),
+        ("menu", MenuCache._local_cache),
+        ("token", verified_token_cache),
+    ):
+        stats = cache.stats()
+        counters.append(["cache_hits_total", dict(cache=name), stats["hits"]])
+        counters.append(["cache_misses_total", dict(cache=name), stats["misses"]])
+        gauges.append(["cache_entries", dict(cache=name), stats["size"]])
+    stats = access_log.stats()
+    gauges.append(["access_log_queued", {}, stats["queued"]])
+    counters.append(["access_log_written_total", {}, stats["written"]])
+    counters.append(["access_log_dropped_total", {}, stats["dropped"]])
+    return counters, gauges
+
+
+def collect_snapshot() -> dict:
+    """当前worker的指标快照"""
+    counters = [
+        ["http_requests_total", dict(method=m, route=r, status=str(s)), value]
+        for (m, r, s), value in route_metrics.requests.items()
+    ]
+    gauges = [["http_requests_in_flight", {}, route_metrics.in_flight]]
+    histograms = [
+        [
+            "http_request_duration_seconds",
+            dict(method=m, route=r, phase=p),
+            list(h.buckets),
+            h.counts,
+            h.sum,
+            h.count,
+        ]
+        for (m, r, p), h in route_metrics.histograms.items()
+    ]
+    runtime_counters, runtime_gauges = _runtime_stats()
+    return dict(
+        counters=counters + runtime_counters,
+        gauges=gauges + runtime_gauges + _pool_stats(),
+        histograms=histograms,
+    )
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_prometheus(snapshots: List[dict]) -> str:
+    """合并多个worker的快照(计数与直方图求和, gauge求和)并输出Prometheus文本格式"""
+    scalars: Dict[str, Dict[tuple, float]] = {}
+    types: Dict[str, str] = {}
+    histograms: Dict[str, Dict[tuple, list]] = {}
+    for snapshot in snapshots:
+        for kind in ("counters", "gauges"):
+            for name, labels, value in snapshot.get(kind, ()):
+                types[name] = "counter" if kind == "counters" else "gauge"
+                series = scalars.setdefault(name, defaultdict(float))
+                series[tuple(sorted(labels.items()))] += value
+        for name, labels, buckets, counts, total, count in snapshot.get(
+            "histograms", ()
+        ):
+            series = histograms.setdefault(name, {})
+            key = (tuple(sorted(labels.items())), tuple(buckets))
+            merged = series.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+
+    lines = [
+        f"# TYPE {NAMESPACE}_workers gauge",
+        f"{NAMESPACE}_workers {len(snapshots)}",
+    ]
+    for name in sorted(scalars):
+        metric = f"{NAMESPACE}_{name}"
+        lines.append(f"# TYPE {metric} {types[name]}")
+        for labels, value in sorted(scalars[name].items()):
+            lines.append(f"{metric}{_labels(dict(labels))} {_number(value)}")
+    for name in sorted(histograms):
+        metric = f"{NAMESPACE}_{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        for (labels, buckets), (counts, total, count) in sorted(
+            histograms[name].items()
+        ):
+            labels = dict(labels)
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(
+                    f"{metric}_bucket{_labels({**labels, 'le': le})} {cumulative}"
+                )
+            lines.append(f"{metric}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsPublisher:
+    """把当前worker的指标快照定时写入redis, 供任意worker的/metrics合并"""
+
+    KEY_PREFIX = "metrics:worker:"
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    _task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def publish(cls) -> None:
+        """写入当前worker快照, 过期时间为推送间隔的3倍, worker退出后自动消失"""
+        # gunicorn preload后fork出的worker需要使用自己的pid
+        cls.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        await RedisService().aioredis_pool.set(
+            cls.KEY_PREFIX + cls.worker_id,
+            json.dumps(collect_snapshot()),
+            ex=config.METRICS_PUSH_INTERVAL * 3,
+        )
+
+    @classmethod
+    async def collect_all(cls) -> List[dict]:
+        """读取所有存活worker的快照"""
+        await cls.publish()
+        redis = RedisService().aioredis_pool
+        keys = [key async for key in redis.scan_iter(match=cls.KEY_PREFIX + "*")]
+        if not keys:
+            return []
+        return [json.loads(value) for value in await redis.mget(keys) if value]
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                await cls.publish()
+            except Exception as e:
+                log.warning(f"指标快照推送失败: {e}")
+            await asyncio.sleep(config.METRICS_PUSH_INTERVAL)
+
+    @classmethod
+    def start(cls) -> None:
+        """启动定时推送任务"""
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls) -> None:
+        """停止推送并删除当前worker的快照"""
+        if cls._task is not None:
+            cls._task.cancel()
+            cls._task = None
+        try:
+            await RedisService().aioredis_pool.delete(cls.KEY_PREFIX + cls.worker_id)
+        except Exception:
+            pass
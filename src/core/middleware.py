@@ -1,97 +1,237 @@
 import time
 import json
 from json.decoder import JSONDecodeError
-from typing import List
-from starlette.types import Message
-from fastapi import Request, HTTPException, status
+from typing import List, Optional
+from starlette.datastructures import URL, Headers, MutableHeaders
 from starlette.middleware import Middleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi.middleware.cors import CORSMiddleware
+from ..config import config
 from ..utils.log_util import log
+from ..utils.access_log import access_log
+from .metrics import route_metrics
+from .timing import RequestTimings, request_timings
+from .replica import ReadYourWrites, replica_enabled, replica_reads
+from .query_capture import capture_queries
 from ..utils.re_util import serach_filename
 from ..utils.exceptions.common import IncorrectFileError
 
+# 按文本记录请求体的content-type
+TEXT_CONTENT_TYPES = (
+    "application/json",
+    "application/x-www-form-urlencoded",
+    "application/xml",
+    "text/",
+)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+
+def _body_kind(content_type: str) -> Optional[str]:
+    """根据content-type判断请求体的记录方式
+
+    Returns:
+        Optional[str]: text记录文本, multipart只提取文件名, None不记录
+    """
+    content_type = content_type.lower()
+    if content_type.startswith("multipart/"):
+        return "multipart"
+    if not content_type or content_type.startswith(TEXT_CONTENT_TYPES):
+        return "text"
+    return None
+
+
+class LoggingMiddleware:
     """
-    日志中间件(继承BaseHTTPMiddleware类方式),
-    必须重写dispatch方法;
+    日志中间件(纯ASGI方式),
+    请求体只截取前max_body_size字节用于记录, 不缓冲上传的文件;
     """
 
-    async def dispatch(self, request: Request, call_next):
-        # log_dict = dict(
-        #     method=request.method,
-        #     url=request.url,
-        #     client_ip=request.client.host,
-        #     body=await request.json(),
-        # )
-        # log.info(f"request info:{log_dict}")
-        done = False
+    def __init__(
+        self, app: ASGIApp, max_body_size: int = config.LOG_BODY_MAX_BYTES
+    ) -> None:
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        body_kind = _body_kind(Headers(scope=scope).get("content-type", ""))
         chunks: List[bytes] = []
-        receive = request.receive
+        captured = 0
+        truncated = False
+        status_code = 500
 
-        async def wrapped_receive() -> Message:  # 取body
-            nonlocal done
+        async def wrapped_receive() -> Message:  # 截取body
+            nonlocal captured, truncated
             message = await receive()
-            if message["type"] == "http.disconnect":
-                done = True
-                return message
-            body = message.get("body", b"")
-            more_body = message.get("more_body", False)
-            if not more_body:
-                done = True
-            chunks.append(body)
+            if body_kind and message["type"] == "http.request":
+                body = message.get("body", b"")
+                remaining = self.max_body_size - captured
+                if remaining > 0:
+                    chunks.append(body[:remaining])
+                    captured += min(len(body), remaining)
+                if len(body) > remaining:
+                    truncated = True
             return message
 
-        request._receive = (
-            wrapped_receive  # 赋值给_receive, 达到在call_next使用wrapped_receive的目的
-        )
-        start_time = time.time()
-        response = await call_next(request)
-        while not done:
-            await wrapped_receive()
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)  # 可以使用response, 添加信息
-        body = b"".join(chunks)
+        async def wrapped_send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
+
         try:
-            body = body.decode("utf-8")  # 请求体会有为文件的情况
-            body = json.loads(body)
-        except UnicodeDecodeError:
-            try:
-                body = serach_filename(body)  # 提取filename
-            except IncorrectFileError as e:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST, detail=f"{e}"
+            await self.app(scope, wrapped_receive, wrapped_send)
+        finally:
+            process_time = time.perf_counter() - start_time
+            # 未采样的请求不做任何格式化
+            if config.ACCESS_LOG_ENABLED and access_log.sampled(status_code):
+                access_log.submit(
+                    dict(
+                        time=time.time(),
+                        response_code=status_code,
+                        method=scope["method"],
+                        path=scope["path"],
+                        query=scope["query_string"].decode("latin-1"),
+                        client_ip=scope["client"][0] if scope.get("client") else None,
+                        process_time=round(process_time, 6),
+                        body=self._format_body(body_kind, b"".join(chunks), truncated),
+                    )
                 )
+            log.opt(lazy=True).debug(
+                "{} {} {} {:.2f}ms",
+                lambda: scope["method"],
+                lambda: URL(scope=scope),
+                lambda: status_code,
+                lambda: process_time * 1000,
+            )
+
+    @staticmethod
+    def _format_body(body_kind: Optional[str], body: bytes, truncated: bool):
+        """格式化截取的请求体"""
+        if body_kind == "multipart":
+            try:
+                return serach_filename(body)  # 提取filename
+            except IncorrectFileError:
+                return "<multipart>"
+        if body_kind is None:
+            return "<binary>"
+        body = body.decode("utf-8", errors="replace")
+        if truncated:
+            return f"{body}...(truncated)"
+        try:
+            return json.loads(body) if body else body
         except JSONDecodeError:
-            pass
-        log_dict = dict(
-            response_code=response.status_code,
-            method=request.method,
-            url=request.url,
-            client_ip=request.client.host,
-            body=body,
+            return body
+
+
+class ServerTimingMiddleware:
+    """
+    阶段耗时中间件(纯ASGI方式),
+    输出Server-Timing响应头(db/redis/serialize/http/total), 并记录路由耗时直方图;
+    开启QUERY_COUNT_HEADER时输出X-Query-Count响应头;
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def wrapped_send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    timings.server_timing(time.perf_counter() - start_time),
+                )
+                if queries is not None:
+                    headers.append("X-Query-Count", str(len(queries)))
+            await send(message)
+
+        route_metrics.in_flight += 1
+        queries = None
+        try:
+            if config.QUERY_COUNT_HEADER:
+                with capture_queries() as queries:
+                    await self.app(scope, receive, wrapped_send)
+            else:
+                await self.app(scope, receive, wrapped_send)
+        finally:
+            route_metrics.in_flight -= 1
+            request_timings.reset(token)
+            route = scope.get("route")
+            # 未匹配路由的请求归为一类, 避免任意路径产生大量指标
+            route_metrics.observe(
+                scope["method"],
+                getattr(route, "path", "<unmatched>"),
+                status_code,
+                timings,
+                time.perf_counter() - start_time,
+            )
+
+
+class ReadReplicaMiddleware:
+    """
+    只读副本路由中间件(纯ASGI方式),
+    GET/HEAD请求的读查询使用副本; 写请求成功后标记客户端, 窗口期内该客户端读主库;
+    """
+
+    READ_METHODS = ("GET", "HEAD")
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not replica_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        client = ReadYourWrites.client_id(
+            Headers(scope=scope).get("authorization"),
+            scope["client"][0] if scope.get("client") else None,
         )
-        if str(response.status_code).startswith("2") or str(
-            response.status_code
-        ).startswith("3"):
-            log.info(log_dict)
-        elif str(response.status_code).startswith("4") or str(
-            response.status_code
-        ).startswith("5"):
-            log.error(log_dict)
+        if scope["method"] in self.READ_METHODS:
+            token = replica_reads.set(not await ReadYourWrites.pinned(client))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                replica_reads.reset(token)
+            return
+
+        async def wrapped_send(message: Message) -> None:
+            # 在响应发出前标记, 客户端收到响应后立即发起的读请求也能读到本次写入
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await ReadYourWrites.pin(client)
+            await send(message)
 
-        return response
+        await self.app(scope, receive, wrapped_send)
 
 
 middleware = [
     Middleware(LoggingMiddleware),
+    Middleware(ServerTimingMiddleware),
+    Middleware(ReadReplicaMiddleware),
     Middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["X-Process-Time"],  # 客户端显示自定义请求头
+        # 客户端显示自定义请求头
+        expose_headers=["X-Process-Time", "Server-Timing", "X-Query-Count"],
     ),
 ]
@@ -0,0 +1,140 @@
+"""密码哈希服务
+
+密码哈希是cpu密集操作, 直接在async接口中调用会阻塞整个worker的事件循环,
+因此统一提交到有界的进程池/线程池中执行.
+"""
+
+import os
+import time
+import asyncio
+import multiprocessing
+from typing import List, Optional, Sequence, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+from src.config import config
+from src.utils.exceptions.user import PasswordHashBusyException
+
+
+def _build_context() -> CryptContext:
+    """新密码使用配置的算法, 同时保留md5_crypt以校验旧密码"""
+    schemes = list(dict.fromkeys([config.PASSWORD_HASH_SCHEME, "md5_crypt"]))
+    kwargs = {}
+    if config.PASSWORD_HASH_ROUNDS is not None:
+        kwargs[f"{config.PASSWORD_HASH_SCHEME}__rounds"] = config.PASSWORD_HASH_ROUNDS
+    return CryptContext(schemes=schemes, deprecated="auto", **kwargs)
+
+
+pwd_context = _build_context()
+
+
+def _hash(secret: str) -> str:
+    return pwd_context.hash(secret)
+
+
+def _hash_batch(secrets: List[str]) -> List[str]:
+    return [pwd_context.hash(secret) for secret in secrets]
+
+
+def _verify_and_update(secret: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(secret, hashed)
+
+
+class PasswordHasher:
+    """有界密码哈希执行器, 记录队列深度与耗时"""
+
+    _executor: Optional[Executor] = None
+    _executor_pid: Optional[int] = None
+    # 指标
+    pending = 0  # 已提交未完成的任务数(含执行中)
+    completed = 0
+    rejected = 0
+    total_seconds = 0.0
+    max_seconds = 0.0
+
+    @classmethod
+    def _get_executor(cls) -> Executor:
+        """按worker进程懒加载执行器, 避免gunicorn preload时在fork前创建进程池"""
+        if cls._executor is None or cls._executor_pid != os.getpid():
+            if config.PASSWORD_HASH_EXECUTOR == "process":
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=config.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=config.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="password-hash",
+                )
+            cls._executor_pid = os.getpid()
+        return cls._executor
+
+    @classmethod
+    async def _submit(cls, func, *args):
+        """提交任务, 队列已满时拒绝"""
+        if cls.pending >= config.PASSWORD_HASH_MAX_PENDING:
+            cls.rejected += 1
+            raise PasswordHashBusyException
+        cls.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(cls._get_executor(), func, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            cls.pending -= 1
+            cls.completed += 1
+            cls.total_seconds += elapsed
+            cls.max_seconds = max(cls.max_seconds, elapsed)
+
+    @classmethod
+    async def hash(cls, secret: str) -> str:
+        """生成密码哈希"""
+        return await cls._submit(_hash, secret)
+
+    @classmethod
+    async def hash_many(cls, secrets: Sequence[str]) -> List[str]:
+        """批量生成密码哈希
+
+        按PASSWORD_HASH_BATCH_SIZE切分为小批次, 同时执行的批次数比worker数少一个:
+        执行器队列中不会积压导入任务, 登录校验最多等待一个小批次, 且多worker时总有一个worker空闲.
+        """
+        size = config.PASSWORD_HASH_BATCH_SIZE
+        batches = [list(secrets[i : i + size]) for i in range(0, len(secrets), size)]
+        results: List[List[str]] = [[] for _ in batches]
+        semaphore = asyncio.Semaphore(max(1, config.PASSWORD_HASH_WORKERS - 1))
+
+        async def run(index: int, batch: List[str]) -> None:
+            async with semaphore:
+                results[index] = await cls._submit(_hash_batch, batch)
+
+        await asyncio.gather(*(run(i, batch) for i, batch in enumerate(batches)))
+        return [hashed for batch in results for hashed in batch]
+
+    @classmethod
+    async def verify(cls, secret: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """校验密码
+
+        Returns:
+            Tuple[bool, Optional[str]]: (是否通过, 算法变更后需要保存的新哈希)
+        """
+        return await cls._submit(_verify_and_update, secret, hashed)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """执行器指标"""
+        return dict(
+            executor=config.PASSWORD_HASH_EXECUTOR,
+            workers=config.PASSWORD_HASH_WORKERS,
+            pending=cls.pending,
+            completed=cls.completed,
+            rejected=cls.rejected,
+            avg_seconds=cls.total_seconds / cls.completed if cls.completed else 0.0,
+            max_seconds=cls.max_seconds,
+        )
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭执行器"""
+        if cls._executor is not None and cls._executor_pid == os.getpid():
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+        cls._executor = None
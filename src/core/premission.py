@@ -1,25 +1,177 @@
-from ..db.models import Users
+import json
+from uuid import uuid4
+from typing import FrozenSet, Iterable, NamedTuple, Tuple
+from ..config import config
+from ..db.models import Role
+from .cache import LocalCache
+from .redis import RedisService
+from .replica import use_primary
+
+
+class PermissionDecision(NamedTuple):
+    """用户权限判定结果"""
+
+    version: str  # 生成该结果时的全局RBAC版本
+    is_super: bool
+    permissions: FrozenSet[Tuple[str, str]]  # {(model, action)}
+
+
+def _enum_value(value) -> str:
+    """CharEnumField取出的是枚举成员, 统一转换为字符串便于集合查找"""
+    return getattr(value, "value", value)
 
 
 class PermissionAccess:
-    """权限服务"""
+    """权限服务
+
+    用户的权限判定结果同时缓存在进程内与redis中, 并以全局RBAC版本号标记;
+    角色/权限/用户角色发生变更时调用bump_version, 所有worker的旧缓存随即失效.
+
+    版本号是随机生成的代号而不是递增计数: redis被清空或版本键被淘汰后, 计数会回到0,
+    此前以0签发的token与缓存会重新被信任. 版本键缺失时生成新的代号, 旧声明一律回退到数据库校验.
+    """
+
+    VERSION_KEY = "rbac:version"
+    DECISION_KEY = "rbac:user:{user_id}"
+    ROLE_PERMISSIONS_KEY = "rbac:role-permissions"
+
+    _local_cache = LocalCache(maxsize=config.RBAC_CACHE_SIZE)
+
+    @classmethod
+    async def get_version(cls) -> str:
+        """获取当前全局RBAC版本, 版本键缺失时生成新的版本"""
+        redis = RedisService().aioredis_pool
+        version = await redis.get(cls.VERSION_KEY)
+        if version is None:
+            await redis.set(cls.VERSION_KEY, uuid4().hex, nx=True)
+            version = await redis.get(cls.VERSION_KEY)
+        return version
+
+    @classmethod
+    async def bump_version(cls) -> str:
+        """生成新的全局RBAC版本, 需要在变更事务提交之后调用"""
+        version = uuid4().hex
+        await RedisService().aioredis_pool.set(cls.VERSION_KEY, version)
+        return version
+
+    @classmethod
+    async def get_decision(cls, user_id: int) -> PermissionDecision:
+        """获取用户权限判定结果, 依次查找进程内缓存、redis、数据库
+
+        Args:
+            user_id (int): 用户id
+
+        Returns:
+            PermissionDecision: _description_
+        """
+        version = await cls.get_version()
+        decision: PermissionDecision = cls._local_cache.get(user_id)
+        if decision and decision.version == version:
+            return decision
+
+        redis = RedisService().aioredis_pool
+        key = cls.DECISION_KEY.format(user_id=user_id)
+        cached = await redis.get(key)
+        if cached:
+            data = json.loads(cached)
+            if data["version"] == version:
+                decision = PermissionDecision(
+                    version=version,
+                    is_super=data["is_super"],
+                    permissions=frozenset(tuple(p) for p in data["permissions"]),
+                )
+                cls._local_cache.set(user_id, decision)
+                return decision
+
+        # 缓存在新的RBAC版本下, 必须读主库, 否则副本延迟会让已撤销的权限继续生效
+        with use_primary():
+            decision = await cls._load_decision(user_id, version)
+        await redis.set(
+            key,
+            json.dumps(
+                dict(
+                    version=decision.version,
+                    is_super=decision.is_super,
+                    permissions=sorted(decision.permissions),
+                )
+            ),
+            ex=config.RBAC_CACHE_EXPIRE,
+        )
+        cls._local_cache.set(user_id, decision)
+        return decision
 
     @staticmethod
-    async def has_access(user_id: int, model: str, action: str) -> bool:
+    async def _load_decision(user_id: int, version: str) -> PermissionDecision:
+        """从数据库加载用户角色与权限"""
+        roles = await Role.filter(roles__id=user_id).prefetch_related("permissions")
+        return PermissionDecision(
+            version=version,
+            is_super=any(role.is_super for role in roles),
+            permissions=frozenset(
+                (_enum_value(permission.model), _enum_value(permission.action))
+                for role in roles
+                for permission in role.permissions
+            ),
+        )
+
+    @classmethod
+    async def get_role_permissions(
+        cls, role_keys: Iterable[str], version: str
+    ) -> FrozenSet[Tuple[str, str]]:
+        """根据角色字符获取权限集合, 用于按token中的角色声明授权
+
+        所有角色的权限映射按RBAC版本整体缓存, 每个版本只需查询一次数据库.
+
+        Args:
+            role_keys (Iterable[str]): 角色字符列表
+            version (str): 当前全局RBAC版本
+
+        Returns:
+            FrozenSet[Tuple[str, str]]: {(model, action)}
+        """
+        role_permissions = cls._local_cache.get(cls.ROLE_PERMISSIONS_KEY)
+        if not role_permissions or role_permissions[0] != version:
+            redis = RedisService().aioredis_pool
+            cached = await redis.get(cls.ROLE_PERMISSIONS_KEY)
+            data = json.loads(cached) if cached else None
+            if not data or data["version"] != version:
+                with use_primary():
+                    roles = await Role.all().prefetch_related("permissions")
+                data = dict(
+                    version=version,
+                    roles={
+                        role.role_key: [
+                            (_enum_value(p.model), _enum_value(p.action))
+                            for p in role.permissions
+                        ]
+                        for role in roles
+                    },
+                )
+                await redis.set(
+                    cls.ROLE_PERMISSIONS_KEY,
+                    json.dumps(data),
+                    ex=config.RBAC_CACHE_EXPIRE,
+                )
+            role_permissions = (
+                version,
+                {
+                    role_key: frozenset(tuple(p) for p in permissions)
+                    for role_key, permissions in data["roles"].items()
+                },
+            )
+            cls._local_cache.set(cls.ROLE_PERMISSIONS_KEY, role_permissions)
+        return frozenset().union(
+            *(role_permissions[1].get(role_key, ()) for role_key in role_keys)
+        )
+
+    @classmethod
+    async def has_access(cls, user_id: int, model: str, action: str) -> bool:
         """判断用户是否有访问权限"""
-        # 获取用户角色权限访问控制
-        user = await Users.filter(
-                id=user_id,
-                roles__permissions__model=model,
-                roles__permissions__action=action,
-            ).first().prefetch_related("roles__permissions")
-        if user:
-            return True
-        else:
-            return False
+        decision = await cls.get_decision(user_id)
+        return (model, action) in decision.permissions
 
     # @staticmethod
     # async def get_menus(user_id: int):
     #     user = await Users.filter(
     #         id=user_id
-    #     ).first().prefetch_related("roles__menus")
\ No newline at end of file
+    #     ).first().prefetch_related("roles__menus")
@@ -0,0 +1,71 @@
+"""当前登录用户缓存"""
+
+from typing import Any, Awaitable, Callable
+from ..config import config
+from ..schemas.management.user import UserOut
+from .cache import LocalCache
+from .premission import PermissionAccess
+from .redis import RedisService
+from .replica import use_primary
+
+
+class PrincipalCache:
+    """以token的sub(用户名)为key缓存当前登录用户及其角色
+
+    redis中的记录带有生成时的RBAC版本, 角色变更后自动失效;
+    用户更新、删除、重置密码时需要调用invalidate.
+    """
+
+    KEY = "principal:{username}"
+
+    _local_cache = LocalCache(
+        maxsize=config.PRINCIPAL_CACHE_SIZE, ttl=config.PRINCIPAL_LOCAL_CACHE_EXPIRE
+    )
+
+    @classmethod
+    async def get_or_load(
+        cls, username: str, loader: Callable[[str], Awaitable[Any]]
+    ) -> UserOut:
+        """获取缓存的用户, 未命中时通过loader从数据库加载并写入缓存
+
+        Args:
+            username (str): 用户名
+            loader (Callable[[str], Awaitable[Any]]): 根据用户名查询预取了roles的Users
+
+        Returns:
+            UserOut: _description_
+        """
+        user = cls._local_cache.get(username)
+        if user is not None:
+            return user
+        key = cls.KEY.format(username=username)
+        redis = RedisService().aioredis_pool
+        # 一次往返同时取出RBAC版本与用户记录
+        version, cached = await redis.mget(PermissionAccess.VERSION_KEY, key)
+        if version is None:
+            # 版本键缺失时任何缓存都不可信
+            version, cached = await PermissionAccess.get_version(), None
+        if cached:
+            cached_version, _, record = cached.partition(":")
+            if cached_version == version:
+                user = UserOut.model_validate_json(record)
+                cls._local_cache.set(username, user)
+                return user
+        with use_primary():
+            user = UserOut.model_validate(await loader(username))
+        await redis.set(
+            key, f"{version}:{user.model_dump_json()}", ex=config.PRINCIPAL_CACHE_EXPIRE
+        )
+        cls._local_cache.set(username, user)
+        return user
+
+    @classmethod
+    async def invalidate(cls, *usernames: str) -> None:
+        """删除用户缓存"""
+        if not usernames:
+            return
+        for username in usernames:
+            cls._local_cache.delete(username)
+        await RedisService().aioredis_pool.delete(
+            *(cls.KEY.format(username=username) for username in usernames)
+        )
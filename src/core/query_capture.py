@@ -0,0 +1,70 @@
+"""SQL语句捕获
+
+捕获当前上下文中tortoise执行的每条SQL语句, 用于:
+- 单元测试中的查询数预算(见tests/test_query_budget.py), 防止N+1查询回归;
+- 开启QUERY_COUNT_HEADER时输出X-Query-Count响应头.
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Tuple
+from .timing import db_client_classes
+
+# 当前生效的捕获列表, 支持嵌套捕获(例如测试夹具外层捕获, 中间件内层捕获)
+_captures: ContextVar[Tuple[List[str], ...]] = ContextVar("query_captures", default=())
+# 正在执行的语句, 避免嵌套调用(如execute_query_dict->execute_query)重复记录
+_executing: ContextVar[bool] = ContextVar("query_executing", default=False)
+
+
+@contextmanager
+def capture_queries() -> Iterator[List[str]]:
+    """捕获上下文内执行的SQL语句
+
+    Example:
+        >>> with capture_queries() as queries:
+        ...     await Role.all().prefetch_related("permissions")
+        >>> len(queries)
+        2
+    """
+    queries: List[str] = []
+    token = _captures.set((*_captures.get(), queries))
+    try:
+        yield queries
+    finally:
+        _captures.reset(token)
+
+
+def _capture(func):
+    if getattr(func, "__query_capture__", False):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(self, query, *args, **kwargs):
+        captures = _captures.get()
+        if not captures or _executing.get():
+            return await func(self, query, *args, **kwargs)
+        for queries in captures:
+            queries.append(str(query))
+        token = _executing.set(True)
+        try:
+            return await func(self, query, *args, **kwargs)
+        finally:
+            _executing.reset(token)
+
+    wrapper.__query_capture__ = True
+    return wrapper
+
+
+def install_query_capture_hooks() -> None:
+    """为tortoise client安装语句捕获钩子, 重复调用无副作用"""
+    for cls in db_client_classes():
+        for name in (
+            "execute_query",
+            "execute_query_dict",
+            "execute_insert",
+            "execute_many",
+            "execute_script",
+        ):
+            if name in cls.__dict__:
+                setattr(cls, name, _capture(cls.__dict__[name]))
@@ -0,0 +1,83 @@
+"""只读副本路由
+
+配置DB_REPLICA_HOST后, GET/HEAD请求中的读查询路由到replica连接(见ReadReplicaMiddleware),
+写查询、事务内的查询以及非请求上下文(celery、启动任务)的查询仍走default主库.
+写请求成功后, 同一客户端在DB_READ_YOUR_WRITES_WINDOW秒内的读请求也走主库, 避免复制延迟读到旧数据.
+
+redis中的版本号在写入后立即递增, 副本却可能仍是旧数据; 按版本号缓存的数据(ETag、菜单、
+权限判定、分页总数等)如果从副本加载, 会把旧数据存到新版本下, 因此这些加载必须包在use_primary()中.
+"""
+
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Type
+from tortoise import connections
+from tortoise.models import Model
+from tortoise.backends.base.client import BaseTransactionWrapper
+from src.config import config
+from .redis import RedisService
+
+PRIMARY_CONNECTION = "default"
+REPLICA_CONNECTION = "replica"
+
+# 当前请求的读查询是否可以使用副本
+replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+def replica_enabled() -> bool:
+    return bool(config.DB_REPLICA_HOST)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """上下文内的读查询使用主库
+
+    Example:
+        >>> with use_primary():
+        ...     role = await Role.get(id=role_id)
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """tortoise数据库路由"""
+
+    def db_for_read(self, model: Type[Model]) -> str:
+        if not replica_reads.get():
+            return PRIMARY_CONNECTION
+        # 事务中的读查询必须使用事务连接
+        if isinstance(connections.get(PRIMARY_CONNECTION), BaseTransactionWrapper):
+            return PRIMARY_CONNECTION
+        return REPLICA_CONNECTION
+
+    def db_for_write(self, model: Type[Model]) -> str:
+        return PRIMARY_CONNECTION
+
+
+class ReadYourWrites:
+    """按客户端记录最近一次写请求, 窗口期内读主库"""
+
+    KEY = "db:primary-pin:{client}"
+
+    @staticmethod
+    def client_id(authorization: Optional[str], client_ip: Optional[str]) -> str:
+        """有token时按token区分客户端, 否则按ip"""
+        raw = authorization or client_ip or ""
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @classmethod
+    async def pin(cls, client: str) -> None:
+        await RedisService().aioredis_pool.set(
+            cls.KEY.format(client=client), 1, ex=config.DB_READ_YOUR_WRITES_WINDOW
+        )
+
+    @classmethod
+    async def pinned(cls, client: str) -> bool:
+        return bool(
+            await RedisService().aioredis_pool.exists(cls.KEY.format(client=client))
+        )
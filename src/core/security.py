@@ -1,10 +1,13 @@
+import time
+import hashlib
+from uuid import uuid4
 from typing import Union
 from datetime import timedelta, datetime
 from jose import JWTError, jwt
 from fastapi.security import HTTPBearer
 from fastapi import Depends, Request
 from src.config import config
-from src.db.models import Users
+from src.schemas.management.user import UserOut
 from src.utils.log_util import log
 from ..utils.exceptions.user import (
     TokenUnauthorizedException,
@@ -14,9 +17,15 @@ from ..utils.exceptions.user import (
 )
 from ..services import UserService
 from .redis import RedisService
+from .principal import PrincipalCache
+from .cache import LocalCache
 
 
 oauth2_bearer = HTTPBearer(auto_error=False)
+# 已注销token的redis key, 过期时间与token的exp一致
+REVOKED_TOKEN_KEY = "token:revoked:{token_id}"
+# 已校验token的payload缓存, 以token摘要为key, 条目在token的exp时过期
+verified_token_cache = LocalCache(maxsize=config.TOKEN_CACHE_SIZE)
 
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
@@ -37,11 +46,41 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
         expire = datetime.utcnow() + timedelta(
             minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    # jti作为token唯一标识, 用于注销
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     jwt_token = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
     return jwt_token
 
 
+def _token_id(payload: dict, token: str) -> str:
+    """token唯一标识, 兼容没有jti的旧token时使用token摘要"""
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+async def revoke_token(payload: dict, token: str) -> None:
+    """注销token, redis key在token过期时自动删除
+
+    Args:
+        payload (dict): 已校验的token payload
+        token (str): jwt token
+    """
+    ttl = int(payload["exp"] - time.time())
+    if ttl <= 0:
+        return
+    await RedisService().aioredis_pool.set(
+        REVOKED_TOKEN_KEY.format(token_id=_token_id(payload, token)), 1, ex=ttl
+    )
+
+
+async def is_token_revoked(payload: dict, token: str) -> bool:
+    """判断token是否已注销"""
+    return bool(
+        await RedisService().aioredis_pool.exists(
+            REVOKED_TOKEN_KEY.format(token_id=_token_id(payload, token))
+        )
+    )
+
+
 async def check_jwt_auth(
     request: Request, bearer: HTTPBearer = Depends(oauth2_bearer)
 ) -> dict:
@@ -60,33 +99,35 @@ async def check_jwt_auth(
     Returns:
         dict : payload
     """
-    try:
-        # jwt decode,验证jwt
-        payload = jwt.decode(
-            # bearer.credentials 当前token，
-            # config.SECRET_KEY 私钥，
-            # algorithms hash算法
-            bearer.credentials,
-            config.SECRET_KEY,
-            algorithms=[config.ALGORITHM],
-        )
-    except AttributeError:
+    if bearer is None:
         raise TokenUnauthorizedException
-    except JWTError:
-        raise TokenExpiredException
-    # 查询token黑名单列表
-    token_black_list = await RedisService().aioredis_pool.lrange(
-        payload.get("sub") + "-token-blacklist", 0, -1
-    )
-    # 判断token是否在黑名单中
-    if bearer.credentials in token_black_list:
+    # 同一token重复请求时跳过签名校验
+    digest = hashlib.sha256(bearer.credentials.encode()).digest()
+    payload = verified_token_cache.get(digest)
+    if payload is None:
+        try:
+            # jwt decode,验证jwt
+            payload = jwt.decode(
+                # bearer.credentials 当前token，
+                # config.SECRET_KEY 私钥，
+                # algorithms hash算法
+                bearer.credentials,
+                config.SECRET_KEY,
+                algorithms=[config.ALGORITHM],
+            )
+        except JWTError:
+            raise TokenExpiredException
+        ttl = payload["exp"] - time.time() if "exp" in payload else None
+        verified_token_cache.set(digest, payload, ttl=ttl)
+    # 判断token是否已注销
+    if await is_token_revoked(payload, bearer.credentials):
         raise UserLoggedOutException
     return payload
 
 
 async def get_current_user(
     request: Request, payload: dict = Depends(check_jwt_auth)
-) -> Users:
+) -> UserOut:
     """获取当前登录用户
 
     Args:
@@ -98,12 +139,14 @@ async def get_current_user(
         TokenInvalidException: _description_
 
     Returns:
-        Users: _description_
+        UserOut: 缓存的用户记录
     """
     username: str = payload.get("sub")
     # 严格规定login接口传递的sub
     if not username:
         raise TokenInvalidException
-    # 查询用户
-    user = await UserService.query_user_by_username(username=username)
+    # 优先从缓存获取用户
+    user = await PrincipalCache.get_or_load(
+        username, lambda name: UserService.query_user_by_username(username=name)
+    )
     return user
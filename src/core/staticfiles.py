@@ -0,0 +1,181 @@
+"""预压缩静态文件
+
+swagger与allure报告的文本资源预先生成.gz(安装了brotli时同时生成.br)旁路文件,
+请求时按Accept-Encoding直接返回压缩文件.
+只有文件名带内容哈希的资源使用长期immutable缓存, 其余资源短期缓存后按ETag重新验证.
+"""
+
+import os
+import re
+import gzip
+import stat
+import anyio
+from pathlib import Path
+from typing import List, Tuple, Union
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from src.config import config
+from src.utils.log_util import log
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖, 未安装时只生成gzip
+    brotli = None
+
+# 需要预压缩的文件后缀
+COMPRESSIBLE_SUFFIXES = {
+    ".html",
+    ".js",
+    ".mjs",
+    ".css",
+    ".json",
+    ".map",
+    ".svg",
+    ".txt",
+    ".xml",
+    ".csv",
+}
+# (Content-Encoding, 旁路文件后缀), 按优先级排列
+ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+# 构建产物的内容哈希文件名, 例如app.3f2a9c1b.js、chunk-5e4d3c2b1a.css
+FINGERPRINT_PATTERN = re.compile(r"[.-][0-9a-f]{8,}\.\w+$", re.IGNORECASE)
+
+
+def _is_compressible(path: Union[str, Path]) -> bool:
+    return os.path.splitext(str(path))[1].lower() in COMPRESSIBLE_SUFFIXES
+
+
+def is_fingerprinted(path: Union[str, Path]) -> bool:
+    """文件名是否带内容哈希"""
+    return bool(FINGERPRINT_PATTERN.search(os.path.basename(str(path))))
+
+
+def _write_sidecar(path: str, suffix: str, data: bytes) -> None:
+    """先写临时文件再替换, 多个worker同时压缩时不会读到半个文件"""
+    tmp_path = f"{path}{suffix}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path + suffix)
+
+
+def precompress_directory(
+    directory: Union[str, Path], min_size: int = config.STATIC_COMPRESS_MIN_SIZE
+) -> int:
+    """为目录下的文本资源生成压缩旁路文件, 已是最新的旁路文件会跳过
+
+    Args:
+        directory (Union[str, Path]): 静态文件目录
+        min_size (int): 小于该字节数的文件不压缩
+
+    Returns:
+        int: 本次生成的文件数
+    """
+    encodings = [("gzip", ".gz")] + ([("br", ".br")] if brotli else [])
+    count = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not _is_compressible(name):
+                continue
+            path = os.path.join(root, name)
+            try:
+                source_stat = os.stat(path)
+                if source_stat.st_size < min_size:
+                    continue
+                data = None
+                for encoding, suffix in encodings:
+                    try:
+                        if os.stat(path + suffix).st_mtime >= source_stat.st_mtime:
+                            continue
+                    except FileNotFoundError:
+                        pass
+                    if data is None:
+                        with open(path, "rb") as f:
+                            data = f.read()
+                    if encoding == "br":
+                        compressed = brotli.compress(data)
+                    else:
+                        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                    # 压缩无收益时不生成旁路文件
+                    if len(compressed) >= len(data):
+                        continue
+                    _write_sidecar(path, suffix, compressed)
+                    count += 1
+            except OSError as e:
+                log.warning(f"预压缩失败 {path}: {e}")
+    return count
+
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    """解析Accept-Encoding, 忽略q=0的编码"""
+    accepted = []
+    for item in accept_encoding.split(","):
+        encoding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.append(encoding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """优先返回预压缩旁路文件的StaticFiles"""
+
+    def __init__(
+        self,
+        *args,
+        cache_control: str = config.STATIC_CACHE_CONTROL,
+        immutable_cache_control: str = config.STATIC_IMMUTABLE_CACHE_CONTROL,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+        self.immutable_cache_control = immutable_cache_control
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code not in (200, 304):
+            return response
+        if isinstance(response, FileResponse) and _is_compressible(response.path):
+            response = await self._encoded_response(response, scope)
+        cache_control = (
+            self.immutable_cache_control if is_fingerprinted(path) else self.cache_control
+        )
+        if cache_control:
+            response.headers["Cache-Control"] = cache_control
+        return response
+
+    async def _encoded_response(self, response: FileResponse, scope: Scope) -> Response:
+        """按Accept-Encoding替换为压缩旁路文件"""
+        request_headers = Headers(scope=scope)
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        source_mtime = response.stat_result.st_mtime
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            sidecar = f"{response.path}{suffix}"
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, sidecar)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            # 源文件更新后旧的旁路文件不再使用
+            if not stat.S_ISREG(stat_result.st_mode) or (
+                stat_result.st_mtime < source_mtime
+            ):
+                continue
+            encoded = FileResponse(
+                sidecar,
+                stat_result=stat_result,
+                media_type=response.media_type,
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+            if self.is_not_modified(encoded.headers, request_headers):
+                return NotModifiedResponse(encoded.headers)
+            return encoded
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -0,0 +1,121 @@
+"""请求阶段耗时统计
+
+通过contextvar记录当前请求在数据库、redis、响应序列化、外部http调用上的耗时,
+由ServerTimingMiddleware输出Server-Timing响应头并写入路由耗时直方图.
+"""
+
+import time
+import functools
+import importlib
+from contextvars import ContextVar
+from typing import Dict, Optional
+from src.config import config
+
+# 统计的阶段: Server-Timing中的名称
+PHASES = ("db", "redis", "serialize", "http")
+
+
+class RequestTimings:
+    """单个请求各阶段的累计耗时与调用次数"""
+
+    __slots__ = ("durations", "counts")
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.counts: Dict[str, int] = dict.fromkeys(PHASES, 0)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.durations[phase] += seconds
+        self.counts[phase] += 1
+
+    def server_timing(self, total: float) -> str:
+        """生成Server-Timing响应头, 单位ms"""
+        metrics = [
+            f"{phase};dur={self.durations[phase] * 1000:.2f}"
+            for phase in PHASES
+            if self.counts[phase]
+        ]
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+# 当前协程正在统计的阶段, 避免嵌套调用(如execute_query_dict->execute_query)重复计时
+_current_phase: ContextVar[Optional[str]] = ContextVar("current_phase", default=None)
+
+
+def timed(phase: str):
+    """异步函数装饰器, 在请求上下文中累计phase阶段的耗时"""
+
+    def decorator(func):
+        if getattr(func, "__timed__", None) == phase:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            timings = request_timings.get()
+            if timings is None or _current_phase.get() == phase:
+                return await func(*args, **kwargs)
+            token = _current_phase.set(phase)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_phase.reset(token)
+                timings.add(phase, time.perf_counter() - start)
+
+        wrapper.__timed__ = phase
+        return wrapper
+
+    return decorator
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+def db_client_classes() -> list:
+    """tortoise的所有client类(含事务包装类)"""
+    from tortoise.backends.base.client import BaseDBAsyncClient
+
+    # tortoise在初始化时才导入数据库后端, 这里提前导入以便找到具体的client类
+    try:
+        importlib.import_module(f"tortoise.backends.{config.DB_ENGINE}.client")
+    except ImportError:
+        pass
+    return [BaseDBAsyncClient, *_subclasses(BaseDBAsyncClient)]
+
+
+def _patch(cls, name: str, phase: str) -> None:
+    """只替换类自身定义的方法, 继承的方法在父类上统计"""
+    if name in cls.__dict__:
+        setattr(cls, name, timed(phase)(cls.__dict__[name]))
+
+
+def install_timing_hooks() -> None:
+    """为tortoise、redis、fastapi响应序列化、httpx安装计时钩子, 重复调用无副作用"""
+    import httpx
+    import fastapi.routing
+    from redis.asyncio.client import Redis, Pipeline
+
+    for cls in db_client_classes():
+        for name in (
+            "execute_query",
+            "execute_query_dict",
+            "execute_insert",
+            "execute_many",
+            "execute_script",
+        ):
+            _patch(cls, name, "db")
+
+    _patch(Redis, "execute_command", "redis")
+    _patch(Pipeline, "execute", "redis")
+    # fastapi.routing中按全局名称调用serialize_response, 替换模块属性即可生效
+    fastapi.routing.serialize_response = timed("serialize")(
+        fastapi.routing.serialize_response
+    )
+    _patch(httpx.AsyncClient, "send", "http")
@@ -1,10 +1,10 @@
 # import asyncio
 from typing import Tuple
-from passlib.hash import md5_crypt
 from tortoise.transactions import in_transaction
 from .models import Users, Role, Routes, RouteMeta, Permission
 from src.utils.enum_util import AccessModelEnum, AccessActionEnum, BoolEnum, BoolEnum
 from src.utils.log_util import log
+from src.core.password import PasswordHasher
 
 
 class InitDbData:
@@ -13,7 +13,7 @@ class InitDbData:
     async def execute_init(self):
         """执行"""
         if not await self.db_has_data():
-            async with in_transaction():
+            async with in_transaction("default"):
                 # 初始化用户
                 admin_user, member_user = await self.init_user()
                 # 插入用户
@@ -128,12 +128,12 @@ class InitDbData:
         admin_user = Users(
             user_name="admin",
             remark="管理员",
-            password=md5_crypt.hash("123456"),
+            password=await PasswordHasher.hash("123456"),
         )
         member_user = Users(
             user_name="tester",
             remark="普通用户",
-            password=md5_crypt.hash("123456"),
+            password=await PasswordHasher.hash("123456"),
         )
         return admin_user, member_user
 
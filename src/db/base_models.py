@@ -1,7 +1,18 @@
+from typing import Tuple
 from tortoise import fields, models
+from tortoise.indexes import Index
+from tortoise.contrib.mysql.indexes import FullTextIndex
+from src.config import config
 from src.utils.enum_util import BoolEnum
 
 
+def fulltext_index(*fields_: str) -> Tuple[Index, ...]:
+    """mysql的ngram全文索引, 其他数据库不支持时不创建"""
+    if config.DB_ENGINE != "mysql":
+        return ()
+    return (FullTextIndex(fields=fields_, parser_name="ngram"),)
+
+
 class AbstractBaseModel(models.Model):
     """抽象模型类"""
 
@@ -11,7 +22,9 @@ class AbstractBaseModel(models.Model):
         default=BoolEnum.FALSE,
         description="逻辑删除:0=未删除,1=删除",
     )
-    created_at = fields.DatetimeField(auto_now_add=True, description="创建时间")
+    created_at = fields.DatetimeField(
+        auto_now_add=True, index=True, description="创建时间"
+    )
     update_at = fields.DatetimeField(auto_now=True, description="更新时间")
 
     class Meta:
@@ -0,0 +1,32 @@
+"""自定义查询过滤器
+
+tortoise的startswith/istartswith会生成 CAST(field AS CHAR) LIKE 'x%' (istartswith还包一层UPPER),
+mysql无法使用字段上的索引. 这里为每个字符字段注册 `<field>__prefix` 过滤器,
+生成不带函数包装的 field LIKE 'x%', 大小写是否敏感由字段的排序规则决定.
+"""
+
+from typing import Type
+from pypika.terms import Criterion, Term
+from tortoise import fields
+from tortoise.filters import Like, escape_like, string_encoder
+from tortoise.models import Model
+
+
+def prefix_like(field: Term, value: str) -> Criterion:
+    """field LIKE 'value%', 可以使用索引的前缀匹配"""
+    return Like(field, field.wrap_constant(f"{escape_like(value)}%"))
+
+
+def register_prefix_filters(*models: Type[Model]) -> None:
+    """为模型的字符字段注册`__prefix`过滤器, 需要在Tortoise.init之前调用"""
+    for model in models:
+        meta = model._meta
+        for name, field in meta.fields_map.items():
+            if not isinstance(field, (fields.CharField, fields.TextField)):
+                continue
+            meta._filters[f"{name}__prefix"] = {
+                "field": name,
+                "source_field": meta.fields_db_projection[name],
+                "operator": prefix_like,
+                "value_encoder": string_encoder,
+            }
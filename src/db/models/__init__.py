@@ -1,3 +1,17 @@
 from .user import *
 from .autotest import *
-from .menu import *
\ No newline at end of file
+from .menu import *
+from ..filters import register_prefix_filters
+
+register_prefix_filters(
+    Users,
+    Role,
+    Permission,
+    TestCase,
+    TestSuite,
+    TestSuiteTaskId,
+    TestEnv,
+    ScheduledTask,
+    Routes,
+    RouteMeta,
+)
@@ -1,5 +1,5 @@
 from tortoise import fields
-from src.db.base_models import AbstractBaseModel
+from src.db.base_models import AbstractBaseModel, fulltext_index
 from src.utils.enum_util import (
     SuiteStatusEnum,
     BoolEnum,
@@ -9,6 +9,11 @@ from src.utils.enum_util import (
 )
 
 
+# 全文检索字段
+TESTCASE_SEARCH_FIELDS = ("case_title", "case_module", "api_path", "case_description")
+TESTSUITE_SEARCH_FIELDS = ("suite_title", "remark")
+
+
 class TestCase(AbstractBaseModel):
     """测试用例表"""
 
@@ -64,6 +69,7 @@ class TestCase(AbstractBaseModel):
     class Meta:
         table = "test_case"
         ordering = ["-created_at"]
+        indexes = fulltext_index(*TESTCASE_SEARCH_FIELDS)
 
 
 class TestSuite(AbstractBaseModel):
@@ -87,6 +93,7 @@ class TestSuite(AbstractBaseModel):
     class Meta:
         table = "test_suite"
         ordering = ["-created_at"]
+        indexes = fulltext_index(*TESTSUITE_SEARCH_FIELDS)
 
 
 class TestSuiteTaskId(AbstractBaseModel):
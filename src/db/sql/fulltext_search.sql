@@ -0,0 +1,5 @@
+-- 用例/套件全文检索索引(mysql, ngram分词)
+-- 项目未提交迁移文件, 已有数据库执行一次即可; 索引名与tortoise生成的一致, 之后执行aerich迁移不会重复创建.
+-- 索引不存在时 /testcase/search 与 /testsuite/search 退化为icontains检索.
+CREATE FULLTEXT INDEX `idx_test_case_case_ti_c95620` ON `test_case` (`case_title`, `case_module`, `api_path`, `case_description`) WITH PARSER ngram;
+CREATE FULLTEXT INDEX `idx_test_suite_suite_t_8b86c8` ON `test_suite` (`suite_title`, `remark`) WITH PARSER ngram;
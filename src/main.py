@@ -1,8 +1,8 @@
 """项目入口文件"""
 
 import os
+import asyncio
 from fastapi import FastAPI, Depends, HTTPException
-from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.openapi.docs import get_swagger_ui_html
 from tortoise.exceptions import IntegrityError
@@ -25,10 +25,24 @@ from src.core.exception import (
     custom_integrity_exception_handler,
 )
 from src.core.db import register_db
+from src.core.password import PasswordHasher
+from src.core.timing import install_timing_hooks
+from src.core.count_cache import install_count_cache_hooks
+from src.core.query_capture import install_query_capture_hooks
+from src.core.metrics import MetricsPublisher
+from src.core.staticfiles import PrecompressedStaticFiles, precompress_directory
+from src.utils.access_log import access_log
 from .config import config
 from src.db import InitDbData
 
 
+# 安装数据库/redis/序列化/httpx计时钩子, 用于Server-Timing
+install_timing_hooks()
+# 安装写语句钩子, 用于分页总数缓存失效
+install_count_cache_hooks()
+# 安装SQL语句捕获钩子, 用于X-Query-Count与测试中的查询数预算
+install_query_capture_hooks()
+
 app = FastAPI(
     title=config.SWAGGER_TITLE,
     version=config.SWAGGER_VERSION,
@@ -48,7 +62,7 @@ async def lifespan():
     # swagger 静态文件
     app.mount(
         "/static",
-        StaticFiles(directory=config.STATIC_PATH),
+        PrecompressedStaticFiles(directory=config.STATIC_PATH),
         name="static",
     )
 
@@ -57,15 +71,38 @@ async def lifespan():
         try:
             app.mount(
                 "/report",
-                StaticFiles(directory=config.ALLURE_REPORT, html=True),
+                PrecompressedStaticFiles(directory=config.ALLURE_REPORT, html=True),
                 name="report",
             )
         except RuntimeError:
             os.makedirs(config.ALLURE_REPORT)
 
+    # 后台生成预压缩文件, 已是最新的文件会跳过
+    if config.STATIC_PRECOMPRESS:
+        app.state.precompress_task = asyncio.gather(
+            *(
+                asyncio.to_thread(precompress_directory, directory)
+                for directory in (config.STATIC_PATH, config.ALLURE_REPORT)
+            )
+        )
+
     # 初始化用户角色数据,需要在注册tortoise后面初始化
     await InitDbData().execute_init()
 
+    # 定时推送当前worker的指标快照
+    if config.METRICS_ENABLED:
+        MetricsPublisher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """fastapi关闭"""
+    await MetricsPublisher.stop()
+    # 关闭密码哈希执行器
+    PasswordHasher.shutdown()
+    # 写入剩余的访问日志
+    access_log.close()
+
 
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
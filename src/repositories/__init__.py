@@ -1,9 +1,126 @@
-from typing import TypeVar, Generic, Type, List, Optional, Tuple
+import json
+import time
+import base64
+import asyncio
+import binascii
+from datetime import datetime
+from typing import (
+    TypeVar,
+    Generic,
+    Type,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    NamedTuple,
+    Union,
+)
+from pypika import Table
+from pypika.terms import ValueWrapper
+from tortoise import timezone
 from tortoise.models import Model
 from tortoise.queryset import QuerySet
+from tortoise.expressions import Q
+from ..config import config
+from ..utils.log_util import log
+from ..utils.exceptions.common import InvalidCursorException
+from ..core.count_cache import CountCache
 
 T = TypeVar("T", bound=Model)  # 泛型 T 绑定到 Tortoise 的 Model 类
 
+# 列表统一排序, id保证created_at相同时顺序稳定
+PAGE_ORDERING = ("-created_at", "-id")
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    """生成不透明的分页游标"""
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析分页游标
+
+    Raises:
+        InvalidCursorException: 游标无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursorException
+
+
+async def paginate(
+    query: QuerySet,
+    limit: int,
+    page: int = 1,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Tuple[list, int, Optional[str]]:
+    """分页查询, 按(created_at, id)倒序
+
+    传入cursor时使用游标分页, 深分页不再扫描并丢弃前面的行; 否则使用offset分页.
+
+    Args:
+        query (QuerySet): 已设置筛选条件的查询
+        limit (int): 分页大小
+        page (int): 当前分页, 游标分页时忽略
+        cursor (Optional[str]): 上一页返回的next_cursor
+        fields (Optional[Sequence[str]]): 只查询这些字段并返回dict, 需要包含created_at与id
+
+    Returns:
+        Tuple[list, int, Optional[str]]: (当前页数据, 总数, 下一页游标)
+    """
+    page_query = query.order_by(*PAGE_ORDERING)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        page_query = page_query.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    else:
+        page_query = page_query.offset(limit * (page - 1))
+    page_query = page_query.limit(limit)
+    if fields:
+        page_query = page_query.values(*fields)
+    # 当前页与总数并发查询, 总数优先从缓存获取
+    result, total = await asyncio.gather(page_query, CountCache.count(query))
+    # 不足一页说明已经是最后一页
+    next_cursor = None
+    if len(result) == limit:
+        last = result[-1]
+        next_cursor = (
+            encode_cursor(last["created_at"], last["id"])
+            if fields
+            else encode_cursor(last.created_at, last.pk)
+        )
+    return result, total, next_cursor
+
+
+class BulkResult(NamedTuple):
+    """批量操作结果"""
+
+    # 处理的总行数
+    rows: int
+    # 每个分块的(行数, 耗时s)
+    chunks: List[Tuple[int, float]]
+
+
+class SyncResult(NamedTuple):
+    """关联同步结果"""
+
+    # 删除的关联数
+    removed: int
+    # 新增的关联数
+    added: int
+
+
+def chunked(items: Sequence, size: int):
+    """按size切分序列"""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
 
 class BaseRepository(Generic[T]):
     """数据访问Base Class
@@ -49,22 +166,19 @@ class BaseRepository(Generic[T]):
 
     @classmethod
     async def fetch_page_by_filter(
-        cls, limit: int, page: int, **filters
-    ) -> Tuple[List[T], int]:
+        cls, limit: int, page: int, cursor: Optional[str] = None, **filters
+    ) -> Tuple[List[T], int, Optional[str]]:
         """根据分页与条件查询
 
         Args:
             limit (int): _description_
             page (int): _description_
+            cursor (Optional[str]): 分页游标, 传入时使用游标分页
 
         Returns:
-            _type_: _description_
+            Tuple[List[T], int, Optional[str]]: (当前页数据, 总数, 下一页游标)
         """
-        query = cls.model.filter(**filters)
-        result = await query.offset(limit * (page - 1)).limit(limit).all()
-        # total
-        total = await query.count()
-        return result, total
+        return await paginate(cls.model.filter(**filters), limit, page, cursor)
 
     @classmethod
     async def create(cls, **kwargs) -> T:
@@ -88,6 +202,223 @@ class BaseRepository(Generic[T]):
         update_num = await cls.model.filter(pk=pk).update(**kwargs)
         return update_num
 
+    @classmethod
+    def _to_instances(cls, objects: Sequence[Union[T, dict]]) -> List[T]:
+        return [
+            obj if isinstance(obj, cls.model) else cls.model(**obj) for obj in objects
+        ]
+
+    @classmethod
+    def _log_bulk(cls, action: str, result: BulkResult) -> BulkResult:
+        log.opt(lazy=True).debug(
+            "{} {} {} rows in {} chunks: {}",
+            lambda: cls.model.__name__,
+            lambda: action,
+            lambda: result.rows,
+            lambda: len(result.chunks),
+            lambda: ", ".join(f"{n}/{t * 1000:.1f}ms" for n, t in result.chunks),
+        )
+        return result
+
+    @classmethod
+    async def bulk_create(
+        cls,
+        objects: Sequence[Union[T, dict]],
+        chunk_size: int = config.BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """分块批量新增
+
+        Args:
+            objects (Sequence[Union[T, dict]]): 模型对象或字段字典
+            chunk_size (int): 每条语句的行数
+
+        Returns:
+            BulkResult: 总行数与每个分块的耗时
+        """
+        instances = cls._to_instances(objects)
+        chunks = []
+        for chunk in chunked(instances, chunk_size):
+            start = time.perf_counter()
+            await cls.model.bulk_create(chunk)
+            chunks.append((len(chunk), time.perf_counter() - start))
+        return cls._log_bulk("created", BulkResult(len(instances), chunks))
+
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        objects: Sequence[Union[T, dict]],
+        conflict: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+        chunk_size: int = config.BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """分块批量新增, 唯一键冲突时更新已有记录
+
+        Args:
+            objects (Sequence[Union[T, dict]]): 模型对象或字段字典
+            conflict (Sequence[str]): 冲突判断的唯一字段, 例如("case_no",)
+            update_fields (Optional[Sequence[str]]): 冲突时更新的字段, 默认为除主键、
+                conflict与created_at以外的所有字段
+            chunk_size (int): 每条语句的行数
+
+        Returns:
+            BulkResult: 总行数与每个分块的耗时
+        """
+        meta = cls.model._meta
+        if update_fields is None:
+            excluded = {meta.pk_attr, "created_at", *conflict}
+            update_fields = [f for f in meta.fields_db_projection if f not in excluded]
+        conflict_columns = [meta.fields_db_projection[f] for f in conflict]
+        update_columns = [meta.fields_db_projection[f] for f in update_fields]
+        instances = cls._to_instances(objects)
+        chunks = []
+        for chunk in chunked(instances, chunk_size):
+            start = time.perf_counter()
+            await cls.model.bulk_create(
+                chunk, on_conflict=conflict_columns, update_fields=update_columns
+            )
+            chunks.append((len(chunk), time.perf_counter() - start))
+        return cls._log_bulk("upserted", BulkResult(len(instances), chunks))
+
+    @classmethod
+    async def bulk_update(
+        cls,
+        objects: Sequence[T],
+        fields: Sequence[str],
+        chunk_size: int = config.BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """分块批量更新已有记录的指定字段
+
+        Args:
+            objects (Sequence[T]): 带主键的模型对象
+            fields (Sequence[str]): 更新的字段
+            chunk_size (int): 每条语句的行数
+
+        Returns:
+            BulkResult: 总行数与每个分块的耗时
+        """
+        # bulk_update不会自动刷新auto_now字段
+        if "update_at" in cls.model._meta.fields_map and "update_at" not in fields:
+            now = timezone.now()
+            for obj in objects:
+                obj.update_at = now
+            fields = [*fields, "update_at"]
+        chunks = []
+        for chunk in chunked(objects, chunk_size):
+            start = time.perf_counter()
+            await cls.model.bulk_update(chunk, fields)
+            chunks.append((len(chunk), time.perf_counter() - start))
+        return cls._log_bulk("updated", BulkResult(len(objects), chunks))
+
+    @classmethod
+    async def bulk_delete_by_filter(
+        cls, chunk_size: int = config.BULK_CHUNK_SIZE, **filters
+    ) -> BulkResult:
+        """按筛选条件分块删除, 每次按主键删除一块, 避免单条语句长时间锁表
+
+        Returns:
+            BulkResult: 删除的总行数与每个分块的耗时
+        """
+        chunks = []
+        total = 0
+        while True:
+            start = time.perf_counter()
+            pks = await cls.model.filter(**filters).limit(chunk_size).values_list(
+                cls.model._meta.pk_attr, flat=True
+            )
+            if not pks:
+                break
+            deleted = await cls.model.filter(pk__in=pks).delete()
+            chunks.append((deleted, time.perf_counter() - start))
+            total += deleted
+            if len(pks) < chunk_size:
+                break
+        return cls._log_bulk("deleted", BulkResult(total, chunks))
+
+    @classmethod
+    async def sync_relation(
+        cls, pk: int, relation: str, target_ids: Sequence[int]
+    ) -> SyncResult:
+        """将多对多关联同步为target_ids, 固定两条语句, 与关联数量无关
+
+        DELETE ... NOT IN 删除多余的关联, INSERT ... SELECT 补充缺少的关联,
+        不存在的目标id被忽略. 在事务中调用时使用当前事务的连接.
+
+        Args:
+            pk (int): 当前模型主键
+            relation (str): 多对多字段名, 例如Role的"menus"
+            target_ids (Sequence[int]): 同步后的关联id
+
+        Returns:
+            SyncResult: 删除与新增的关联数
+        """
+        field = cls.model._meta.fields_map[relation]
+        related_meta = field.related_model._meta
+        through = Table(field.through)
+        owner, target = through[field.backward_key], through[field.forward_key]
+        target_ids = sorted({int(i) for i in target_ids})
+        db = cls.model._choose_db(True)
+
+        condition = owner == pk
+        if target_ids:
+            condition &= target.notin(target_ids)
+        removed, _ = await db.execute_query(
+            str(db.query_class.from_(through).where(condition).delete())
+        )
+        added = 0
+        if target_ids:
+            related = Table(related_meta.db_table)
+            related_pk = related[related_meta.db_pk_column]
+            current = db.query_class.from_(through).select(target).where(owner == pk)
+            query = (
+                db.query_class.into(through)
+                .columns(owner, target)
+                .from_(related)
+                .select(ValueWrapper(pk), related_pk)
+                .where(related_pk.isin(target_ids) & related_pk.notin(current))
+            )
+            added, _ = await db.execute_query(str(query))
+        log.opt(lazy=True).debug(
+            "{}.{} synced for {}: -{} +{}",
+            lambda: cls.model.__name__,
+            lambda: relation,
+            lambda: pk,
+            lambda: removed,
+            lambda: added,
+        )
+        return SyncResult(removed, added)
+
+    @classmethod
+    async def bulk_add_relation(
+        cls,
+        relation: str,
+        pairs: Sequence[Tuple[int, int]],
+        chunk_size: int = config.BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """分块批量写入多对多关联, 调用方保证关联不重复
+
+        Args:
+            relation (str): 多对多字段名, 例如Users的"roles"
+            pairs (Sequence[Tuple[int, int]]): (当前模型主键, 关联模型主键)
+            chunk_size (int): 每条语句的行数
+
+        Returns:
+            BulkResult: 总行数与每个分块的耗时
+        """
+        field = cls.model._meta.fields_map[relation]
+        through = Table(field.through)
+        db = cls.model._choose_db(True)
+        chunks = []
+        for chunk in chunked(pairs, chunk_size):
+            start = time.perf_counter()
+            query = (
+                db.query_class.into(through)
+                .columns(through[field.backward_key], through[field.forward_key])
+                .insert(*((int(pk), int(related_pk)) for pk, related_pk in chunk))
+            )
+            await db.execute_query(str(query))
+            chunks.append((len(chunk), time.perf_counter() - start))
+        return cls._log_bulk(f"{relation} added", BulkResult(len(pairs), chunks))
+
     @classmethod
     async def delete_by_pk(cls, pk: int) -> int:
         """根据主键删除记录
@@ -0,0 +1,14 @@
+"""测试用例数据访问模块"""
+
+from ...repositories import BaseRepository
+from ...db.models import TestCase
+
+
+class TestCaseRepository(BaseRepository[TestCase]):
+    """测试用例数据访问仓库
+
+    Args:
+        BaseRepository (_type_): _description_
+    """
+
+    model = TestCase
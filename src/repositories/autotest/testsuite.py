@@ -0,0 +1,14 @@
+"""测试套件数据访问模块"""
+
+from ...repositories import BaseRepository
+from ...db.models import TestSuite
+
+
+class TestSuiteRepository(BaseRepository[TestSuite]):
+    """测试套件数据访问仓库
+
+    Args:
+        BaseRepository (_type_): _description_
+    """
+
+    model = TestSuite
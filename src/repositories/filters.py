@@ -0,0 +1,104 @@
+"""声明式列表筛选
+
+每个列表接口声明自己的筛选字段, 由FilterSpec编译为最少的查询条件:
+时间筛选只生成一个created_at条件; 文本筛选在字段有索引(含唯一约束)时使用
+可以走索引的前缀匹配(`__prefix`, 见src.db.filters), 否则使用icontains.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Type
+from tortoise.indexes import Index
+from tortoise.models import Model
+
+# 时间筛选参数的格式
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def is_indexed(model: Type[Model], path: str) -> bool:
+    """字段路径(可跨关联, 如testsuites__suite_title)的最终字段是否为索引的最左列"""
+    *relations, name = path.split("__")
+    for relation in relations:
+        model = model._meta.fields_map[relation].related_model
+    meta = model._meta
+    field = meta.fields_map[name]
+    if field.pk or field.index or field.unique:
+        return True
+    for columns in (*meta.indexes, *meta.unique_together):
+        if isinstance(columns, Index):
+            # 全文索引等特殊索引不能用于前缀匹配
+            if columns.INDEX_TYPE:
+                continue
+            columns = columns.fields
+        if columns and columns[0] == name:
+            return True
+    return False
+
+
+class FilterSpec:
+    """列表筛选声明
+
+    Args:
+        model (Type[Model]): 列表查询的模型
+        text (Dict[str, str]): 文本筛选, 参数名: 字段路径
+        exact (Dict[str, str]): 精确筛选, 参数名: 字段路径
+        time_field (str): begin_time/end_time筛选的时间字段
+
+    Example:
+        >>> spec = FilterSpec(TestCase, text={"case_title": "case_title"})
+        >>> TestCase.filter(**spec.compile(case_title="登录", begin_time="2024-01-01"))
+    """
+
+    def __init__(
+        self,
+        model: Type[Model],
+        text: Optional[Dict[str, str]] = None,
+        exact: Optional[Dict[str, str]] = None,
+        time_field: str = "created_at",
+    ) -> None:
+        self.model = model
+        self.text = text or {}
+        self.exact = exact or {}
+        self.time_field = time_field
+        self._lookups: Optional[Dict[str, str]] = None
+
+    @property
+    def lookups(self) -> Dict[str, str]:
+        """参数名: 查询条件键, 关联模型在Tortoise.init之后才可用, 因此首次使用时解析"""
+        if self._lookups is None:
+            lookups = {param: path for param, path in self.exact.items()}
+            for param, path in self.text.items():
+                lookup = "prefix" if is_indexed(self.model, path) else "icontains"
+                lookups[param] = f"{path}__{lookup}"
+            self._lookups = lookups
+        return self._lookups
+
+    def compile(
+        self,
+        begin_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        **params: Any,
+    ) -> Dict[str, Any]:
+        """编译为filter(**filters)可用的条件, 值为None或空字符串的参数忽略
+
+        Args:
+            begin_time (Optional[str]): 开始时间, 格式%Y-%m-%d
+            end_time (Optional[str]): 结束时间, 格式%Y-%m-%d
+            **params: 声明过的筛选参数
+
+        Returns:
+            Dict[str, Any]: 查询条件
+        """
+        filters = {}
+        for param, value in params.items():
+            if value is None or value == "":
+                continue
+            filters[self.lookups[param]] = value
+        begin = datetime.strptime(begin_time, DATE_FORMAT) if begin_time else None
+        end = datetime.strptime(end_time, DATE_FORMAT) if end_time else None
+        if begin and end:
+            filters[f"{self.time_field}__range"] = (begin, end)
+        elif begin:
+            filters[f"{self.time_field}__gte"] = begin
+        elif end:
+            filters[f"{self.time_field}__lte"] = end
+        return filters
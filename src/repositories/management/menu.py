@@ -0,0 +1,76 @@
+"""菜单数据访问模块"""
+
+from typing import Iterable, List
+from ...repositories import BaseRepository
+from ...db.models import Routes
+
+
+class MenuRepository(BaseRepository[Routes]):
+    """菜单数据访问仓库
+
+    菜单只按平铺列表查询, 一次Routes JOIN route_meta查询, 查询数与层级无关;
+    树由schema层(MenuTreeMixin.build_tree)在内存中组装.
+    """
+
+    model = Routes
+
+    @classmethod
+    async def fetch_flat(cls, **filters) -> List[Routes]:
+        """查询菜单平铺列表, 同时获取route_meta
+
+        按角色筛选(menus__id__in)时同一菜单可能关联多个角色, 因此去重.
+        """
+        return await (
+            cls.model.filter(**filters)
+            .select_related("route_meta")
+            .distinct()
+            .order_by("id")
+        )
+
+    @classmethod
+    async def subtree_ids(cls, root_ids: Iterable[int]) -> List[int]:
+        """根菜单及其全部子孙菜单的id, 一条递归CTE查询, 与层级无关
+
+        UNION去重, 数据成环时递归也会结束.
+        """
+        root_ids = sorted({int(pk) for pk in root_ids})
+        if not root_ids:
+            return []
+        meta = cls.model._meta
+        pk = meta.db_pk_column
+        parent = meta.fields_db_projection["parent_id"]
+        table = meta.db_table
+        sql = (
+            f"WITH RECURSIVE subtree ({pk}) AS ("
+            f"SELECT {pk} FROM {table} WHERE {pk} IN ({', '.join(map(str, root_ids))})"
+            f" UNION SELECT t.{pk} FROM {table} t JOIN subtree s ON t.{parent} = s.{pk}"
+            f") SELECT {pk} FROM subtree"
+        )
+        rows = await cls.model._choose_db().execute_query_dict(sql)
+        return [row[pk] for row in rows]
+
+    @classmethod
+    async def fetch_descendants(cls, root_ids: Iterable[int], **filters) -> List[Routes]:
+        """查询根菜单的子孙菜单(不含根菜单), 固定两条查询
+
+        Returns:
+            List[Routes]: 满足筛选条件的子孙菜单平铺列表
+        """
+        root_ids = set(root_ids)
+        ids = [pk for pk in await cls.subtree_ids(root_ids) if pk not in root_ids]
+        if not ids:
+            return []
+        return await cls.fetch_flat(id__in=ids, **filters)
+
+    @classmethod
+    async def fetch_subtree(cls, pk: int) -> List[Routes]:
+        """查询单个菜单及其全部子孙菜单, 固定两条查询
+
+        Returns:
+            List[Routes]: 首个元素为该菜单, 其后为子孙菜单; 菜单不存在时为空列表
+        """
+        ids = await cls.subtree_ids([pk])
+        if not ids:
+            return []
+        nodes = await cls.fetch_flat(id__in=ids)
+        return sorted(nodes, key=lambda node: node.id != pk)
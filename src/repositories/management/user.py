@@ -1,7 +1,7 @@
 """用户数据访问模块"""
 
-from typing import Tuple, List
-from ...repositories import BaseRepository
+from typing import Tuple, List, Optional
+from ...repositories import BaseRepository, paginate
 from ...db.models import Users
 
 
@@ -43,20 +43,12 @@ class UserRepository(BaseRepository[Users]):
 
     @classmethod
     async def fetch_user_list_by_filter_with_roles(
-        cls, limit: int, page: int, **filters
-    ) -> Tuple[List[Users], int]:
+        cls, limit: int, page: int, cursor: Optional[str] = None, **filters
+    ) -> Tuple[List[Users], int, Optional[str]]:
         """查询用户列表预取关联role
 
         Returns:
-            Tuple[List[Users], int]: _description_
+            Tuple[List[Users], int, Optional[str]]: (当前页数据, 总数, 下一页游标)
         """
-        query = Users.filter(**filters)
-        result = (
-            await query.prefetch_related("roles")
-            .offset(limit * (page - 1))
-            .limit(limit)
-            .all()
-        )
-        # total
-        total = await query.count()
-        return result, total
+        query = Users.filter(**filters).prefetch_related("roles")
+        return await paginate(query, limit, page, cursor)
@@ -0,0 +1,99 @@
+"""全文检索
+
+mysql使用ngram全文索引(见src.db.base_models.fulltext_index), 按MATCH ... AGAINST的相关度排序;
+其他数据库没有全文索引, 退化为多字段icontains并按创建时间倒序.
+
+项目未提交迁移文件且generate_schemas=False, 已有数据库需要执行src/db/sql/fulltext_search.sql
+创建全文索引; 索引不存在时同样退化为icontains, 避免MATCH报错(1191).
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import List, Sequence, Tuple, Type
+from pypika.terms import Term
+from tortoise import connections
+from tortoise.expressions import Q
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+from tortoise.contrib.mysql.search import Mode, SearchCriterion
+from src.config import config
+from ..core.cache import LocalCache
+from ..core.count_cache import CountCache
+from ..utils.log_util import log
+from . import PAGE_ORDERING
+
+# 全文索引是否存在, 按(表, 字段)缓存; 不存在时定期重新检查, 创建索引后无需重启
+_fulltext_indexes = LocalCache(maxsize=64)
+FULLTEXT_RECHECK_SECONDS = 60
+
+
+def relevance(model: Type[Model], fields: Sequence[str], keyword: str) -> Term:
+    """MATCH(fields) AGAINST(keyword), 字段需要与全文索引的字段完全一致"""
+    table = model._meta.basetable
+    columns = [table[model._meta.fields_db_projection[name]] for name in fields]
+    return SearchCriterion(
+        *columns,
+        expr=columns[0].wrap_constant(keyword),
+        mode=Mode.NATURAL_LANGUAGE_MODE,
+    )
+
+
+async def has_fulltext_index(model: Type[Model], fields: Sequence[str]) -> bool:
+    """mysql中是否存在与fields完全一致的FULLTEXT索引"""
+    table = model._meta.db_table
+    key = (table, tuple(fields))
+    exists = _fulltext_indexes.get(key)
+    if exists is not None:
+        return exists
+    client = connections.get(model._meta.default_connection)
+    rows = await client.execute_query_dict(
+        "SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name "
+        "FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = %s AND INDEX_TYPE = 'FULLTEXT'",
+        [table],
+    )
+    indexes = defaultdict(set)
+    for row in rows:
+        indexes[row["index_name"]].add(row["column_name"])
+    columns = {model._meta.fields_db_projection[name] for name in fields}
+    exists = columns in indexes.values()
+    if exists:
+        _fulltext_indexes.set(key, True)
+    else:
+        log.warning(
+            f"{table}缺少全文索引{sorted(columns)}, 检索退化为icontains, "
+            "请执行src/db/sql/fulltext_search.sql"
+        )
+        _fulltext_indexes.set(key, False, ttl=FULLTEXT_RECHECK_SECONDS)
+    return exists
+
+
+async def search(
+    query: QuerySet, fields: Sequence[str], keyword: str, limit: int, page: int = 1
+) -> Tuple[List[Model], int]:
+    """全文检索分页查询
+
+    Args:
+        query (QuerySet): 基础查询, 可以带prefetch_related
+        fields (Sequence[str]): 全文索引字段
+        keyword (str): 关键字
+        limit (int): 分页大小
+        page (int): 当前分页
+
+    Returns:
+        Tuple[List[Model], int]: (当前页数据, 总数), 使用全文索引时按相关度倒序
+    """
+    if config.DB_ENGINE == "mysql" and await has_fulltext_index(query.model, fields):
+        query = query.annotate(
+            relevance=relevance(query.model, fields, keyword)
+        ).filter(relevance__gt=0)
+        page_query = query.order_by("-relevance", "-id")
+    else:
+        query = query.filter(
+            Q(*(Q(**{f"{name}__icontains": keyword}) for name in fields), join_type="OR")
+        )
+        page_query = query.order_by(*PAGE_ORDERING)
+    rows, total = await asyncio.gather(
+        page_query.offset(limit * (page - 1)).limit(limit), CountCache.count(query)
+    )
+    return rows, total
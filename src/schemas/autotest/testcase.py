@@ -1,7 +1,8 @@
 """测试用例schema"""
 
+import json
 from typing import Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from src.utils.enum_util import BoolEnum, ApiMethodEnum, RequestParamTypeEnum
 from src.schemas.common import PageParam, CommonMixinModel
 
@@ -63,6 +64,61 @@ class TestCaseIn(BaseModel):
     remark: Optional[str] = Field(default=None, description="备注")
 
 
+# 导入模板的列顺序
+TESTCASE_IMPORT_COLUMNS = (
+    "case_no",
+    "case_title",
+    "case_description",
+    "case_module",
+    "case_sub_module",
+    "case_is_execute",
+    "api_path",
+    "api_method",
+    "request_headers",
+    "request_param_type",
+    "request_param",
+    "expect_code",
+    "expect_result",
+    "expect_data",
+    "request_to_redis",
+    "response_to_redis",
+    "case_editor",
+    "remark",
+)
+
+
+class TestCaseImportIn(TestCaseIn):
+    """excel导入的行数据schema, 单元格按字段名传入"""
+
+    model_config = ConfigDict(populate_by_name=True, coerce_numbers_to_str=True)
+
+    @field_validator("request_headers", mode="before")
+    @classmethod
+    def parse_request_headers(cls, value):
+        """单元格中的请求头为json字符串"""
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+
+class TestCaseImportError(BaseModel):
+    """导入失败的行"""
+
+    sheet: str = Field(description="sheet名称")
+    row: int = Field(description="行号")
+    error: str = Field(description="错误信息")
+
+
+class TestCaseImportOut(BaseModel):
+    """导入测试用例 res schema"""
+
+    rows: int = Field(description="导入成功的行数")
+    failed: int = Field(description="校验失败的行数")
+    errors: List[TestCaseImportError] = Field(
+        description="校验失败的行, 最多返回TESTCASE_IMPORT_MAX_ERRORS条"
+    )
+
+
 class TestCaseOut(CommonMixinModel):
     """测试用例 response schema"""
 
@@ -1,8 +1,10 @@
 """公共schema"""
 
-from typing import Optional, TypeVar, Generic
+from typing import Optional, TypeVar, Generic, List, Tuple, Type
 from datetime import datetime
-from pydantic import Field, BaseModel, ConfigDict
+from functools import lru_cache
+from pydantic import Field, BaseModel, ConfigDict, create_model
+from src.utils.exceptions.common import InvalidFieldsException
 
 
 DataT = TypeVar("DataT")
@@ -31,6 +33,11 @@ class PageParam(BaseModel):
     page: int = Field(description="当前分页")
     limit: int = Field(description="分页大小")
     total: int = Field(description="总数据数")
+    next_cursor: Optional[str] = Field(
+        default=None,
+        serialization_alias="nextCursor",
+        description="下一页游标, 为空表示没有更多数据",
+    )
 
 
 class CommonMixinModel(BaseModel):
@@ -45,6 +52,66 @@ class CommonMixinModel(BaseModel):
     update_at: Optional[datetime] = Field(default=None, serialization_alias="updateAt")
 
 
+# 投影时总是返回的字段, 游标分页依赖created_at与id
+SPARSE_REQUIRED_FIELDS = ("id", "created_at")
+
+
+def parse_fields(model: Type[BaseModel], raw: str) -> Tuple[str, ...]:
+    """解析fields=参数, 支持字段名与序列化别名, 例如"caseTitle,api_path"
+
+    Args:
+        model (Type[BaseModel]): 完整的response schema
+        raw (str): 逗号分隔的字段
+
+    Raises:
+        InvalidFieldsException: 包含schema中不存在的字段
+
+    Returns:
+        Tuple[str, ...]: 去重后的字段名, 包含SPARSE_REQUIRED_FIELDS
+    """
+    names = {}
+    for name, info in model.model_fields.items():
+        names[name] = name
+        if info.serialization_alias:
+            names[info.serialization_alias] = name
+    fields = list(SPARSE_REQUIRED_FIELDS)
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if item not in names:
+            raise InvalidFieldsException(item)
+        if names[item] not in fields:
+            fields.append(names[item])
+    return tuple(fields)
+
+
+@lru_cache(maxsize=256)
+def sparse_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """只包含fields的动态schema, 字段定义(别名、描述)沿用model"""
+    definitions = {
+        name: (model.model_fields[name].annotation, model.model_fields[name])
+        for name in fields
+    }
+    return create_model(
+        f"{model.__name__}Sparse",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=256)
+def sparse_page_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """分页列表的动态response schema, data中只包含fields"""
+    return ResultResponse[
+        create_model(
+            f"{model.__name__}SparsePage",
+            __base__=PageParam,
+            data=(List[sparse_model(model, fields)], ...),
+        )
+    ]
+
+
 # class CommonListQueryMixinModel(BaseModel):
 #     """公共列表查询schema"""
 
@@ -1,7 +1,9 @@
 """菜单scheams"""
 
-from typing import Optional, List, Union
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, List, Union
 from pydantic import BaseModel, Field, field_validator, ConfigDict
+from tortoise.exceptions import NoValuesFetched
 from tortoise.fields.relational import ReverseRelation
 from src.db.models import Routes
 from src.utils.enum_util import BoolEnum
@@ -54,7 +56,50 @@ class AddMenuIn(MenuMixinModel):
     meta: MenuMetaIn
 
 
-class MenuTo(CommonMixinModel, MenuMixinModel):
+class MenuTreeMixin:
+    """由菜单平铺列表组装树形schema"""
+
+    @classmethod
+    def build_tree(
+        cls, nodes: Iterable[Routes], roots: Optional[List[Routes]] = None
+    ) -> list:
+        """按parent_id将菜单平铺列表组装为树, O(n), 不限层级
+
+        children直接使用组装好的列表, 不读取ORM的反向关系, 序列化时不会再查询数据库.
+        父节点不在nodes中的节点(例如父菜单被禁用或无权限)不会出现在树中.
+
+        Args:
+            nodes (Iterable[Routes]): 菜单平铺列表
+            roots (Optional[List[Routes]]): 树的根节点, 默认为nodes中parent_id为空的节点
+
+        Returns:
+            list: 根节点schema列表
+        """
+        nodes = list(nodes)
+        children: Dict[int, List[Routes]] = defaultdict(list)
+        for node in nodes:
+            if node.parent_id is not None:
+                children[node.parent_id].append(node)
+        if roots is None:
+            roots = [node for node in nodes if node.parent_id is None]
+
+        # 每个节点只组装一次, 成环或重复出现的节点被跳过
+        visited = set()
+
+        def build(node: Routes):
+            visited.add(node.id)
+            item = cls.model_validate(node)
+            item.children = [
+                build(child)
+                for child in children.get(node.id, [])
+                if child.id not in visited
+            ]
+            return item
+
+        return [build(root) for root in roots if root.id not in visited]
+
+
+class MenuTo(MenuTreeMixin, CommonMixinModel, MenuMixinModel):
     """menu res schmea"""
 
     parent_id: Optional[int] = Field(default=None, serialization_alias="parentId")
@@ -73,7 +118,7 @@ class MenuTo(CommonMixinModel, MenuMixinModel):
     ) -> Union[Routes, List[None]]:
         """
         有children返回,没有返回None
-        TODO 多层嵌套children时的处理
+        多层嵌套时children由build_tree组装, 未获取的反向关系视为空
         """
         try:
             result = [children for children in v]
@@ -90,7 +135,7 @@ class MenuTo(CommonMixinModel, MenuMixinModel):
     #     return [meta for meta in v][0]
 
 
-class TreeSelectOut(BaseModel):
+class TreeSelectOut(MenuTreeMixin, BaseModel):
     """树形菜单 res schema"""
 
     model_config = ConfigDict(from_attributes=True)
@@ -119,8 +164,10 @@ class TreeSelectOut(BaseModel):
         """模型验证前修改入参"""
 
         try:
-            res = [MenuTo.model_validate(children) for children in value]
-            return res
+            return [children for children in value]
+        except NoValuesFetched:
+            # 未获取的反向关系, children由build_tree组装
+            return []
         except AttributeError as e:
             # orm对象返回空，不做处理
             log.error(e)
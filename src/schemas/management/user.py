@@ -1,7 +1,7 @@
 """user schemas"""
 
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from ...db.models import BoolEnum
 from ..common import PageParam, CommonMixinModel
 
@@ -21,6 +21,37 @@ class UserIn(UserMixinModel):
     user_roles: list = Field(description="角色id列表", alias="roleIds")
 
 
+class UserImportIn(UserIn):
+    """批量导入用户的行数据schema, 角色使用role_key而不是id"""
+
+    user_roles: List[str] = Field(
+        min_length=1, description="角色字符列表", alias="roleKeys"
+    )
+    status: BoolEnum = Field(default=BoolEnum.TRUE, description="0:Disable,1:Enable")
+
+    @field_validator("user_roles", mode="before")
+    @classmethod
+    def split_role_keys(cls, value):
+        """表格中多个角色以逗号分隔"""
+        if isinstance(value, str):
+            return [key.strip() for key in value.split(",") if key.strip()]
+        return value
+
+    @field_validator("user_name", "password", "remark", mode="before")
+    @classmethod
+    def cell_to_str(cls, value):
+        """excel单元格可能为数字"""
+        return str(value) if isinstance(value, (int, float)) else value
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def cell_to_status(cls, value):
+        """空单元格使用默认状态, csv单元格为字符串"""
+        if value is None or value == "":
+            return BoolEnum.TRUE
+        return int(value) if isinstance(value, str) and value.strip().isdigit() else value
+
+
 class UserUpdateIn(BaseModel):
     """用户更新schema"""
 
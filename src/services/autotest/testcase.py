@@ -1,46 +1,238 @@
 import json
-from typing import Union, List, NamedTuple
+import asyncio
+import threading
+import multiprocessing
+from pathlib import Path
+from queue import Queue, Empty, Full
 from fastapi import HTTPException, status
+from pydantic import ValidationError
 from tortoise.exceptions import DoesNotExist
-from tortoise.queryset import QuerySet
 from httpx import AsyncClient, TimeoutException, Response
 from ...utils.exceptions.testcase import (
     RequestTimeOutException,
     AssertErrorException,
 )
+from ...config import config
 from ...db.models import TestCase
+from ...core.etag import ResourceVersion
+from ...repositories.autotest.testcase import TestCaseRepository
+from ...schemas.autotest.testcase import (
+    TESTCASE_IMPORT_COLUMNS,
+    TestCaseImportIn,
+    TestCaseImportOut,
+)
+from ...utils.excel_util import iter_sheet_rows
 from ...utils.log_util import log
 
+# 解析与写入之间最多缓存的分块数, 解析快于写入时解析方阻塞, 内存占用与总行数无关
+_IMPORT_QUEUE_SIZE = 2
+# 同时进行的导入数, 每个导入占用一个解析进程(或线程)
+_import_slots = asyncio.Semaphore(config.TESTCASE_IMPORT_CONCURRENCY)
+
+
+def _put(queue, stop, message) -> bool:
+    """放入队列, 导入方已停止时放弃"""
+    while not stop.is_set():
+        try:
+            queue.put(message, timeout=1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _get(queue, worker):
+    """从队列获取, 解析方异常退出时报错而不是一直等待"""
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if not worker.is_alive():
+                # 退出前放入的消息可能仍在管道中
+                try:
+                    return queue.get(timeout=1)
+                except Empty:
+                    raise RuntimeError("testcase import worker exited unexpectedly")
+
+
+def _relay(queue, worker, stop, credits, loop, messages: asyncio.Queue) -> None:
+    """在专用线程中读取解析方的消息并转发到事件循环, 不占用默认线程池
+
+    每转发一条消息消耗一个credit, 导入方处理完后归还, 转发方不会超前读取.
+    """
+    while True:
+        while not credits.acquire(timeout=1):
+            if stop.is_set():
+                return
+        if stop.is_set():
+            return
+        try:
+            message = _get(queue, worker)
+        except Exception as exc:
+            message = exc
+        try:
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+        except RuntimeError:
+            # 事件循环已关闭
+            return
+        if not isinstance(message, tuple) or message[0] != "chunk":
+            return
+
+
+def _produce_testcase_chunks(filepath: str, chunk_size: int, queue, stop) -> None:
+    """逐行解析并校验用例, 按分块放入队列, 在独立进程或线程中运行
+
+    消息: ("chunk", 校验通过的行, 错误行) / ("done",) / ("failed", 错误信息)
+    """
+    try:
+        rows, errors = [], []
+        for sheet, number, row in iter_sheet_rows(
+            Path(filepath), len(TESTCASE_IMPORT_COLUMNS)
+        ):
+            # 空单元格不传入, 使用schema默认值
+            data = {
+                name: value
+                for name, value in zip(TESTCASE_IMPORT_COLUMNS, row)
+                if value is not None
+            }
+            try:
+                testcase = TestCaseImportIn.model_validate(data)
+            except ValidationError as exc:
+                errors.append(
+                    dict(
+                        sheet=sheet,
+                        row=number,
+                        error="; ".join(
+                            f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                            for err in exc.errors()
+                        ),
+                    )
+                )
+            else:
+                values = testcase.model_dump(exclude_unset=True)
+                if values.get("request_headers") is not None:
+                    values["request_headers"] = json.dumps(
+                        values["request_headers"], ensure_ascii=False
+                    )
+                rows.append(values)
+            if len(rows) + len(errors) >= chunk_size:
+                if not _put(queue, stop, ("chunk", rows, errors)):
+                    return
+                rows, errors = [], []
+        if (rows or errors) and not _put(queue, stop, ("chunk", rows, errors)):
+            return
+        _put(queue, stop, ("done",))
+    except Exception as exc:
+        _put(queue, stop, ("failed", f"{type(exc).__name__}: {exc}"))
+    finally:
+        # 导入方已停止时不等待未读取的消息写完再退出
+        if stop.is_set() and hasattr(queue, "cancel_join_thread"):
+            queue.cancel_join_thread()
+
 
 class TestCaseService:
     """测试用例服务"""
 
     @staticmethod
-    async def add_testcase(testcase: Union[dict, NamedTuple]) -> QuerySet:
+    async def add_testcase(testcase: dict) -> TestCase:
         """添加单条测试用例
 
         Args:
-            testcase (Union[dict, NamedTuple]): 测试用例数据,导入时为具名元组,添加单条时是字典类型
+            testcase (dict): 测试用例数据
 
         Returns:
             TestCase: _description_
         """
-        if isinstance(testcase, tuple):
-            result = await TestCase.create(**testcase._asdict())
-        else:
-            result = await TestCase.create(**testcase)
-        return result
+        return await TestCase.create(**testcase)
 
     @staticmethod
-    async def add_testcase_from_list(testcases: List[NamedTuple]) -> None:
-        """导入测试用例列表
+    async def import_testcases(
+        filepath: Path, chunk_size: int = config.BULK_CHUNK_SIZE
+    ) -> TestCaseImportOut:
+        """流式导入excel测试用例, 用例编号已存在时更新该用例
+
+        解析与校验在独立进程(或线程, 见TESTCASE_IMPORT_EXECUTOR)中逐行进行,
+        每校验完一个分块就写入数据库, 内存占用与总行数无关.
+        校验失败的行被跳过并返回错误, 其余行照常导入.
+        同时进行的导入数由TESTCASE_IMPORT_CONCURRENCY限制, 超出时排队等待.
 
         Args:
-            testcases (List[NamedTuple]): namedtuple组成的列表
+            filepath (Path): xlsx或csv文件路径
+            chunk_size (int): 每个分块的行数
+
+        Raises:
+            HTTPException: 文件无法解析
+
+        Returns:
+            TestCaseImportOut: 导入行数与校验失败的行
         """
-        # 转换namedtuple列表为模型对象列表
-        testcase_model_list = [TestCase(**testcase._asdict()) for testcase in testcases]
-        await TestCase.bulk_create(testcase_model_list)
+        async with _import_slots:
+            return await TestCaseService._import_testcases(filepath, chunk_size)
+
+    @staticmethod
+    async def _import_testcases(filepath: Path, chunk_size: int) -> TestCaseImportOut:
+        """import_testcases的实现, 调用方已获取导入名额"""
+        if config.TESTCASE_IMPORT_EXECUTOR == "process":
+            ctx = multiprocessing.get_context("spawn")
+            queue, stop = ctx.Queue(maxsize=_IMPORT_QUEUE_SIZE), ctx.Event()
+            worker_class = ctx.Process
+        else:
+            queue, stop = Queue(maxsize=_IMPORT_QUEUE_SIZE), threading.Event()
+            worker_class = threading.Thread
+        worker = worker_class(
+            target=_produce_testcase_chunks,
+            args=(str(filepath), chunk_size, queue, stop),
+            daemon=True,
+        )
+        worker.start()
+        loop = asyncio.get_running_loop()
+        messages: asyncio.Queue = asyncio.Queue()
+        credits = threading.Semaphore(_IMPORT_QUEUE_SIZE)
+        threading.Thread(
+            target=_relay,
+            args=(queue, worker, stop, credits, loop, messages),
+            daemon=True,
+        ).start()
+        rows = failed = 0
+        errors = []
+        try:
+            while True:
+                message = await messages.get()
+                credits.release()
+                if isinstance(message, Exception):
+                    raise message
+                if message[0] == "done":
+                    break
+                if message[0] == "failed":
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Failed to load file: {message[1]}",
+                    )
+                _, chunk, chunk_errors = message
+                failed += len(chunk_errors)
+                errors.extend(
+                    chunk_errors[: config.TESTCASE_IMPORT_MAX_ERRORS - len(errors)]
+                )
+                if not chunk:
+                    continue
+                result = await TestCaseRepository.bulk_upsert(
+                    chunk, conflict=("case_no",)
+                )
+                rows += result.rows
+                # 被更新的用例详情与套件详情的ETag随之失效
+                case_ids = await TestCase.filter(
+                    case_no__in=[testcase["case_no"] for testcase in chunk]
+                ).values_list("id", flat=True)
+                await ResourceVersion.bump(
+                    "testcase", *(f"testcase:{case_id}" for case_id in case_ids)
+                )
+        finally:
+            stop.set()
+            await loop.run_in_executor(None, worker.join, 5)
+            if worker.is_alive() and hasattr(worker, "terminate"):
+                worker.terminate()
+        log.info(f"导入测试用例{rows}条, 校验失败{failed}条")
+        return TestCaseImportOut(rows=rows, failed=failed, errors=errors)
 
     @staticmethod
     async def execute_testcase(testcase: TestCase, current_env: str) -> Response:
@@ -1,16 +1,21 @@
 """Task业务逻辑层"""
 
 from typing import Tuple, List, Optional
-from datetime import datetime
 from fastapi import HTTPException, status
 from tortoise.transactions import in_transaction
 from tortoise.exceptions import DoesNotExist, MultipleObjectsReturned
 from src.db.models import ScheduledTask
 from src.repositories.management.task import TaskRepository
+from src.repositories.filters import FilterSpec
 from src.utils.log_util import log
 from src.schemas.management.task import TaskIn
 from src.utils.exceptions.task import TaskNotExistException
 
+# 列表筛选
+TASK_FILTER = FilterSpec(
+    ScheduledTask, text={"task_name": "name"}, exact={"task_status": "status"}
+)
+
 
 class TaskService:
     """task service层"""
@@ -24,7 +29,8 @@ class TaskService:
         end_time: Optional[str],
         limit: int,
         page: int,
-    ) -> Tuple[List[ScheduledTask], int]:
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[ScheduledTask], int, Optional[str]]:
         """查询任务列表
 
         Args:
@@ -34,32 +40,22 @@ class TaskService:
             end_time (str): _description_
             limit (int): _description_
             page (int): _description_
+            cursor (Optional[str]): 分页游标
 
         Returns:
-            Tuple[List[Users], int]: _description_
+            Tuple[List[Users], int, Optional[str]]: (当前页数据, 总数, 下一页游标)
         """
         # 筛选条件
-        filters = {}
-        if task_name:
-            filters["name__icontains"] = task_name
-        if task_status is not None:
-            filters["status"] = task_status
-        if begin_time:
-            begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-            filters["created_at__gte"] = begin_time
-        if end_time:
-            end_time = datetime.strptime(end_time, "%Y-%m-%d")
-            filters["created_at__lte"] = end_time
-        if begin_time and end_time:
-            filters["created_at__range"] = (
-                begin_time,
-                end_time,
-            )
+        filters = TASK_FILTER.compile(
+            begin_time=begin_time,
+            end_time=end_time,
+            task_name=task_name,
+            task_status=task_status,
+        )
         # 执行查询
-        result, total = await TaskRepository.fetch_page_by_filter(
-            limit=limit, page=page, **filters
+        return await TaskRepository.fetch_page_by_filter(
+            limit=limit, page=page, cursor=cursor, **filters
         )
-        return result, total
 
     @staticmethod
     async def query_task_by_id(task_id: int) -> ScheduledTask:
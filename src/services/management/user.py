@@ -1,20 +1,40 @@
 """用户业务逻辑层"""
 
-from typing import Tuple, List
-from datetime import datetime
-from passlib.hash import md5_crypt
+from typing import Any, AsyncIterator, Dict, Tuple, List, Optional
 from fastapi import HTTPException, status
+from pydantic import ValidationError
 from tortoise.transactions import in_transaction
 from tortoise.exceptions import DoesNotExist, MultipleObjectsReturned
-from ...db.models import Users
+from ...config import config
+from ...db.models import Users, Role
+from ...core.premission import PermissionAccess
+from ...core.principal import PrincipalCache
+from ...core.password import PasswordHasher
 from ...repositories.management.user import UserRepository
 from ...repositories.management.role import RoleRepository
+from ...repositories import BulkResult
+from ...repositories.filters import FilterSpec
 from ...utils.log_util import log
+from ...utils.excel_util import csv_line
 from ...utils.exceptions.user import (
     UserNotExistException,
     RoleNotExistException,
+    UserImportException,
 )
-from ...schemas.management.user import UserIn, UserResetPwdIn, UserUpdateIn
+from ...schemas.management.user import (
+    UserIn,
+    UserImportIn,
+    UserResetPwdIn,
+    UserUpdateIn,
+)
+
+# 列表筛选
+USER_FILTER = FilterSpec(
+    Users, text={"username": "user_name"}, exact={"user_status": "status"}
+)
+
+# 导入导出的表头, 导出文件补充password列后可以直接导入
+USER_EXPORT_HEADER = ("userName", "roleKeys", "status", "remark", "createdAt")
 
 
 class UserService:
@@ -29,7 +49,8 @@ class UserService:
         end_time: str,
         limit: int,
         page: int,
-    ) -> Tuple[List[Users], int]:
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Users], int, Optional[str]]:
         """查询用户列表
 
         Args:
@@ -39,32 +60,22 @@ class UserService:
             end_time (str): _description_
             limit (int): _description_
             page (int): _description_
+            cursor (Optional[str]): 分页游标
 
         Returns:
-            Tuple[List[Users], int]: _description_
+            Tuple[List[Users], int, Optional[str]]: (当前页数据, 总数, 下一页游标)
         """
         # 筛选条件
-        filters = {}
-        if username:
-            filters["user_name__icontains"] = username
-        if user_status is not None:
-            filters["status"] = user_status
-        if begin_time:
-            begin_time = datetime.strptime(begin_time, "%Y-%m-%d")
-            filters["created_at__gte"] = begin_time
-        if end_time:
-            end_time = datetime.strptime(end_time, "%Y-%m-%d")
-            filters["created_at__lte"] = end_time
-        if begin_time and end_time:
-            filters["created_at__range"] = (
-                begin_time,
-                end_time,
-            )
+        filters = USER_FILTER.compile(
+            begin_time=begin_time,
+            end_time=end_time,
+            username=username,
+            user_status=user_status,
+        )
         # 执行查询
-        result, total = await UserRepository.fetch_user_list_by_filter_with_roles(
-            limit=limit, page=page, **filters
+        return await UserRepository.fetch_user_list_by_filter_with_roles(
+            limit=limit, page=page, cursor=cursor, **filters
         )
-        return result, total
 
     @staticmethod
     async def query_user_by_username(username: str) -> Users:
@@ -129,8 +140,8 @@ class UserService:
         Returns:
             Users: _description_
         """
-        body.password = md5_crypt.hash(body.password)
-        async with in_transaction():
+        body.password = await PasswordHasher.hash(body.password)
+        async with in_transaction("default"):
             user_obj = await UserRepository.create(
                 **body.model_dump(exclude_unset=True)
             )
@@ -143,6 +154,129 @@ class UserService:
         log.info(f"成功创建用户：{body.model_dump(exclude_unset=True)}")
         return await UserService.query_user_by_id(user_obj.id)
 
+    @staticmethod
+    async def import_users(rows: List[Dict[str, Any]]) -> BulkResult:
+        """批量导入用户, 任意一行校验失败时整体不导入
+
+        角色与已存在的用户名各查询一次, 密码按批在进程池中哈希,
+        用户与user_role关联分块批量写入.
+
+        Args:
+            rows (List[Dict[str, Any]]): 以表头为键的行数据, 见USER_EXPORT_HEADER
+
+        Raises:
+            UserImportException: 数据校验失败, result中为每行的错误
+
+        Returns:
+            BulkResult: 导入用户数与每个分块的耗时
+        """
+        errors = []
+        users: List[Tuple[int, UserImportIn]] = []
+        user_names = set()
+        # 表头为第一行
+        for line, row in enumerate(rows, start=2):
+            try:
+                user = UserImportIn.model_validate(row)
+            except ValidationError as exc:
+                errors.append(
+                    dict(
+                        row=line,
+                        error="; ".join(
+                            f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                            for err in exc.errors()
+                        ),
+                    )
+                )
+                continue
+            if user.user_name in user_names:
+                errors.append(dict(row=line, error=f"用户名重复: {user.user_name}"))
+                continue
+            user_names.add(user.user_name)
+            users.append((line, user))
+        role_ids = dict(
+            await Role.filter(
+                role_key__in={key for _, user in users for key in user.user_roles}
+            ).values_list("role_key", "id")
+        )
+        existing = set(
+            await Users.filter(user_name__in=user_names).values_list(
+                "user_name", flat=True
+            )
+        )
+        for line, user in users:
+            if user.user_name in existing:
+                errors.append(dict(row=line, error=f"用户名已存在: {user.user_name}"))
+            missing = [key for key in user.user_roles if key not in role_ids]
+            if missing:
+                errors.append(dict(row=line, error=f"角色不存在: {','.join(missing)}"))
+        if errors:
+            errors.sort(key=lambda error: error["row"])
+            raise UserImportException(errors[: config.USER_IMPORT_MAX_ERRORS])
+
+        hashed = await PasswordHasher.hash_many([user.password for _, user in users])
+        async with in_transaction("default"):
+            result = await UserRepository.bulk_create(
+                [
+                    dict(
+                        user.model_dump(exclude={"user_roles"}),
+                        password=password,
+                    )
+                    for (_, user), password in zip(users, hashed)
+                ]
+            )
+            # mysql批量新增不回填主键, 按用户名查询一次
+            user_ids = dict(
+                await Users.filter(user_name__in=user_names).values_list(
+                    "user_name", "id"
+                )
+            )
+            await UserRepository.bulk_add_relation(
+                "roles",
+                [
+                    (user_ids[user.user_name], role_ids[key])
+                    for _, user in users
+                    for key in dict.fromkeys(user.user_roles)
+                ],
+            )
+        log.info(f"成功导入用户{result.rows}个")
+        return result
+
+    @staticmethod
+    async def export_users(
+        chunk_size: int = config.BULK_CHUNK_SIZE,
+    ) -> AsyncIterator[str]:
+        """流式导出用户csv, 按主键分块查询, 内存占用与用户总数无关
+
+        Yields:
+            str: csv文本, 首块为带BOM的表头
+        """
+        yield "\ufeff" + csv_line(USER_EXPORT_HEADER)
+        last_id = 0
+        while True:
+            users = (
+                await Users.filter(id__gt=last_id)
+                .order_by("id")
+                .limit(chunk_size)
+                .prefetch_related("roles")
+            )
+            if not users:
+                break
+            yield "".join(
+                csv_line(
+                    (
+                        user.user_name,
+                        ",".join(role.role_key for role in user.roles),
+                        int(user.status),
+                        user.remark,
+                        user.created_at.isoformat(),
+                    )
+                )
+                for user in users
+            )
+            last_id = users[-1].id
+            if len(users) < chunk_size:
+                break
+
     @staticmethod
     async def is_super_user(user_id: int) -> bool:
         """判断是否是超级管理员
@@ -175,9 +309,10 @@ class UserService:
         if not user_exists:
             raise UserNotExistException
         updated_num = await UserRepository.update(
-            pk=body.user_id, password=md5_crypt.hash(body.password)
+            pk=body.user_id, password=await PasswordHasher.hash(body.password)
         )
         if updated_num:
+            await PrincipalCache.invalidate(user_exists.user_name)
             log.info(f"成功更新了id:{body.user_id}密码")
         else:
             log.error(f"因为用户不存在更新id:{body.user_id}的密码失败")
@@ -204,11 +339,18 @@ class UserService:
                 detail="admin is prohibited from being deleted",
             )
 
+        # 删除前取出用户名, 用于清除当前登录用户缓存
+        usernames = await Users.filter(id__in=user_list).values_list(
+            "user_name", flat=True
+        )
         delete_count = await UserRepository.delete_by_filter(
             id__in=user_list, user_name__not="admin"
         )
         if not delete_count:
             raise UserNotExistException
+        # 已删除用户的token声明不再可信, 使其回退到按用户鉴权
+        await PermissionAccess.bump_version()
+        await PrincipalCache.invalidate(*usernames)
 
     @classmethod
     async def update_user_from_id(cls, user_id: int, body: UserUpdateIn) -> None:
@@ -227,7 +369,7 @@ class UserService:
         if not query_user:
             raise UserNotExistException
         # 启用事务
-        async with in_transaction():
+        async with in_transaction("default"):
             # 判断角色修改
             if body.user_roles is not None:
                 if body.user_roles == []:
@@ -235,20 +377,14 @@ class UserService:
                         status_code=status.HTTP_403_FORBIDDEN,
                         detail="Role cannot be cleared!",
                     )
-                # 获取当前用户角色列表
-                current_user_role_list = await query_user.roles.all()
-                # 获取接口请求角色列表
-                roles = await RoleRepository.fetch_all_by_filter(id__in=body.user_roles)
-                # 确定需要添加和需要移除的角色 ID
-                role_ids_to_add = list(set(roles) - set(current_user_role_list))
-                role_ids_to_remove = list(set(current_user_role_list) - set(roles))
-                log.debug(f"toadd:{role_ids_to_add},toremove:{role_ids_to_remove}")
-                # 添加/删除
-                await query_user.roles.add(*role_ids_to_add)
-                if role_ids_to_remove:
-                    await query_user.roles.remove(*role_ids_to_remove)
+                # 在数据库中按id集合同步用户角色
+                await UserRepository.sync_relation(user_id, "roles", body.user_roles)
             # 更新指定字段
             await UserRepository.update(
                 pk=user_id,
                 **body.model_dump(exclude_unset=True, exclude=["user_roles"]),
             )
+        if body.user_roles is not None:
+            # 用户角色变更, 使权限缓存失效
+            await PermissionAccess.bump_version()
+        await PrincipalCache.invalidate(query_user.user_name)
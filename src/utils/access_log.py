@@ -0,0 +1,131 @@
+"""结构化访问日志
+
+请求线程只负责采样并把记录放入队列, 由后台线程批量序列化为JSON lines写入文件,
+避免每个请求都同步格式化与写盘.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import atexit
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Optional
+from src.config import config
+
+
+class AccessLogWriter:
+    """后台批量写入的访问日志"""
+
+    def __init__(
+        self,
+        directory: Path,
+        batch_size: int = config.ACCESS_LOG_BATCH_SIZE,
+        flush_interval: float = config.ACCESS_LOG_FLUSH_INTERVAL,
+        max_queue_size: int = config.ACCESS_LOG_QUEUE_SIZE,
+    ) -> None:
+        """
+        Args:
+            directory (Path): 日志目录, 按日期生成access_{date}.jsonl
+            batch_size (int): 单次写入的最大条数
+            flush_interval (float): 最长写入间隔(s)
+            max_queue_size (int): 队列上限, 超出时丢弃记录
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sampled(status_code: int) -> bool:
+        """按响应状态码分类采样, 例如2xx记录1%, 4xx/5xx全部记录"""
+        rate = config.ACCESS_LOG_SAMPLE_RATES.get(f"{status_code // 100}xx", 1.0)
+        return rate >= 1 or random.random() < rate
+
+    def submit(self, record: dict) -> None:
+        """提交一条记录, 不阻塞调用方"""
+        try:
+            self._get_queue().put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _get_queue(self) -> queue.Queue:
+        """按进程懒启动写入线程, 避免fork后沿用父进程的线程状态"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.max_queue_size)
+                    self._thread = threading.Thread(
+                        target=self._run, name="access-log-writer", daemon=True
+                    )
+                    self._thread.start()
+                    self._pid = os.getpid()
+                    atexit.register(self.close)
+        return self._queue
+
+    def _run(self) -> None:
+        """写入线程: 攒够batch_size或到达flush_interval后写入一次"""
+        q = self._queue
+        stopped = False
+        while not stopped:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopped = True
+                    break
+                batch.append(record)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        """一次系统调用写入整批记录, 多个worker追加同一文件时不会互相截断行"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"access_{date.today():%Y-%m-%d}.jsonl"
+        data = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            for record in batch
+        ).encode("utf-8")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self.written += len(batch)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写入剩余记录并停止写入线程"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        # 使用阻塞put保证结束标记一定入队
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
+
+    def stats(self) -> dict:
+        """写入指标"""
+        return dict(
+            queued=self._queue.qsize() if self._queue is not None else 0,
+            written=self.written,
+            dropped=self.dropped,
+        )
+
+
+access_log = AccessLogWriter(Path(__file__).parent.parent / "log" / "access")
@@ -1,76 +1,83 @@
-import os, aiofiles, time, asyncio
-from collections import namedtuple
-from typing import List, NamedTuple
+import os, io, csv, aiofiles, time, asyncio
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
 from pathlib import Path
 from fastapi import UploadFile
 from openpyxl import load_workbook, Workbook
 
 
-async def read_all_testcase(filepath: Path) -> List[NamedTuple]:
-    """读取excel所有数据
+def iter_sheet_rows(
+    filepath: Path, width: int
+) -> Iterator[Tuple[str, int, Tuple[Any, ...]]]:
+    """逐行读取csv或excel所有sheet, 跳过每个sheet的表头与空行
+
+    excel以只读模式打开, 内存占用与行数无关.
+
+    Args:
+        filepath (Path): 文件路径
+        width (int): 列数, 多余的列被忽略, 不足的列补None
+
+    Yields:
+        Tuple[str, int, Tuple[Any, ...]]: (sheet名称, 行号, 行数据)
+    """
+
+    def normalize(row: Sequence[Any]) -> Tuple[Any, ...]:
+        row = tuple(None if cell == "" else cell for cell in row[:width])
+        return row + (None,) * (width - len(row))
+
+    if filepath.suffix.lower() == ".csv":
+        with open(filepath, newline="", encoding="utf-8-sig") as f:
+            for number, row in enumerate(csv.reader(f), start=1):
+                if number > 1 and any(row):
+                    yield filepath.stem, number, normalize(row)
+        return
+    wb: Workbook = load_workbook(filepath, data_only=True, read_only=True)
+    try:
+        for sheet in wb.worksheets:
+            rows = sheet.iter_rows(min_row=2, values_only=True)
+            for number, row in enumerate(rows, start=2):
+                if any(cell not in (None, "") for cell in row):
+                    yield sheet.title, number, normalize(row)
+    finally:
+        wb.close()
+
+
+def _read_table_sync(filepath: Path) -> List[Dict[str, Any]]:
+    if filepath.suffix.lower() == ".csv":
+        with open(filepath, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.reader(f))
+    else:
+        wb: Workbook = load_workbook(filepath, data_only=True, read_only=True)
+        try:
+            rows = list(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+    if not rows:
+        return []
+    header = [str(name).strip() if name is not None else "" for name in rows[0]]
+    return [dict(zip(header, row)) for row in rows[1:] if any(row)]
+
+
+async def read_table(filepath: Path) -> List[Dict[str, Any]]:
+    """读取csv或excel第一个sheet, 首行为表头
 
     Args:
-        filepath (_type_): excel文件路径
+        filepath (Path): 文件路径
 
     Returns:
-        List[NamedTuple]: _description_
+        List[Dict[str, Any]]: 以表头为键的行数据, 忽略空行
     """
-    # 异步循环运行同步函数load_workbook
     loop = asyncio.get_running_loop()
     try:
-        wb: Workbook = await loop.run_in_executor(
-            None,
-            lambda: load_workbook(filepath, data_only=True, read_only=True),
-        )
+        return await loop.run_in_executor(None, _read_table_sync, filepath)
     except Exception as e:
-        raise ValueError(f"Failed to load Excel file: {filepath}. Error: {e}")
-    # 获取所有sheet
-    sheets = wb.sheetnames
-    testcases = []  # 存放所有读取的testcase
-    # 使用namedtuple
-    Testcase: NamedTuple = namedtuple(
-        "Testcase",
-        [
-            "case_no",
-            "case_title",
-            "case_description",
-            "case_module",
-            "case_sub_module",
-            "case_is_execute",
-            "api_path",
-            "api_method",
-            "request_headers",
-            "request_param_type",
-            "request_param",
-            "expect_code",
-            "expect_result",
-            "expect_data",
-            "request_to_redis",
-            "response_to_redis",
-            "case_editor",
-            "remark",
-        ],
-    )
-    # 把循环读取的耗时任务放进线程池运行避免阻塞主线程
-    tasks = [
-        loop.run_in_executor(
-            None,
-            lambda sheet=wb[sheetname]: [
-                row for row in sheet.iter_rows(values_only=True) if any(row)
-            ],
-        )
-        for sheetname in wb.sheetnames
-    ]
-    # 同步读取所有sheet
-    all_sheets_data = await asyncio.gather(*tasks)
-    testcases = []
-
-    for rows in all_sheets_data:
-        testcases.extend(
-            [Testcase(*row) for row in rows[1:] if len(row) == len(Testcase._fields)]
-        )
-
-    return testcases
+        raise ValueError(f"Failed to load file: {filepath}. Error: {e}")
+
+
+def csv_line(values: Sequence[Any]) -> str:
+    """将一行数据编码为csv文本, 用于流式导出"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["" if value is None else value for value in values])
+    return buffer.getvalue()
 
 
 async def save_file(file: UploadFile, save_path: Path) -> None:
@@ -96,12 +103,12 @@ if __name__ == "__main__":
     path = Path(__file__)
     ex = path.parent.parent.parent / "static" / "testcase" / "测试用例模板.xlsx"
 
-    async def read():
-        data = await read_all_testcase(ex)
-        print(data)
+    def read():
+        for sheet, number, row in iter_sheet_rows(ex, width=18):
+            print(sheet, number, row)
 
     async def write():
         file = open(ex, "rb")
         await save_file(file, ex.parent / "upload" / f"{time.time()}.xlsx")
 
-    asyncio.run(read(), debug=True)
+    read()
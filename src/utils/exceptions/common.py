@@ -1,5 +1,28 @@
+from fastapi import HTTPException, status
+
+
 class IncorrectFileError(Exception):
     """无效文件异常"""
 
     def __init__(self):
         super().__init__("导入的文件无效!")
+
+
+class InvalidCursorException(HTTPException):
+    """分页游标无效"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标!",
+        )
+
+
+class InvalidFieldsException(HTTPException):
+    """fields投影参数无效"""
+
+    def __init__(self, field: str):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的字段: {field}!",
+        )
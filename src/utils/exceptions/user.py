@@ -82,4 +82,35 @@ class RoleNotExistException(HTTPException):
         super().__init__(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="角色不存在!",
-        )
\ No newline at end of file
+        )
+
+class PasswordHashBusyException(HTTPException):
+    """密码哈希队列已满"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙,请稍后重试!",
+        )
+
+
+class UserImportFileException(HTTPException):
+    """批量导入用户文件无法解析"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="导入文件无法解析!",
+        )
+
+
+class UserImportException(HTTPException):
+    """批量导入用户数据校验失败"""
+
+    def __init__(self, errors: list):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="导入数据校验失败!",
+        )
+        # 每行的错误信息, 由异常处理器放入响应的result
+        self.result = errors
@@ -18,14 +18,14 @@ def log_handler():
     # 添加控制台输出处理器
     logger.add(
         sys.stdout,
-        level="DEBUG",
+        level=config.STREAM_LOG_LEVEL,
         format=config.LOG_FORMATTER,
     )
     # 添加 info 日志处理器
     logger.add(
         log_file_info,
         rotation="00:00",
-        level="INFO",
+        level=config.FILE_LOG_LEVEL,
         encoding="utf-8",
         format=config.LOG_FORMATTER,
         enqueue=True,  # 进程安全
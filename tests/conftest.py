@@ -2,6 +2,7 @@ import pytest
 from pathlib import Path
 from asgi_lifespan import LifespanManager
 from src.main import app
+from src.core.query_capture import capture_queries as _capture_queries
 from httpx import AsyncClient
 from loguru import logger
 
@@ -31,6 +32,18 @@ async def client():
             yield c
 
 
+@pytest.fixture
+def capture_queries():
+    """捕获请求中执行的SQL语句
+
+    Example:
+        with capture_queries() as queries:
+            await client.get(...)
+        assert len(queries) <= 3
+    """
+    return _capture_queries
+
+
 @pytest.fixture(scope="session", autouse=True)
 def faker_locale():
     """配置faker local"""
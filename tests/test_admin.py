@@ -1,5 +1,9 @@
 import pytest
 from httpx import AsyncClient
+from src.repositories.management.role import RoleRepository
+
+# 不存在的关联id, 同步时被忽略
+MISSING_ID = 999999999
 
 
 @pytest.mark.anyio
@@ -22,3 +26,58 @@ async def test_permission_list(client: AsyncClient, login):
     assert res.status_code == 200
     assert res.json()["success"] == True
     assert res.json()["message"] == "success"
+
+
+@pytest.mark.anyio
+async def test_update_role_sync_menus(client: AsyncClient, login):
+    """更新角色菜单后关联与请求的id集合一致"""
+    headers = {"Authorization": f"Bearer {login}"}
+    res = await client.get("/admin/role/list", headers=headers)
+    role = next(r for r in res.json()["result"]["data"] if not r["isSuper"])
+    res = await client.get(f"/admin/role/{role['id']}", headers=headers)
+    menu_ids = res.json()["result"]["menuIds"]
+    assert menu_ids
+    body = {"roleName": role["roleName"], "roleKey": role["roleKey"]}
+    try:
+        res = await client.put(
+            f"/admin/role/{role['id']}",
+            json={**body, "menuIds": [*menu_ids[:1], MISSING_ID]},
+            headers=headers,
+        )
+        assert res.status_code == 200
+        res = await client.get(f"/admin/role/{role['id']}", headers=headers)
+        assert res.json()["result"]["menuIds"] == menu_ids[:1]
+    finally:
+        await client.put(
+            f"/admin/role/{role['id']}",
+            json={**body, "menuIds": menu_ids},
+            headers=headers,
+        )
+    res = await client.get(f"/admin/role/{role['id']}", headers=headers)
+    assert sorted(res.json()["result"]["menuIds"]) == sorted(menu_ids)
+
+
+@pytest.mark.anyio
+async def test_update_role_sync_permissions(client: AsyncClient, login):
+    """更新角色权限后关联与请求的id集合一致, 不存在的id被忽略"""
+    headers = {"Authorization": f"Bearer {login}"}
+    res = await client.get("/admin/role/list", headers=headers)
+    role = next(r for r in res.json()["result"]["data"] if not r["isSuper"])
+    res = await client.get(f"/admin/role/{role['id']}", headers=headers)
+    permission_ids = res.json()["result"]["permissionIds"] or []
+    res = await client.get("/admin/permission/list", headers=headers)
+    all_ids = [permission["id"] for permission in res.json()["result"]["data"]]
+    assert all_ids
+    body = {"roleName": role["roleName"], "roleKey": role["roleKey"]}
+    try:
+        res = await client.put(
+            f"/admin/role/{role['id']}",
+            json={**body, "permissionIds": [all_ids[-1], MISSING_ID]},
+            headers=headers,
+        )
+        assert res.status_code == 200
+        res = await client.get(f"/admin/role/{role['id']}", headers=headers)
+        assert res.json()["result"]["permissionIds"] == [all_ids[-1]]
+    finally:
+        # 接口不处理空列表, 直接同步以恢复原有权限
+        await RoleRepository.sync_relation(role["id"], "permissions", permission_ids)
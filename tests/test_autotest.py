@@ -1,5 +1,58 @@
+import io
+import re
+import json
+import random
+from datetime import datetime
 import pytest
+from openpyxl import Workbook
 from httpx import AsyncClient
+from tortoise import connections
+from src.config import config
+from src.db.models import TestCase, TestSuite, TESTCASE_SEARCH_FIELDS
+from src.controllers.autotest.testcase import TESTCASE_FILTER
+from src.controllers.autotest.testsuite import TESTSUITE_FILTER
+from src.repositories import search as search_module
+from src.repositories.autotest.testcase import TestCaseRepository
+
+# 用例检索字段的响应别名
+SEARCH_ALIASES = ("caseTitle", "caseModule", "apiPath", "caseDescription")
+
+mysql_only = pytest.mark.skipif(config.DB_ENGINE != "mysql", reason="EXPLAIN格式依赖mysql")
+
+
+async def index_names(table: str, column: str) -> set:
+    """字段上的索引名"""
+    rows = await connections.get("default").execute_query_dict(
+        f"SHOW INDEX FROM `{table}` WHERE Column_name = %s", [column]
+    )
+    return {row["Key_name"] for row in rows}
+
+
+async def explain_possible_keys(query) -> set:
+    """EXPLAIN FORMAT=JSON中各表的候选索引(possible_keys)
+
+    实际选用的key取决于mysql版本与表的统计信息, 只断言索引可以被使用.
+    """
+    rows = await query.explain()
+    keys = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            keys.update(node.get("possible_keys") or ())
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(rows[0]["EXPLAIN"]))
+    return keys
+
+
+def assert_prefix_like(sql: str, column: str, value: str) -> None:
+    """筛选生成前缀匹配LIKE 'x%', 没有前导通配符, 可以使用索引"""
+    assert re.search(rf"[`\"]{column}[`\"] LIKE '{value}%'", sql), sql
+    assert "LIKE '%" not in sql, sql
 
 
 @pytest.mark.anyio
@@ -10,4 +63,257 @@ async def test_case_list(client: AsyncClient, login):
     )
     assert res.status_code == 200
     assert res.json()["success"] == True
-    assert res.json()["message"] == "success"
\ No newline at end of file
+    assert res.json()["message"] == "success"
+
+@pytest.mark.anyio
+async def test_case_list_cursor(client: AsyncClient, login):
+    """游标分页获取用例列表, 各页不重叠且延续(created_at, id)倒序"""
+    headers = {"Authorization": f"Bearer {login}"}
+    module = f"cursor{random.randint(0, 99999):05d}"
+    await TestCaseRepository.bulk_create(
+        [
+            dict(
+                case_no=f"C{module[-5:]}{i:02d}",
+                case_title="游标分页",
+                case_module=module,
+                api_path="/login",
+                request_param="{}",
+                expect_code=200,
+            )
+            for i in range(25)
+        ]
+    )
+    try:
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 10, "caseModule": module}
+            if cursor:
+                params["cursor"] = cursor
+            res = await client.get("/testcase/list", params=params, headers=headers)
+            assert res.status_code == 200
+            result = res.json()["result"]
+            pages.append(result["data"])
+            cursor = result["nextCursor"]
+            if not cursor:
+                break
+            assert len(pages) < 5
+        assert [len(page) for page in pages] == [10, 10, 5]
+        cases = [case for page in pages for case in page]
+        keys = [
+            (datetime.fromisoformat(case["createdAt"]), case["id"]) for case in cases
+        ]
+        # 后一页紧接前一页, 整体严格按(created_at, id)倒序且不重复
+        assert keys == sorted(keys, reverse=True)
+        assert len(set(keys)) == 25
+        assert {case["caseNo"] for case in cases} == {
+            f"C{module[-5:]}{i:02d}" for i in range(25)
+        }
+    finally:
+        await TestCase.filter(case_module=module).delete()
+
+
+@pytest.mark.anyio
+async def test_case_list_invalid_cursor(client: AsyncClient, login):
+    """无效游标"""
+    res = await client.get(
+        "/testcase/list",
+        params={"cursor": "invalid"},
+        headers={"Authorization": f"Bearer {login}"},
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_case_list_time_filter_use_index(client: AsyncClient):
+    """用例列表按时间范围筛选只生成一个BETWEEN条件"""
+    filters = TESTCASE_FILTER.compile(begin_time="2024-01-01", end_time="2024-12-31")
+    assert list(filters) == ["created_at__range"]
+    sql = TestCase.filter(**filters).sql()
+    assert re.search(r"[`\"]created_at[`\"] BETWEEN ", sql), sql
+
+
+@pytest.mark.anyio
+async def test_case_list_title_filter_use_index(client: AsyncClient):
+    """用例列表按标题筛选生成前缀匹配"""
+    filters = TESTCASE_FILTER.compile(case_title="登录")
+    assert_prefix_like(TestCase.filter(**filters).sql(), "case_title", "登录")
+
+
+@pytest.mark.anyio
+async def test_case_list_suite_filter_use_index(client: AsyncClient):
+    """用例列表按套件标题筛选生成前缀匹配"""
+    filters = TESTCASE_FILTER.compile(case_suite="冒烟")
+    assert_prefix_like(TestCase.filter(**filters).sql(), "suite_title", "冒烟")
+
+
+@pytest.mark.anyio
+async def test_suite_list_filter_use_index(client: AsyncClient):
+    """套件列表按标题筛选生成前缀匹配"""
+    filters = TESTSUITE_FILTER.compile(suite_title="冒烟")
+    assert_prefix_like(TestSuite.filter(**filters).sql(), "suite_title", "冒烟")
+
+
+@mysql_only
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "model,spec,params,table,column",
+    [
+        (
+            TestCase,
+            TESTCASE_FILTER,
+            dict(begin_time="2024-01-01", end_time="2024-12-31"),
+            "test_case",
+            "created_at",
+        ),
+        (TestCase, TESTCASE_FILTER, dict(case_title="登录"), "test_case", "case_title"),
+        (TestCase, TESTCASE_FILTER, dict(case_suite="冒烟"), "test_suite", "suite_title"),
+        (TestSuite, TESTSUITE_FILTER, dict(suite_title="冒烟"), "test_suite", "suite_title"),
+    ],
+)
+async def test_list_filter_possible_keys(
+    client: AsyncClient, model, spec, params: dict, table: str, column: str
+):
+    """筛选字段上的索引出现在EXPLAIN的possible_keys中"""
+    keys = await explain_possible_keys(model.filter(**spec.compile(**params)))
+    assert keys & await index_names(table, column)
+
+
+@pytest.mark.anyio
+async def test_case_search(client: AsyncClient, login):
+    """全文检索用例"""
+    res = await client.get(
+        "/testcase/search",
+        params={"keyword": "登录"},
+        headers={"Authorization": f"Bearer {login}"},
+    )
+    assert res.status_code == 200
+    assert res.json()["success"] == True
+    assert res.json()["result"]["total"] >= len(res.json()["result"]["data"])
+
+
+@pytest.mark.anyio
+async def test_case_search_without_fulltext_index(client: AsyncClient, login):
+    """全文索引不存在时退化为icontains"""
+    key = (TestCase._meta.db_table, tuple(TESTCASE_SEARCH_FIELDS))
+    search_module._fulltext_indexes.set(key, False)
+    try:
+        res = await client.get(
+            "/testcase/search",
+            params={"keyword": "登录"},
+            headers={"Authorization": f"Bearer {login}"},
+        )
+    finally:
+        search_module._fulltext_indexes.delete(key)
+    assert res.status_code == 200
+    for case in res.json()["result"]["data"]:
+        assert any("登录" in (case.get(field) or "") for field in SEARCH_ALIASES)
+
+
+@pytest.mark.anyio
+async def test_suite_search(client: AsyncClient, login):
+    """全文检索套件"""
+    headers = {"Authorization": f"Bearer {login}"}
+    res = await client.get(
+        "/testsuite/search", params={"keyword": "冒烟"}, headers=headers
+    )
+    assert res.status_code == 200
+    assert res.json()["success"] == True
+    res = await client.get("/testsuite/search", headers=headers)
+    assert res.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_case_list_sparse_fields(client: AsyncClient, login):
+    """用例列表只返回指定字段"""
+    headers = {"Authorization": f"Bearer {login}"}
+    res = await client.get(
+        "/testcase/list", params={"fields": "caseNo,caseTitle"}, headers=headers
+    )
+    assert res.status_code == 200
+    for case in res.json()["result"]["data"]:
+        assert set(case) == {"id", "createdAt", "caseNo", "caseTitle"}
+    res = await client.get(
+        "/testcase/list", params={"fields": "notExist"}, headers=headers
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_case_import(client: AsyncClient, login):
+    """导入用例时跳过校验失败的行并返回行号"""
+    headers = {"Authorization": f"Bearer {login}"}
+    prefix = f"I{random.randint(0, 99999):05d}"
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "cases"
+    ws.append(["表头"] * 18)
+    for i in range(2):
+        ws.append(
+            [f"{prefix}{i}", "导入用例", None, "import", None, 1, "/login", "post"]
+            + ['{"token": "x"}', "body", "{}", 200]
+        )
+    # 缺少必填的api_path等字段
+    ws.append([f"{prefix}9", "导入用例", None, "import", None, 1, None, "post"])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    try:
+        res = await client.post(
+            "/testcase/import",
+            headers=headers,
+            files={"file": ("cases.xlsx", buffer.getvalue())},
+        )
+        assert res.status_code == 200
+        result = res.json()["result"]
+        assert result["rows"] == 2
+        assert result["failed"] == 1
+        assert result["errors"][0]["sheet"] == "cases"
+        assert result["errors"][0]["row"] == 4
+        case = await TestCase.get(case_no=f"{prefix}0")
+        assert json.loads(case.request_headers) == {"token": "x"}
+    finally:
+        await TestCase.filter(case_no__startswith=prefix).delete()
+
+
+@pytest.mark.anyio
+async def test_update_suite_sync_testcases(client: AsyncClient, login):
+    """更新套件用例后关联与请求的id集合一致, 不存在的id被忽略"""
+    headers = {"Authorization": f"Bearer {login}"}
+    prefix = f"S{random.randint(0, 99999):05d}"
+    cases = [
+        await TestCase.create(
+            case_no=f"{prefix}{i}",
+            case_title="套件用例",
+            case_module="suite",
+            api_path="/login",
+            request_param="{}",
+            expect_code=200,
+        )
+        for i in range(3)
+    ]
+    res = await client.post(
+        "/testsuite/add",
+        headers=headers,
+        json=dict(
+            suiteNo=prefix,
+            suiteTitle="同步用例",
+            testcaseIds=[case.id for case in cases[:2]],
+        ),
+    )
+    assert res.status_code == 200
+    suite_id = res.json()["result"]["id"]
+    try:
+        res = await client.put(
+            f"/testsuite/{suite_id}",
+            headers=headers,
+            json=dict(
+                suiteNo=prefix,
+                suiteTitle="同步用例",
+                testcaseIds=[cases[1].id, cases[2].id, 999999999],
+            ),
+        )
+        assert res.status_code == 200
+        testcase_ids = [case["id"] for case in res.json()["result"]["testcases"]]
+        assert sorted(testcase_ids) == [cases[1].id, cases[2].id]
+    finally:
+        await TestSuite.filter(id=suite_id).delete()
+        await TestCase.filter(case_no__startswith=prefix).delete()
@@ -1,5 +1,8 @@
 import pytest
 from httpx import AsyncClient
+from jose import jwt
+from src.core.premission import PermissionAccess
+from src.core.redis import RedisService
 
 
 @pytest.mark.anyio
@@ -69,3 +72,30 @@ async def test_login_missing_password(client: AsyncClient):
     res = await client.post("/login", json=dict(username="admin"))
     assert res.status_code == 422
     assert res.json()["success"] == False
+
+
+@pytest.mark.anyio
+async def test_logout_revokes_token(client: AsyncClient):
+    """退出登录后token失效"""
+    res = await client.post("/login", json=dict(username="admin", password="123456"))
+    headers = {"Authorization": f"Bearer {res.json()['result']['access_token']}"}
+    res = await client.post("/logout", headers=headers)
+    assert res.status_code == 200
+    assert res.json()["success"] == True
+    res = await client.get("/user/me", headers=headers)
+    assert res.status_code == 401
+    assert res.json()["success"] == False
+
+
+@pytest.mark.anyio
+async def test_permission_version_missing_key(client: AsyncClient, login):
+    """RBAC版本键丢失(redis清空/淘汰)后, 旧token中的权限版本不再被信任"""
+    pv = jwt.get_unverified_claims(login)["pv"]
+    assert pv == await PermissionAccess.get_version()
+    await RedisService().aioredis_pool.delete(PermissionAccess.VERSION_KEY)
+    version = await PermissionAccess.get_version()
+    assert version and version != pv
+    assert await PermissionAccess.get_version() == version
+    # 回退到按用户查询权限, 鉴权结果不变
+    res = await client.get("/user/list", headers={"Authorization": f"Bearer {login}"})
+    assert res.status_code == 200
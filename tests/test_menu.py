@@ -0,0 +1,76 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_menu_treeselect(client: AsyncClient, login):
+    """获取菜单树结构"""
+    res = await client.get(
+        "/menu/treeselect", headers={"Authorization": f"Bearer {login}"}
+    )
+    assert res.status_code == 200
+    assert res.json()["success"] == True
+    assert res.headers["ETag"]
+
+
+@pytest.mark.anyio
+async def test_menu_treeselect_not_modified(client: AsyncClient, login):
+    """菜单未变更时返回304"""
+    res = await client.get(
+        "/menu/treeselect", headers={"Authorization": f"Bearer {login}"}
+    )
+    res = await client.get(
+        "/menu/treeselect",
+        headers={
+            "Authorization": f"Bearer {login}",
+            "If-None-Match": res.headers["ETag"],
+        },
+    )
+    assert res.status_code == 304
+    assert not res.content
+
+
+@pytest.mark.anyio
+async def test_get_routers_not_modified(client: AsyncClient, login):
+    """路由菜单未变更时返回304"""
+    res = await client.get("/getRouters", headers={"Authorization": f"Bearer {login}"})
+    assert res.status_code == 200
+    res = await client.get(
+        "/getRouters",
+        headers={
+            "Authorization": f"Bearer {login}",
+            "If-None-Match": res.headers["ETag"],
+        },
+    )
+    assert res.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_get_routers_cached(client: AsyncClient, login, capture_queries):
+    """路由菜单缓存命中时不查询数据库"""
+    headers = {"Authorization": f"Bearer {login}"}
+    first = await client.get("/getRouters", headers=headers)
+    assert first.status_code == 200
+    with capture_queries() as queries:
+        second = await client.get("/getRouters", headers=headers)
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert not queries
+
+
+@pytest.mark.anyio
+async def test_get_menu_subtree(client: AsyncClient, login):
+    """查询单个菜单时返回其全部子孙菜单, 与菜单树中的子树一致"""
+    headers = {"Authorization": f"Bearer {login}"}
+    res = await client.get("/menu/treeselect", headers=headers)
+    root = next(node for node in res.json()["result"] if node["children"])
+
+    def ids(node):
+        return [node["id"], [ids(child) for child in node["children"] or []]]
+
+    res = await client.get(f"/menu/{root['id']}", headers=headers)
+    assert res.status_code == 200
+    assert ids(res.json()["result"]) == ids(root)
+    res = await client.get("/menu/999999", headers=headers)
+    assert res.status_code == 404
@@ -0,0 +1,82 @@
+import uuid
+import pytest
+from httpx import AsyncClient
+from src.db.models import Routes, RouteMeta
+
+# 接口查询数预算: (路径, 最多执行的SQL语句数)
+# 预算与返回的数据量无关, 超出通常意味着出现了N+1查询; 新增预取关联时同步调整
+QUERY_BUDGETS = [
+    ("/testcase/list", 4),
+    ("/testsuite/list", 6),
+    ("/testenv/list", 4),
+    ("/user/list", 5),
+    ("/admin/role/list", 10),
+    ("/admin/permission/list", 4),
+    ("/menu/list", 6),
+    ("/menu/treeselect", 3),
+    ("/getRouters", 3),
+    ("/task/list", 4),
+]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path,budget", QUERY_BUDGETS)
+async def test_query_budget(
+    client: AsyncClient, login, capture_queries, path: str, budget: int
+):
+    """列表接口的SQL语句数不超过预算"""
+    with capture_queries() as queries:
+        res = await client.get(path, headers={"Authorization": f"Bearer {login}"})
+    assert res.status_code == 200
+    assert len(queries) <= budget, "\n".join(queries)
+
+
+@pytest.fixture
+async def deep_menu(client: AsyncClient):
+    """4层菜单链, 返回从根到叶的菜单id"""
+    suffix = uuid.uuid4().hex[:8]
+    ids, metas, parent_id = [], [], None
+    for level in range(4):
+        meta = await RouteMeta.create(title=f"层级{level}", icon="#", no_cache=False)
+        route = await Routes.create(
+            name=f"deep{level}{suffix}",
+            path=f"deep{level}",
+            hidden=False,
+            component="Layout",
+            parent_id=parent_id,
+            route_meta=meta,
+        )
+        metas.append(meta.id)
+        ids.append(route.id)
+        parent_id = route.id
+    yield ids
+    # 删除meta时级联删除菜单
+    await RouteMeta.filter(id__in=metas).delete()
+
+
+@pytest.mark.anyio
+async def test_menu_query_budget_depth(
+    client: AsyncClient, login, capture_queries, deep_menu
+):
+    """菜单详情与菜单列表的SQL语句数与菜单层级无关"""
+    headers = {"Authorization": f"Bearer {login}"}
+    counts = []
+    for menu_id in (deep_menu[0], deep_menu[-1]):
+        with capture_queries() as queries:
+            res = await client.get(f"/menu/{menu_id}", headers=headers)
+        assert res.status_code == 200
+        counts.append(len(queries))
+    res = await client.get(f"/menu/{deep_menu[0]}", headers=headers)
+    node, depth = res.json()["result"], 0
+    while node["children"]:
+        node, depth = node["children"][0], depth + 1
+    assert depth == 3
+    # 4层的根菜单与叶子菜单查询数相同
+    assert counts[0] == counts[1] <= 4, counts
+
+    with capture_queries() as queries:
+        res = await client.get("/menu/list", headers=headers, params={"limit": 100})
+    assert res.status_code == 200
+    assert len(queries) <= dict(QUERY_BUDGETS)["/menu/list"], "\n".join(queries)
+    root = next(m for m in res.json()["result"]["data"] if m["id"] == deep_menu[0])
+    assert root["children"][0]["children"][0]["children"][0]["id"] == deep_menu[-1]
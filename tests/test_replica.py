@@ -0,0 +1,144 @@
+import uuid
+import pytest
+from httpx import AsyncClient
+from tortoise.router import router
+from tortoise.transactions import in_transaction
+from src.config import config
+from src.db.models import TestCase
+from src.core.middleware import ReadReplicaMiddleware
+from src.core.menu_cache import MenuCache
+from src.core.count_cache import CountCache
+from src.core.replica import (
+    PRIMARY_CONNECTION,
+    REPLICA_CONNECTION,
+    ReadReplicaRouter,
+    ReadYourWrites,
+    replica_reads,
+    use_primary,
+)
+
+
+def http_scope(method: str, authorization: str) -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(b"authorization", authorization.encode())],
+        "client": ("127.0.0.1", 12345),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+@pytest.mark.anyio
+async def test_router_routing(client: AsyncClient):
+    """只有标记了副本读的上下文才路由到副本, 写查询始终走主库"""
+    router = ReadReplicaRouter()
+    assert router.db_for_read(TestCase) == PRIMARY_CONNECTION
+    token = replica_reads.set(True)
+    try:
+        assert router.db_for_read(TestCase) == REPLICA_CONNECTION
+        assert router.db_for_write(TestCase) == PRIMARY_CONNECTION
+        with use_primary():
+            assert router.db_for_read(TestCase) == PRIMARY_CONNECTION
+        assert router.db_for_read(TestCase) == REPLICA_CONNECTION
+    finally:
+        replica_reads.reset(token)
+
+
+@pytest.mark.anyio
+async def test_router_transaction_fallback(client: AsyncClient):
+    """事务中的读查询使用事务连接"""
+    router = ReadReplicaRouter()
+    token = replica_reads.set(True)
+    try:
+        async with in_transaction(PRIMARY_CONNECTION):
+            assert router.db_for_read(TestCase) == PRIMARY_CONNECTION
+        assert router.db_for_read(TestCase) == REPLICA_CONNECTION
+    finally:
+        replica_reads.reset(token)
+
+
+@pytest.mark.anyio
+async def test_read_your_writes_pin(client: AsyncClient, monkeypatch):
+    """写请求成功后同一客户端的读请求走主库, 其他客户端仍走副本"""
+    monkeypatch.setattr(config, "DB_REPLICA_HOST", "replica.invalid")
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(replica_reads.get())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = ReadReplicaMiddleware(app)
+    writer = f"Bearer {uuid.uuid4().hex}"
+    other = f"Bearer {uuid.uuid4().hex}"
+    await middleware(http_scope("GET", writer), receive, send)
+    await middleware(http_scope("PUT", writer), receive, send)
+    await middleware(http_scope("GET", writer), receive, send)
+    await middleware(http_scope("GET", other), receive, send)
+    # 写请求本身不使用副本
+    assert seen == [True, False, False, True]
+    assert await ReadYourWrites.pinned(ReadYourWrites.client_id(writer, "127.0.0.1"))
+    assert not await ReadYourWrites.pinned(
+        ReadYourWrites.client_id(other, "127.0.0.1")
+    )
+
+
+@pytest.mark.anyio
+async def test_failed_write_does_not_pin(client: AsyncClient, monkeypatch):
+    """写请求失败时不标记客户端"""
+    monkeypatch.setattr(config, "DB_REPLICA_HOST", "replica.invalid")
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 422, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    writer = f"Bearer {uuid.uuid4().hex}"
+    await ReadReplicaMiddleware(app)(http_scope("POST", writer), receive, send)
+    assert not await ReadYourWrites.pinned(
+        ReadYourWrites.client_id(writer, "127.0.0.1")
+    )
+
+
+@pytest.mark.anyio
+async def test_version_keyed_cache_reads_primary(client: AsyncClient):
+    """按版本号缓存的数据在副本读请求中也从主库加载"""
+    seen = []
+
+    async def builder():
+        seen.append(replica_reads.get())
+        return "[]"
+
+    token = replica_reads.set(True)
+    try:
+        await MenuCache.get_or_build(f'W/"{uuid.uuid4().hex}"', builder)
+    finally:
+        replica_reads.reset(token)
+    assert seen == [False]
+
+
+@pytest.mark.anyio
+async def test_count_cache_reads_primary(client: AsyncClient, monkeypatch):
+    """分页总数在副本读请求中也从主库加载, 包括生成缓存键时选定的连接"""
+    monkeypatch.setattr(config, "COUNT_CACHE_ENABLED", True)
+    seen = []
+
+    def db_for_read(model):
+        seen.append(replica_reads.get())
+        return None
+
+    monkeypatch.setattr(router, "db_for_read", db_for_read)
+    token = replica_reads.set(True)
+    try:
+        total = await CountCache.count(TestCase.filter(case_no=uuid.uuid4().hex[:10]))
+    finally:
+        replica_reads.reset(token)
+    assert total == 0
+    assert seen and not any(seen)
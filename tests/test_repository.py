@@ -0,0 +1,103 @@
+import uuid
+import pytest
+from httpx import AsyncClient
+from src.db.models import TestCase
+from src.repositories.autotest.testcase import TestCaseRepository
+
+
+def make_testcases(prefix: str, count: int, title: str = "批量写入") -> list:
+    return [
+        dict(
+            case_no=f"{prefix}{i:03d}",
+            case_title=title,
+            case_module="repository",
+            api_path="/bulk",
+            request_param="{}",
+            expect_code=200,
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+async def prefix(client: AsyncClient):
+    """用例编号前缀, 测试结束后删除该前缀的用例"""
+    prefix = "rp" + uuid.uuid4().hex[:4]
+    yield prefix
+    await TestCase.filter(case_no__startswith=prefix).delete()
+
+
+def chunk_rows(result) -> list:
+    """每个分块的行数, 同时校验每个分块都记录了耗时"""
+    assert all(elapsed >= 0 for _, elapsed in result.chunks)
+    return [rows for rows, _ in result.chunks]
+
+
+@pytest.mark.anyio
+async def test_bulk_create_chunks(prefix):
+    """bulk_create按chunk_size分块, 每个分块记录行数与耗时"""
+    result = await TestCaseRepository.bulk_create(
+        make_testcases(prefix, 7), chunk_size=3
+    )
+    assert result.rows == 7
+    assert chunk_rows(result) == [3, 3, 1]
+    assert await TestCase.filter(case_no__startswith=prefix).count() == 7
+
+
+@pytest.mark.anyio
+async def test_bulk_upsert_conflict_update(prefix):
+    """bulk_upsert唯一键冲突时更新已有记录, 不冲突时新增"""
+    await TestCaseRepository.bulk_create(make_testcases(prefix, 3))
+    ids = dict(
+        await TestCase.filter(case_no__startswith=prefix).values_list("case_no", "id")
+    )
+    result = await TestCaseRepository.bulk_upsert(
+        make_testcases(prefix, 4, title="冲突更新"), conflict=("case_no",), chunk_size=2
+    )
+    assert result.rows == 4
+    assert chunk_rows(result) == [2, 2]
+    rows = await TestCase.filter(case_no__startswith=prefix).order_by("case_no")
+    assert len(rows) == 4
+    assert {row.case_title for row in rows} == {"冲突更新"}
+    # 已有记录原地更新, 主键不变
+    assert {row.case_no: row.id for row in rows[:3]} == ids
+
+
+@pytest.mark.anyio
+async def test_bulk_update_chunks(prefix):
+    """bulk_update分块更新指定字段, 并刷新update_at"""
+    await TestCaseRepository.bulk_create(make_testcases(prefix, 5))
+    objects = await TestCase.filter(case_no__startswith=prefix).order_by("id")
+    update_at = {obj.id: obj.update_at for obj in objects}
+    for obj in objects:
+        obj.case_title = f"更新{obj.case_no}"
+    result = await TestCaseRepository.bulk_update(
+        objects, ["case_title"], chunk_size=2
+    )
+    assert result.rows == 5
+    assert chunk_rows(result) == [2, 2, 1]
+    for obj in await TestCase.filter(case_no__startswith=prefix):
+        assert obj.case_title == f"更新{obj.case_no}"
+        assert obj.update_at >= update_at[obj.id]
+
+
+@pytest.mark.anyio
+async def test_bulk_delete_by_filter(prefix):
+    """bulk_delete_by_filter按主键分块删除满足条件的记录, 其余记录不受影响"""
+    await TestCaseRepository.bulk_create(
+        make_testcases(prefix, 5) + make_testcases(prefix + "k", 2)
+    )
+    result = await TestCaseRepository.bulk_delete_by_filter(
+        chunk_size=2, case_no__startswith=f"{prefix}0"
+    )
+    assert result.rows == 5
+    assert chunk_rows(result) == [2, 2, 1]
+    remaining = await TestCase.filter(case_no__startswith=prefix).values_list(
+        "case_no", flat=True
+    )
+    assert sorted(remaining) == [f"{prefix}k000", f"{prefix}k001"]
+    result = await TestCaseRepository.bulk_delete_by_filter(
+        case_no__startswith=f"{prefix}0"
+    )
+    assert result.rows == 0
+    assert result.chunks == []
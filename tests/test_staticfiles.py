@@ -0,0 +1,24 @@
+import pytest
+from httpx import AsyncClient
+from src.core.staticfiles import is_fingerprinted
+
+
+@pytest.mark.anyio
+async def test_static_unfingerprinted_revalidate(client: AsyncClient):
+    """文件名不带哈希的swagger资源不使用immutable缓存, 过期后按ETag返回304"""
+    res = await client.get("/static/swagger-ui/swagger-ui.css")
+    assert res.status_code == 200
+    assert "immutable" not in res.headers["Cache-Control"]
+    res = await client.get(
+        "/static/swagger-ui/swagger-ui.css",
+        headers={"If-None-Match": res.headers["ETag"]},
+    )
+    assert res.status_code == 304
+
+
+def test_static_fingerprinted_names():
+    """只有带内容哈希的文件名被视为不可变"""
+    assert is_fingerprinted("assets/app.3f2a9c1b.js")
+    assert is_fingerprinted("chunk-5e4d3c2b1a.css")
+    assert not is_fingerprinted("swagger-ui/swagger-ui-bundle.js")
+    assert not is_fingerprinted("favicon-32x32.png")
@@ -100,3 +100,84 @@ async def test_user_del_success(client: AsyncClient, login, log):
     assert res.json()["success"] == True
     assert res.json()["message"] == "successful deleted user!"
     log.info(f"使用admin用户成功删除用户{new_user_id}")
+
+
+@pytest.mark.anyio
+async def test_user_import_export(client: AsyncClient, login, faker, get_role_list):
+    """批量导入用户后可以在导出文件中找到"""
+    headers = {"Authorization": f"Bearer {login}"}
+    faker.seed_instance(seed=None)
+    names = [faker.user_name()[:12] + str(i) for i in range(3)]
+    role_key = get_role_list[0]["roleKey"]
+    content = "userName,password,roleKeys,status,remark\n" + "".join(
+        f"{name},123456,{role_key},1,批量导入\n" for name in names
+    )
+    res = await client.post(
+        "/user/import",
+        headers=headers,
+        files={"file": ("users.csv", content.encode(), "text/csv")},
+    )
+    assert res.status_code == 200
+    assert res.json()["message"].endswith("3 users!")
+    # 再次导入同名用户整体失败
+    res = await client.post(
+        "/user/import",
+        headers=headers,
+        files={"file": ("users.csv", content.encode(), "text/csv")},
+    )
+    assert res.status_code == 400
+    assert [error["row"] for error in res.json()["result"]] == [2, 3, 4]
+
+    res = await client.get("/user/export", headers=headers)
+    assert res.status_code == 200
+    exported = {line.split(",")[0] for line in res.text.splitlines()[1:]}
+    assert set(names) <= exported
+
+    # 列表按创建时间倒序, 新导入的用户在第一页
+    res = await client.get("/user/list", headers=headers, params={"limit": 100})
+    ids = [
+        user["id"] for user in res.json()["result"]["data"] if user["userName"] in names
+    ]
+    res = await client.delete(f"/user/{','.join(map(str, ids))}", headers=headers)
+    assert res.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_user_import_corrupt_file(client: AsyncClient, login):
+    """无法解析的导入文件返回400"""
+    res = await client.post(
+        "/user/import",
+        headers={"Authorization": f"Bearer {login}"},
+        files={"file": ("users.xlsx", b"not a workbook", "application/octet-stream")},
+    )
+    assert res.status_code == 400
+    assert res.json()["success"] == False
+
+
+@pytest.mark.anyio
+async def test_user_update_sync_roles(client: AsyncClient, login, faker, get_role_list):
+    """更新用户角色后关联与请求的id集合一致, 不存在的id被忽略"""
+    headers = {"Authorization": f"Bearer {login}"}
+    faker.seed_instance(seed=None)
+    res = await client.post(
+        "/user/add",
+        headers=headers,
+        json=dict(
+            userName=faker.user_name()[:12] + "r",
+            status=1,
+            password="123456",
+            roleIds=[role["id"] for role in get_role_list[:2]],
+        ),
+    )
+    assert res.status_code == 200
+    user_id = res.json()["result"]["id"]
+    try:
+        role_id = get_role_list[-1]["id"]
+        res = await client.put(
+            f"/user/{user_id}", headers=headers, json=dict(roleIds=[role_id, 999999999])
+        )
+        assert res.status_code == 200
+        res = await client.get(f"/user/{user_id}", headers=headers)
+        assert [role["id"] for role in res.json()["result"]["roles"]] == [role_id]
+    finally:
+        await client.delete(f"/user/{user_id}", headers=headers)